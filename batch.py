@@ -0,0 +1,13 @@
+import sys
+import os
+
+# Add src to path for imports (also re-run by spawned worker processes)
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from model_utils import configure_offline_mode
+configure_offline_mode()
+
+from batch_processor import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+import sys
+import os
+
+# Add src to path for imports (also re-run by spawned benchmark processes)
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from llm_benchmark import main
+
+if __name__ == "__main__":
+    sys.exit(main())
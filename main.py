@@ -12,9 +12,15 @@ except Exception as e:
     print(f"Warning: Could not set up model paths: {e}")
 
 from gui_app import AudioNotesGUI
+import multiprocessing
 import tkinter as tk
 
 if __name__ == "__main__":
+    # Chunk workers are spawned from this executable; in a frozen build
+    # they must run the worker code instead of starting the app again
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = AudioNotesGUI(root)
+    # Load all models in the background while the window comes up
+    app.start_model_warmup()
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,189 @@
+# src/audio_buffer.py - Shared, zero-copy access to normalized audio
+
+import os
+import struct
+import sys
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+class AudioBuffer:
+    """Read-only view of 16 kHz mono float32 audio shared between stages
+
+    The samples live either in a memory-mapped normalized WAV (see
+    AudioProcessor.convert_to_wav) or in a multiprocessing shared-memory
+    block, so diarization, transcription and pool workers all read the same
+    pages instead of each decoding their own copy. Pickling a buffer only
+    sends where the samples live, not the samples themselves.
+    """
+
+    def __init__(self, samples, sample_rate, source=None, start_frame=0):
+        self._samples = samples
+        self.sample_rate = sample_rate
+        # ('file', path, data_offset, total_frames) or ('shm', name, total_frames)
+        self._source = source
+        self.start_frame = start_frame
+        self._shared_memory = None
+        self._owns_shared_memory = False
+        # Buffer whose memory a region views, kept alive by the region
+        self._parent = None
+
+    @classmethod
+    def from_wav(cls, path):
+        """Memory-map the data chunk of a mono float32 WAV file"""
+        data_offset, frames, sample_rate = _read_float_wav_layout(path)
+        # Copy-on-write mapping: pages come from the shared page cache and
+        # torch can wrap the array without complaining about read-only memory
+        samples = np.memmap(path, dtype='<f4', mode='c', offset=data_offset, shape=(frames,))
+        return cls(samples, sample_rate, source=('file', os.path.abspath(path), data_offset, frames))
+
+    @classmethod
+    def from_array(cls, samples, sample_rate):
+        """Copy samples into a new shared-memory block owned by this buffer"""
+        from multiprocessing import shared_memory
+
+        samples = np.asarray(samples, dtype=np.float32)
+        block = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+        shared = np.ndarray(samples.shape, dtype=np.float32, buffer=block.buf)
+        shared[:] = samples
+
+        buffer = cls(shared, sample_rate, source=('shm', block.name, len(samples)))
+        buffer._shared_memory = block
+        buffer._owns_shared_memory = True
+        return buffer
+
+    @property
+    def samples(self):
+        """All samples as a plain ndarray view (no copy)"""
+        return np.asarray(self._samples)
+
+    @property
+    def duration(self):
+        """Duration in seconds"""
+        return len(self._samples) / self.sample_rate
+
+    @property
+    def start_time(self):
+        """Offset of this buffer within the original recording, in seconds"""
+        return self.start_frame / self.sample_rate
+
+    def __len__(self):
+        return len(self._samples)
+
+    def slice(self, start_time=0.0, end_time=None):
+        """Samples between two times (seconds, relative to this buffer) as a view"""
+        start, end = self._frame_range(start_time, end_time)
+        return self.samples[start:end]
+
+    def region(self, start_time=0.0, end_time=None):
+        """Sub-buffer sharing the same memory, pickled as an offset into it"""
+        start, end = self._frame_range(start_time, end_time)
+        region = AudioBuffer(self._samples[start:end], self.sample_rate,
+                             source=self._source, start_frame=self.start_frame + start)
+        # Keep the buffer holding the memory (and its shared-memory block)
+        # alive for as long as the region is
+        region._parent = self if self._parent is None else self._parent
+        return region
+
+    def _frame_range(self, start_time, end_time):
+        start = max(0, int(round(start_time * self.sample_rate)))
+        end = len(self._samples) if end_time is None else int(round(end_time * self.sample_rate))
+        return start, max(start, min(end, len(self._samples)))
+
+    def to_tensor(self):
+        """(1, samples) torch tensor sharing memory with the buffer"""
+        import torch
+        return torch.from_numpy(self.samples).unsqueeze(0)
+
+    def as_pyannote_input(self):
+        """In-memory audio dict accepted by pyannote pipelines"""
+        return {'waveform': self.to_tensor(), 'sample_rate': self.sample_rate}
+
+    def close(self):
+        """Release the mapping, unlinking shared memory this buffer created
+
+        Closing a region only drops its reference to the parent buffer; the
+        memory stays mapped until the buffer that opened it is closed.
+        """
+        self._samples = np.zeros(0, dtype=np.float32)
+        if self._parent is not None:
+            self._parent = None
+            return
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            if self._owns_shared_memory:
+                self._shared_memory.unlink()
+            self._shared_memory = None
+
+    def __reduce__(self):
+        if self._source is None:
+            # Not backed by shared storage - fall back to copying the samples
+            return (AudioBuffer, (np.array(self._samples), self.sample_rate))
+        return (_attach_buffer, (self._source, self.sample_rate, self.start_frame, len(self._samples)))
+
+    def __repr__(self):
+        location = self._source[1] if self._source else "memory"
+        return f"AudioBuffer({location}, {self.start_time:.1f}s-{self.start_time + self.duration:.1f}s)"
+
+    __str__ = __repr__
+
+
+def _attach_buffer(source, sample_rate, start_frame, frames):
+    """Re-open a pickled AudioBuffer in another process"""
+    if source[0] == 'file':
+        _, path, data_offset, total_frames = source
+        samples = np.memmap(path, dtype='<f4', mode='c', offset=data_offset, shape=(total_frames,))
+        return AudioBuffer(samples[start_frame:start_frame + frames], sample_rate,
+                           source=source, start_frame=start_frame)
+
+    from multiprocessing import shared_memory
+
+    _, name, total_frames = source
+    if sys.version_info >= (3, 13):
+        # Only the creating buffer unlinks the block
+        block = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # Pool workers share the parent's resource tracker, so registering
+        # the same name again is harmless
+        block = shared_memory.SharedMemory(name=name)
+    samples = np.ndarray((total_frames,), dtype=np.float32, buffer=block.buf)
+    buffer = AudioBuffer(samples[start_frame:start_frame + frames], sample_rate,
+                         source=source, start_frame=start_frame)
+    buffer._shared_memory = block
+    return buffer
+
+
+def _read_float_wav_layout(path):
+    """Find the data chunk of a mono float32 WAV: (offset, frames, sample_rate)"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError(f"{path} is not a WAV file")
+
+        audio_format = channels = sample_rate = bits = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if audio_format == 0xFFFE and len(fmt) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE: the real format is in the sub-format GUID
+                    audio_format = struct.unpack('<H', fmt[24:26])[0]
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b'data':
+                if audio_format != 3 or channels != 1 or bits != 32:
+                    raise ValueError(f"{path} is not mono float32 audio")
+                data_offset = f.tell()
+                # Streaming writers may leave the size unset; trust the file size then
+                data_size = min(chunk_size, file_size - data_offset)
+                return data_offset, data_size // 4, sample_rate
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
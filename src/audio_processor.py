@@ -2,13 +2,145 @@
 
 import os
 import tempfile
+import hashlib
+import json
+import sqlite3
+import struct
+import subprocess
+import threading
 from pathlib import Path
 import sys
+import numpy as np
 
 # Add src to path for imports  
 sys.path.insert(0, os.path.dirname(__file__))
 
-from model_utils import is_running_from_executable
+from model_utils import is_running_from_executable, get_cache_dir
+from audio_buffer import AudioBuffer
+from voice_activity import SpeechTimeline
+
+# Every downstream stage works on 16 kHz mono float32 audio
+TARGET_SAMPLE_RATE = 16000
+# Frames decoded per block when streaming; peak memory does not depend on file length
+BLOCK_FRAMES = 65536
+
+
+def _trim_wav_cache(keep=None, max_bytes=None):
+    """Delete least recently used WAVs from the cache until under max_bytes
+    
+    Cached WAVs are touched whenever they are reused, so mtime is their last
+    use. The file just produced (keep) is never removed; files still mapped
+    by a running job stay readable on POSIX, and are skipped where the OS
+    refuses to delete them.
+    """
+    if max_bytes is None:
+        max_bytes = float(os.environ.get("AUDIO_NOTES_WAV_CACHE_MB", 4096)) * 2**20
+    entries = []
+    with os.scandir(get_cache_dir("wav")) as scan:
+        for entry in scan:
+            if entry.name.endswith('.wav') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _touch_cached_wav(path):
+    """Mark a cached WAV as just used, or report that it is missing"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class _FloatWavWriter:
+    """Streams mono float32 samples into a WAV file, patching sizes on close"""
+    
+    def __init__(self, path, sample_rate):
+        self.file = open(path, 'wb')
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._write_header()
+    
+    def _write_header(self):
+        data_bytes = self.frames * 4
+        self.file.write(b'RIFF')
+        self.file.write(struct.pack('<I', 50 + data_bytes))
+        self.file.write(b'WAVE')
+        # WAVE_FORMAT_IEEE_FLOAT, 1 channel, 32 bits per sample
+        self.file.write(b'fmt ')
+        self.file.write(struct.pack('<IHHIIHHH', 18, 3, 1, self.sample_rate,
+                                    self.sample_rate * 4, 4, 32, 0))
+        self.file.write(b'fact')
+        self.file.write(struct.pack('<II', 4, self.frames))
+        self.file.write(b'data')
+        self.file.write(struct.pack('<I', data_bytes))
+    
+    def write(self, samples):
+        samples = np.asarray(samples, dtype='<f4')
+        self.file.write(samples.tobytes())
+        self.frames += len(samples)
+    
+    def close(self):
+        self.file.seek(0)
+        self._write_header()
+        self.file.close()
+
+
+class _StreamingResampler:
+    """Low-pass filters and linearly resamples audio block by block"""
+    
+    def __init__(self, source_rate, target_rate):
+        self.step = source_rate / target_rate
+        self.position = 0.0  # next output position, in input samples
+        self.offset = 0  # input index of the first sample in self.tail
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.filter_taps = None
+        self.filter_state = None
+        
+        if source_rate > target_rate:
+            # Anti-aliasing filter, carried across blocks through its state
+            try:
+                from scipy.signal import firwin, lfilter_zi
+                self.filter_taps = firwin(63, 0.9 * target_rate / source_rate).astype(np.float32)
+                self.filter_state = lfilter_zi(self.filter_taps, 1.0) * 0.0
+                # Start after the filter's group delay so output stays time-aligned
+                self.position = (len(self.filter_taps) - 1) / 2
+            except ImportError:
+                print("scipy not available - resampling without anti-aliasing filter")
+    
+    def process(self, block):
+        if self.filter_taps is not None:
+            from scipy.signal import lfilter
+            block, self.filter_state = lfilter(self.filter_taps, 1.0, block, zi=self.filter_state)
+        
+        samples = np.concatenate([self.tail, block.astype(np.float32)])
+        end = self.offset + len(samples) - 1  # last input index we can interpolate up to
+        if self.position > end:
+            self.tail = samples
+            return np.zeros(0, dtype=np.float32)
+        
+        count = int((end - self.position) // self.step) + 1
+        positions = self.position + np.arange(count) * self.step - self.offset
+        output = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        
+        self.position += count * self.step
+        # Keep the samples the next output position still needs
+        keep_from = min(len(samples), max(0, int(self.position) - self.offset))
+        self.tail = samples[keep_from:]
+        self.offset += keep_from
+        return output
+
 
 class AudioProcessor:
     def __init__(self):
@@ -52,28 +184,244 @@ class AudioProcessor:
         return str(path)
     
     def convert_to_wav(self, input_file):
-        """Convert any audio file to WAV format for processing"""
-        # In a real implementation, you would use librosa or ffmpeg
+        """Convert any audio file to a cached 16 kHz mono float32 WAV for processing
+        
+        The input is decoded in fixed-size blocks (through ffmpeg, or soundfile
+        when ffmpeg is missing), so memory use stays flat however long the
+        recording is. Later calls for the same unchanged file reuse the cache.
+        """
         try:
-            # For now, just return the original file path (mock implementation)
+            output_file = self._normalized_wav_path(input_file)
+            if _touch_cached_wav(output_file):
+                return output_file
+            
             print(f"Converting {input_file} to WAV format...")
-            return input_file
+            temp_file = f"{output_file}.{os.getpid()}.tmp"
+            try:
+                try:
+                    self._convert_with_ffmpeg(input_file, temp_file)
+                except (FileNotFoundError, RuntimeError) as e:
+                    print(f"ffmpeg conversion unavailable ({e}) - falling back to soundfile")
+                    self._convert_with_soundfile(input_file, temp_file)
+                os.replace(temp_file, output_file)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            _trim_wav_cache(keep=output_file)
+            
+            return output_file
         except Exception as e:
             print(f"Error converting file to WAV: {e}")
             return input_file
     
+    def _normalized_wav_path(self, input_file):
+        """Cache path for the normalized WAV, keyed by path, size and mtime"""
+        stat = os.stat(input_file)
+        key = f"{os.path.abspath(input_file)}|{stat.st_size}|{stat.st_mtime_ns}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(get_cache_dir("wav"), f"{Path(input_file).stem}-{digest}.wav")
+    
+    def _convert_with_ffmpeg(self, input_file, output_file):
+        """Stream raw float32 samples out of ffmpeg block by block"""
+        command = [
+            'ffmpeg', '-nostdin', '-v', 'error', '-i', str(input_file),
+            '-f', 'f32le', '-ac', '1', '-ar', str(TARGET_SAMPLE_RATE), '-'
+        ]
+        # stderr goes to a file: a full, unread stderr pipe would block ffmpeg
+        # while we wait on stdout
+        with tempfile.TemporaryFile() as error_log:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=error_log)
+            writer = _FloatWavWriter(output_file, TARGET_SAMPLE_RATE)
+            try:
+                while True:
+                    chunk = process.stdout.read(BLOCK_FRAMES * 4)
+                    if not chunk:
+                        break
+                    # Drop a trailing partial sample; the pipe hands back whole blocks otherwise
+                    usable = len(chunk) - len(chunk) % 4
+                    writer.write(np.frombuffer(chunk[:usable], dtype='<f4'))
+            finally:
+                writer.close()
+                process.stdout.close()
+                process.wait()
+            error_log.seek(0)
+            stderr = error_log.read().decode('utf-8', errors='replace')
+        
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {stderr.strip()}")
+    
+    def _convert_with_soundfile(self, input_file, output_file):
+        """Decode with soundfile in blocks, downmix and resample to 16 kHz"""
+        import soundfile as sf
+        
+        with sf.SoundFile(str(input_file)) as source:
+            resampler = None
+            if source.samplerate != TARGET_SAMPLE_RATE:
+                resampler = _StreamingResampler(source.samplerate, TARGET_SAMPLE_RATE)
+            
+            writer = _FloatWavWriter(output_file, TARGET_SAMPLE_RATE)
+            try:
+                for block in source.blocks(blocksize=BLOCK_FRAMES, dtype='float32', always_2d=True):
+                    mono = block.mean(axis=1)
+                    writer.write(resampler.process(mono) if resampler else mono)
+            finally:
+                writer.close()
+    
+    def load_buffer(self, wav_file):
+        """Memory-map a normalized WAV as an AudioBuffer shared by all stages
+        
+        Falls back to returning the path when the file isn't a normalized
+        WAV (e.g. conversion failed), which every stage also accepts.
+        """
+        try:
+            return AudioBuffer.from_wav(wav_file)
+        except Exception as e:
+            print(f"Could not memory-map {wav_file}, stages will read the file: {e}")
+            return wav_file
+    
+    def load_speech_buffer(self, audio, speech_regions):
+        """The speech regions of an AudioBuffer packed back to back, as one shared buffer
+        
+        Diarization and transcription both read this one buffer instead of
+        each packing their own copy. Speech of a file-backed buffer is
+        written region by region to a cached WAV and memory-mapped, so it
+        takes no memory beyond the page cache; other buffers get one
+        shared-memory copy. Returns None when there is no speech.
+        """
+        if not speech_regions:
+            return None
+        timeline = SpeechTimeline(speech_regions)
+        source = getattr(audio, '_source', None)
+        if source is None or source[0] != 'file':
+            return AudioBuffer.from_array(timeline.extract(audio.samples, audio.sample_rate),
+                                          audio.sample_rate)
+        
+        key = json.dumps([source[1], os.path.getmtime(source[1]), audio.start_frame, len(audio),
+                          speech_regions])
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        output_file = os.path.join(get_cache_dir("wav"), f"{Path(source[1]).stem}-speech-{digest}.wav")
+        if not _touch_cached_wav(output_file):
+            temp_file = f"{output_file}.{os.getpid()}.tmp"
+            try:
+                writer = _FloatWavWriter(temp_file, audio.sample_rate)
+                try:
+                    samples = audio.samples
+                    # Same sample boundaries as SpeechTimeline.extract, in blocks
+                    for start, end in speech_regions:
+                        start, end = int(start * audio.sample_rate), int(end * audio.sample_rate)
+                        for block_start in range(start, end, BLOCK_FRAMES):
+                            writer.write(samples[block_start:min(end, block_start + BLOCK_FRAMES)])
+                finally:
+                    writer.close()
+                os.replace(temp_file, output_file)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            _trim_wav_cache(keep=output_file)
+        return AudioBuffer.from_wav(output_file)
+    
     def get_audio_info(self, file_path):
-        """Get basic info about audio file"""
+        """Get basic info about audio file
+        
+        Only the container header is read (soundfile, or ffprobe for formats
+        libsndfile can't open); samples are never decoded. Results are cached
+        on disk keyed by path, size and mtime.
+        """
         try:
-            # In a real implementation, this would use librosa
-            # For now, we'll return mock data 
-            print(f"Getting audio info for {file_path}...")
+            stat = os.stat(file_path)
+            key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
             
-            # Mock return values
-            return {
-                'duration': 300.0,  # 5 minutes mock duration
-                'sample_rate': 44100,
-                'channels': 2
-            }
+            info = _audio_info_cache.get(key)
+            if info is None:
+                info = self._probe_audio_info(file_path)
+                _audio_info_cache.put(key, info)
+            return info
         except Exception as e:
-            raise RuntimeError(f"Error reading audio file: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Error reading audio file: {str(e)}")
+    
+    def _probe_audio_info(self, file_path):
+        """Read duration, sample rate and channel count from the file header"""
+        try:
+            import soundfile as sf
+            header = sf.info(str(file_path))
+            if header.samplerate > 0 and header.frames > 0:
+                return {
+                    'duration': header.frames / header.samplerate,
+                    'sample_rate': header.samplerate,
+                    'channels': header.channels
+                }
+        except Exception:
+            # Not a format libsndfile understands (m4a, mp4, mov, ...)
+            pass
+        
+        command = [
+            'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+            '-show_entries', 'stream=sample_rate,channels,duration:format=duration',
+            '-of', 'json', str(file_path)
+        ]
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+        probe = json.loads(output)
+        streams = probe.get('streams') or []
+        if not streams:
+            raise ValueError(f"No audio stream found in {file_path}")
+        
+        stream = streams[0]
+        duration = stream.get('duration') or probe.get('format', {}).get('duration')
+        return {
+            'duration': float(duration or 0.0),
+            'sample_rate': int(stream.get('sample_rate') or 0),
+            'channels': int(stream.get('channels') or 0)
+        }
+
+
+class _AudioInfoCache:
+    """Small SQLite store of probed audio headers, keyed by path + size + mtime"""
+    
+    def __init__(self):
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._memory = {}
+    
+    def _connect(self):
+        # Connections must not be shared with forked pool workers
+        if self._connection is None or self._pid != os.getpid():
+            path = os.path.join(get_cache_dir("metadata"), "audio_info.sqlite3")
+            self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS audio_info ("
+                "key TEXT PRIMARY KEY, duration REAL, sample_rate INTEGER, channels INTEGER)")
+            self._pid = os.getpid()
+        return self._connection
+    
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                return dict(self._memory[key])
+            try:
+                row = self._connect().execute(
+                    "SELECT duration, sample_rate, channels FROM audio_info WHERE key = ?",
+                    (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not read audio info cache: {e}")
+                return None
+            if row is None:
+                return None
+            info = {'duration': row[0], 'sample_rate': row[1], 'channels': row[2]}
+            self._memory[key] = info
+            return dict(info)
+    
+    def put(self, key, info):
+        with self._lock:
+            self._memory[key] = dict(info)
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO audio_info VALUES (?, ?, ?, ?)",
+                    (key, info['duration'], info['sample_rate'], info['channels']))
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write audio info cache: {e}")
+
+
+_audio_info_cache = _AudioInfoCache()
@@ -0,0 +1,326 @@
+# src/batch_processor.py - Headless batch processing over a directory or manifest
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from audio_processor import AudioProcessor
+from model_warmup import ModelWarmup
+from voice_activity import VoiceActivityDetector
+from pipeline import build_notes_pipeline
+from result_cache import get_result_cache
+from speaker_names import SpeakerNames
+
+# Per-process pipeline components, created once by _init_worker and reused
+# for every file that worker handles
+_worker_components = {}
+
+
+def _init_worker(threads_per_worker, note_set=False):
+    """Create the pipeline components and load their models once per worker"""
+    # Heavy model libraries are imported here so the dispatching parent
+    # process never has to load them
+    from diarization_manager import DiarizationManager
+    from transcription_manager import TranscriptionManager
+    from note_generator import NoteGenerator
+    from content_classifier import ContentClassifierSimple
+
+    if threads_per_worker:
+        try:
+            import torch
+            torch.set_num_threads(threads_per_worker)
+        except Exception as e:
+            print(f"Warning: Could not set worker thread count: {e}")
+
+    _worker_components['audio_processor'] = AudioProcessor()
+    _worker_components['diarization_manager'] = DiarizationManager()
+    _worker_components['transcription_manager'] = TranscriptionManager()
+    _worker_components['note_generator'] = NoteGenerator()
+    _worker_components['content_classifier'] = ContentClassifierSimple()
+    # Files are already processed in parallel, so no chunk pool per file;
+    # diarization and transcription split this worker's threads
+    _worker_components['pipeline'] = build_notes_pipeline(
+        _worker_components['audio_processor'],
+        _worker_components['diarization_manager'],
+        _worker_components['transcription_manager'],
+        _worker_components['content_classifier'],
+        _worker_components['note_generator'],
+        VoiceActivityDetector(),
+        chunked_transcription=False,
+        thread_budget=threads_per_worker,
+        note_set=note_set,
+    )
+
+    # Load all models up front, in parallel, so the first file doesn't pay for it
+    ModelWarmup().start(
+        _worker_components['diarization_manager'],
+        _worker_components['transcription_manager'],
+        _worker_components['note_generator'],
+    ).wait()
+
+
+def _process_file(job):
+    """Run the full pipeline for one file inside a worker process"""
+    started = time.time()
+    file_path = job['path']
+    # Names saved for the recording (e.g. from the GUI), overridden by the job's
+    speaker_names = SpeakerNames.for_recording(get_result_cache().audio_hash(file_path))
+    speaker_names.update(job.get('speaker_names') or {})
+    result = {
+        'input': file_path,
+        'output': job['output'],
+        'status': 'failed',
+    }
+
+    try:
+        # Same stages as AudioNotesGUI.process_audio
+        values = _worker_components['pipeline'].run(
+            file_path=file_path,
+            speaker_names=speaker_names.as_dict(),
+            speaker_hints=job.get('speaker_hints'),
+            output_format='text',
+            content_type_override=None,
+        )
+        content_type = values['content_type']
+
+        transcription_manager = _worker_components['transcription_manager']
+        if values['speech_regions'] is not None and transcription_manager.last_vad_stats:
+            result['skipped_fraction'] = round(
+                transcription_manager.last_vad_stats['skipped_fraction'], 3)
+
+        names = SpeakerNames(values['resolved_speaker_names'])
+        output = {
+            'input': file_path,
+            'content_type': content_type,
+            'speaker_names': values['resolved_speaker_names'],
+            'diarization': values['named_diarization'],
+            'transcription': _as_dicts(values['transcription']),
+            'speaker_transcript': _as_dicts(values['named_transcript']),
+            'notes': names.apply_notes(values['notes']),
+            'rendered_notes': values['rendered_notes'],
+        }
+        if values['outline'] is not None:
+            output['outline'] = names.apply_text(values['outline'])
+            output['summary'] = names.apply_text(values['summary'])
+        with open(job['output'], 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False, default=str)
+
+        result['status'] = 'ok'
+        result['content_type'] = content_type
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+
+    result['duration_s'] = round(time.time() - started, 3)
+    return result
+
+
+def _as_dicts(segments):
+    """JSON-ready list of segment dicts from a SegmentStore or list"""
+    return segments.to_dicts() if hasattr(segments, 'to_dicts') else segments
+
+
+class BatchProcessor:
+    def __init__(self, output_dir, workers=None, threads_per_worker=None,
+                 speaker_names=None, skip_existing=False, speaker_hints=None, note_set=False):
+        cpu_count = os.cpu_count() or 1
+        self.output_dir = Path(output_dir)
+        self.workers = max(1, workers or min(4, cpu_count))
+        # Split the cores between workers so torch doesn't oversubscribe them
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        self.speaker_names = speaker_names or {}
+        self.speaker_hints = speaker_hints or {}
+        self.skip_existing = skip_existing
+        # Also write an outline and a summary, sharing the notes' transcript encoding
+        self.note_set = note_set
+        self.supported_formats = AudioProcessor().supported_formats
+
+    def collect_files(self, source):
+        """Collect input files from a directory or a manifest file"""
+        source = Path(source)
+        if source.is_dir():
+            return [
+                {'path': str(path)}
+                for path in sorted(source.rglob('*'))
+                if path.is_file() and path.suffix.lower() in self.supported_formats
+            ]
+        if source.is_file():
+            return self._read_manifest(source)
+        raise FileNotFoundError(f"Input {source} does not exist")
+
+    def _read_manifest(self, manifest_path):
+        """Read a manifest: a JSON list or a text file with one path per line"""
+        base_dir = manifest_path.parent
+        entries = []
+
+        if manifest_path.suffix.lower() == '.json':
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            for item in items:
+                if isinstance(item, str):
+                    item = {'path': item}
+                entries.append(dict(item))
+        else:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        entries.append({'path': line})
+
+        # Manifest paths are relative to the manifest itself
+        for entry in entries:
+            path = Path(entry['path'])
+            if not path.is_absolute():
+                entry['path'] = str(base_dir / path)
+        return entries
+
+    def _plan_jobs(self, entries):
+        """Attach a unique output path and speaker names to every entry"""
+        jobs = []
+        used_names = set()
+        for entry in entries:
+            stem = Path(entry['path']).stem
+            name = stem
+            index = 1
+            while name in used_names:
+                index += 1
+                name = f"{stem}_{index}"
+            used_names.add(name)
+
+            speaker_names = entry.get('speaker_names') or self.speaker_names
+            if isinstance(speaker_names, list):
+                speaker_names = {str(i + 1): n for i, n in enumerate(speaker_names)}
+            # Manifest entries may bound the speaker count per recording
+            speaker_hints = {key: entry.get(key, self.speaker_hints.get(key))
+                             for key in ('min_speakers', 'max_speakers')}
+
+            jobs.append({
+                'path': entry['path'],
+                'output': str(self.output_dir / f"{name}.json"),
+                'speaker_names': speaker_names,
+                'speaker_hints': {key: value for key, value in speaker_hints.items() if value} or None,
+            })
+        return jobs
+
+    def _longest_first(self, jobs):
+        """Order jobs by duration so long recordings don't end up last"""
+        audio_processor = AudioProcessor()
+
+        def duration(job):
+            try:
+                return audio_processor.get_audio_info(job['path'])['duration']
+            except RuntimeError:
+                return 0.0
+
+        return sorted(jobs, key=duration, reverse=True)
+
+    def run(self, source):
+        """Process every file from the source and write a run summary"""
+        started_at = datetime.now().isoformat(timespec='seconds')
+        started = time.time()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        jobs = self._plan_jobs(self.collect_files(source))
+        results = []
+
+        if self.skip_existing:
+            pending = []
+            for job in jobs:
+                if os.path.exists(job['output']):
+                    results.append({'input': job['path'], 'output': job['output'],
+                                    'status': 'skipped', 'duration_s': 0.0})
+                else:
+                    pending.append(job)
+            jobs = pending
+
+        jobs = self._longest_first(jobs)
+
+        print(f"Processing {len(jobs)} file(s) with {self.workers} worker(s), "
+              f"{self.threads_per_worker} thread(s) each...")
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)),
+                                     initializer=_init_worker,
+                                     initargs=(self.threads_per_worker, self.note_set)) as executor:
+                futures = {executor.submit(_process_file, job): job for job in jobs}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # A worker died or failed to initialize
+                        job = futures[future]
+                        result = {'input': job['path'], 'output': job['output'],
+                                  'status': 'failed', 'duration_s': 0.0,
+                                  'error': f"{type(e).__name__}: {e}"}
+                    results.append(result)
+                    marker = "✓" if result['status'] == 'ok' else "✗"
+                    print(f"{marker} [{done}/{len(jobs)}] {result['input']} "
+                          f"({result['duration_s']:.1f}s)")
+                    if result['status'] != 'ok':
+                        print(f"  {result.get('error')}")
+
+        summary = {
+            'source': str(source),
+            'started_at': started_at,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'wall_time_s': round(time.time() - started, 3),
+            'workers': self.workers,
+            'threads_per_worker': self.threads_per_worker,
+            'total': len(results),
+            'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+            'files': sorted(results, key=lambda r: r['input']),
+        }
+        with open(self.output_dir / 'run_summary.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        print(f"Done: {summary['succeeded']} succeeded, {summary['failed']} failed, "
+              f"{summary['skipped']} skipped in {summary['wall_time_s']:.1f}s")
+        return summary
+
+
+def main(argv=None):
+    """Command line entry point for headless batch processing"""
+    parser = argparse.ArgumentParser(
+        description="Process a directory or manifest of recordings without the GUI")
+    parser.add_argument('source', help="Directory of audio files or a manifest (.txt or .json)")
+    parser.add_argument('-o', '--output-dir', default='batch_output',
+                        help="Directory for per-file results and run_summary.json")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Number of worker processes (default: min(4, CPU count))")
+    parser.add_argument('-t', '--threads-per-worker', type=int, default=None,
+                        help="Torch threads per worker (default: CPU count / workers)")
+    parser.add_argument('--speaker-names', default='',
+                        help="Comma-separated speaker names applied to every file")
+    parser.add_argument('--min-speakers', type=int, default=None,
+                        help="Fewest speakers expected in each recording")
+    parser.add_argument('--max-speakers', type=int, default=None,
+                        help="Most speakers expected in each recording")
+    parser.add_argument('--skip-existing', action='store_true',
+                        help="Skip files whose output already exists")
+    parser.add_argument('--note-set', action='store_true',
+                        help="Also write an outline and a summary of each recording")
+    args = parser.parse_args(argv)
+
+    speaker_names = [n.strip() for n in args.speaker_names.split(',') if n.strip()]
+    processor = BatchProcessor(
+        args.output_dir,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        speaker_names={str(i + 1): n for i, n in enumerate(speaker_names)},
+        skip_existing=args.skip_existing,
+        speaker_hints={'min_speakers': args.min_speakers, 'max_speakers': args.max_speakers},
+        note_set=args.note_set,
+    )
+    summary = processor.run(args.source)
+    return 1 if summary['failed'] else 0
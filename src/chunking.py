@@ -0,0 +1,116 @@
+# src/chunking.py - Split long audio into overlapping chunks and stitch results back
+
+import numpy as np
+
+# Length of the frames used to look for quiet split points
+QUIET_FRAME_SECONDS = 0.1
+
+
+def frame_rms(samples, frame_length):
+    """RMS energy of consecutive non-overlapping frames"""
+    usable = len(samples) - len(samples) % frame_length
+    if usable <= 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(samples[:usable], dtype=np.float32).reshape(-1, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def find_quiet_point(samples, sample_rate, start_time, end_time):
+    """Time of the quietest frame between two times, for cutting between words"""
+    start = int(start_time * sample_rate)
+    end = int(end_time * sample_rate)
+    frame_length = max(1, int(QUIET_FRAME_SECONDS * sample_rate))
+    energy = frame_rms(samples[start:end], frame_length)
+    if len(energy) == 0:
+        return end_time
+    quietest = int(np.argmin(energy))
+    return (start + quietest * frame_length + frame_length / 2) / sample_rate
+
+
+def plan_chunks(samples, sample_rate, chunk_seconds=60.0, overlap_seconds=2.0,
+                search_seconds=5.0):
+    """Plan overlapping chunks whose boundaries fall on quiet points
+
+    Each chunk is a dict with 'start'/'end' (the audio to transcribe) and
+    'keep_start'/'keep_end' (the part of the timeline this chunk owns).
+    Owned ranges tile the recording exactly; the overlap on either side only
+    gives the model context, and anything decoded there is dropped in favour
+    of the neighbouring chunk.
+    """
+    duration = len(samples) / sample_rate
+    boundaries = [0.0]
+    while duration - boundaries[-1] > chunk_seconds + search_seconds:
+        nominal = boundaries[-1] + chunk_seconds
+        boundaries.append(find_quiet_point(samples, sample_rate,
+                                           max(boundaries[-1] + 1.0, nominal - search_seconds),
+                                           nominal))
+    boundaries.append(duration)
+
+    half_overlap = overlap_seconds / 2
+    return [
+        {
+            'start': max(0.0, keep_start - half_overlap),
+            'end': min(duration, keep_end + half_overlap),
+            'keep_start': keep_start,
+            'keep_end': keep_end,
+        }
+        for keep_start, keep_end in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+
+def owned_segments(chunk, segments, last_chunk=False):
+    """Segments of one chunk that fall in its owned range, on the global timeline
+
+    Segment times are relative to chunk['start']. Words (or whole segments,
+    when there are no word timings) are kept only if their midpoint lies in
+    the chunk's owned range, so each word in an overlap comes from exactly
+    one chunk. The last chunk also owns its end point.
+    """
+    offset = chunk['start']
+
+    def owned(start, end):
+        midpoint = (start + end) / 2
+        return chunk['keep_start'] <= midpoint and (midpoint < chunk['keep_end'] or last_chunk)
+
+    kept_segments = []
+    for segment in segments:
+        start = segment.get('start', 0.0) + offset
+        end = segment.get('end', 0.0) + offset
+        words = segment.get('words')
+
+        if words:
+            kept = [
+                {**word, 'start': word['start'] + offset, 'end': word['end'] + offset}
+                for word in words
+                if owned(word['start'] + offset, word['end'] + offset)
+            ]
+            if not kept:
+                continue
+            kept_segments.append({
+                'start': kept[0]['start'],
+                'end': kept[-1]['end'],
+                'text': "".join(word['word'] for word in kept).strip(),
+                'words': kept,
+            })
+        elif owned(start, end):
+            kept_segments.append({
+                'start': start,
+                'end': end,
+                'text': segment.get('text', '').strip(),
+            })
+    return kept_segments
+
+
+def merge_chunk_segments(chunk_results):
+    """Stitch per-chunk segments into one timeline without duplicated words
+
+    chunk_results is a list of (chunk, segments) pairs where segment times
+    are relative to chunk['start']; see owned_segments.
+    """
+    merged = []
+    timeline_end = max((chunk['keep_end'] for chunk, _ in chunk_results), default=0.0)
+    for chunk, segments in chunk_results:
+        merged.extend(owned_segments(chunk, segments, chunk['keep_end'] >= timeline_end))
+
+    merged.sort(key=lambda segment: segment['start'])
+    return merged
@@ -1,11 +1,28 @@
 # src/content_classifier.py - Classify content type
 
+import itertools
 import re
+import os
+import sys
+from collections import Counter
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from segment_store import SegmentStore
+
+# Characters of the previous text kept when scoring a stream, so keywords
+# that span two segments are still found
+STREAM_CARRY_CHARS = 64
+
+# Segments joined per regex scan when scoring an iterable
+SCORE_BATCH_SEGMENTS = 4096
+
 
 class ContentClassifier:
-    def __init__(self):
+    def __init__(self, patterns=None):
         # Define patterns for different content types
-        self.patterns = {
+        self.patterns = patterns or {
             'meeting': [
                 r'meeting', r'discuss', r'agenda', r'responsibility',
                 r'action item', r'to do list'
@@ -27,38 +44,157 @@ class ContentClassifier:
                 r'main points'
             ]
         }
+        self._compile()
     
-    def classify_content(self, transcription_results):
-        """Classify content type based on transcription"""
-        # Extract text from all segments
-        full_text = " ".join([segment['text'] for segment in transcription_results])
+    def _compile(self):
+        """Build one matcher for every keyword of every type
+        
+        All keywords go into a single alternation, longest first, so a
+        transcript is scanned once instead of once per keyword. The
+        alternation sits in a lookahead at word starts: matches may overlap
+        (both "talk show" and "show notes" count in "talk show notes"), and
+        where several keywords start at the same word the longest one counts.
+        Text is lowercased before scanning; IGNORECASE, which makes every
+        character comparison slower, is only needed by patterns that aren't
+        all lowercase.
+        """
+        self._keyword_types = {}
+        for content_type, type_keywords in self.patterns.items():
+            for keyword in type_keywords:
+                self._keyword_types.setdefault(keyword, []).append(content_type)
         
-        # Count matches for each content type
-        scores = {}
+        self._keywords = sorted(self._keyword_types, key=len, reverse=True)
+        flags = 0 if all(keyword == keyword.lower() for keyword in self._keywords) else re.IGNORECASE
+        self._matcher = re.compile(r'(?<!\w)(?=(' + '|'.join(f"(?:{keyword})" for keyword in self._keywords) + r')\b)', flags)
+        # Matched text -> keyword that matched it, filled in as texts are seen
+        self._matched_keywords = {}
+    
+    def _keyword_for(self, matched):
+        """Keyword the matcher chose for a matched text: the first alternative matching all of it"""
+        keyword = self._matched_keywords.get(matched)
+        if keyword is None:
+            flags = self._matcher.flags
+            keyword = next(keyword for keyword in self._keywords
+                           if re.fullmatch(keyword, matched, flags))
+            self._matched_keywords[matched] = keyword
+        return keyword
+    
+    def start_scoring(self):
+        """Empty ContentScores to feed transcript segments into as they arrive"""
+        return ContentScores(self)
+    
+    def score(self, transcription_results):
+        """ContentScores for a transcript: a list, SegmentStore or any iterable of segments
         
-        for content_type, keywords in self.patterns.items():
-            score = 0
-            for keyword in keywords:
-                # Use regex for case-insensitive matching with word boundaries
-                pattern = re.compile(r'\b' + keyword + r'\b', re.IGNORECASE)
-                matches = pattern.findall(full_text)
-                score += len(matches)
-            
-            scores[content_type] = score
+        Iterables are consumed in batches, so a generator of segments
+        (e.g. from streaming transcription) is scored as it is produced.
+        """
+        scores = ContentScores(self)
+        if isinstance(transcription_results, str):
+            scores.update(transcription_results)
+            return scores
         
-        # Return the content type with highest score
-        if max(scores.values()) == 0:
-            return "general"
+        if isinstance(transcription_results, SegmentStore):
+            texts = iter(transcription_results.texts)
+        else:
+            texts = (segment if isinstance(segment, str) else segment.get('text', '')
+                     for segment in transcription_results)
+        while True:
+            batch = list(itertools.islice(texts, SCORE_BATCH_SEGMENTS))
+            if not batch:
+                return scores
+            scores.update(" ".join(batch))
+    
+    def classify_content(self, transcription_results):
+        """Classify content type based on transcription
         
-        # Fix for the LSP error by ensuring we're using a valid function
-        max_score = 0
+        Not cached: one keyword scan costs less than hashing the transcript
+        for a cache lookup.
+        """
+        return self.score(transcription_results).content_type()
+
+
+def _head(text, length):
+    """Start of text, cut at a word boundary"""
+    if len(text) <= length:
+        return text
+    return text[:text.rfind(" ", 0, length + 1) + 1 or length]
+
+
+def _tail(text, length):
+    """End of text, cut at a word boundary"""
+    if len(text) <= length:
+        return text
+    space = text.find(" ", len(text) - length - 1)
+    return text[space + 1:] if space >= 0 else text[-length:]
+
+
+class ContentScores:
+    """Running keyword counts per content type
+    
+    update() takes transcript text as it arrives. Each text is scanned on
+    its own, plus the join with the tail of the previous one, so keywords
+    split across two segments are found too.
+    """
+    
+    def __init__(self, classifier):
+        self.classifier = classifier
+        self.scores = {content_type: 0 for content_type in classifier.patterns}
+        self.term_counts = {content_type: {} for content_type in classifier.patterns}
+        self._carry = ""
+    
+    def update(self, segment):
+        """Add a segment (dict or text) to the counts"""
+        text = segment if isinstance(segment, str) else segment.get('text', '')
+        if not text:
+            return self
+        text = text.lower()
+        
+        self._count(Counter(self.classifier._matcher.findall(text)))
+        if self._carry:
+            self._count(self._spanning(text))
+        # Short segments add to the tail rather than replace it
+        if self._carry and len(text) < STREAM_CARRY_CHARS:
+            text = f"{self._carry} {text}"
+        self._carry = _tail(text, STREAM_CARRY_CHARS)
+        return self
+    
+    def _spanning(self, text):
+        """Matches that start in the previous text and end in this one"""
+        carry = self._carry
+        joined = f"{carry} {_head(text, STREAM_CARRY_CHARS)}"
+        matches = Counter()
+        for match in self.classifier._matcher.finditer(joined):
+            if match.start() >= len(carry):
+                break
+            if match.end(1) > len(carry):
+                matches[match.group(1)] += 1
+        return matches
+    
+    def _count(self, matches):
+        for matched, count in matches.items():
+            keyword = self.classifier._keyword_for(matched)
+            for content_type in self.classifier._keyword_types[keyword]:
+                self.scores[content_type] += count
+                counts = self.term_counts[content_type]
+                counts[keyword] = counts.get(keyword, 0) + count
+    
+    def content_type(self):
+        """Type with the highest score (the first listed on a tie), or general"""
         best_type = "general"
-        for content_type, score in scores.items():
+        max_score = 0
+        for content_type, score in self.scores.items():
             if score > max_score:
                 max_score = score
                 best_type = content_type
-                
         return best_type
+    
+    def as_dict(self):
+        return {
+            'content_type': self.content_type(),
+            'scores': dict(self.scores),
+            'term_counts': {content_type: dict(counts) for content_type, counts in self.term_counts.items()},
+        }
 
 # Create a simplified version that works with the current architecture
 class ContentClassifierSimple:
@@ -9,12 +9,34 @@ import sys
 # Add src to path for imports  
 sys.path.insert(0, os.path.dirname(__file__))
 
-from model_utils import get_resource_path, is_running_from_executable
+from model_utils import (get_resource_path, is_running_from_executable, get_model_registry,
+                         get_model_path)
+from audio_buffer import AudioBuffer
+from voice_activity import VoiceActivityDetector, SpeechTimeline
+from result_cache import get_result_cache
+from speaker_alignment import number_speakers, speaker_numbering
+from speaker_clustering import EmbeddingDiarizer
+from voiceprint_index import get_voiceprint_index
+from speaker_names import SpeakerNames
 
 class DiarizationManager:
     def __init__(self):
         # Initialize the pipeline with default model
         self.pipeline = None
+        self._pipeline_handle = None
+        self.model_name = "pyannote/speaker-diarization-3.1"
+        # "pyannote" runs the full pipeline (falling back to embeddings if it
+        # can't load); "embedding" clusters speaker embeddings directly
+        self.backend = os.environ.get("AUDIO_NOTES_DIARIZATION_BACKEND", "pyannote")
+        self.embedding_model_name = "pyannote/wespeaker-voxceleb-resnet34-LM"
+        self.active_backend = None
+        self.vad = VoiceActivityDetector()
+        self.last_turns = []
+        # Mean speaker embedding per numbered speaker of the last recording
+        self.last_centroids = {}
+        self._window_centroids = {}
+        self.last_vad_stats = None
+        self._last_error = None
     
     def load_model(self):
         """Load diarization pipeline"""
@@ -22,25 +44,113 @@ class DiarizationManager:
             # When running from executable, we need to use embedded models
             if is_running_from_executable():
                 print("Loading diarization model from executable...")
-                # For PyInstaller, we'll try to load the pre-trained model
-                self.pipeline = Pipeline.from_pretrained(
-                    "pyannote/speaker-diarization-3.1"
-                )
             else:
                 # Regular path for development
                 print("Loading diarization model from local...")
-                self.pipeline = Pipeline.from_pretrained(
-                    "pyannote/speaker-diarization-3.1"
-                )
             
-            print("✓ Diarization model loaded successfully")
+            # The registry shares one loaded pipeline between all managers
+            if self.backend == "embedding":
+                handle = self._acquire_embedding_diarizer()
+            else:
+                try:
+                    handle = get_model_registry().acquire(
+                        self.model_name, self._load_pipeline, dtype="float32", device="cpu")
+                except Exception as e:
+                    print(f"⚠ Warning: Could not load diarization pipeline: {e}")
+                    print("Falling back to embedding clustering...")
+                    handle = self._acquire_embedding_diarizer()
+            self.release_model()
+            self._pipeline_handle = handle
+            self.pipeline = handle.model
+            self.active_backend = "embedding" if isinstance(self.pipeline, EmbeddingDiarizer) else "pyannote"
+            
+            print(f"✓ Diarization model loaded successfully ({self.active_backend})")
         except Exception as e:
             print(f"⚠ Warning: Could not load diarization pipeline: {e}")
             # Create a mock pipeline for development
             self.pipeline = None
     
-    def process_audio(self, audio_file):
-        """Process audio for speaker diarization"""
+    def _acquire_embedding_diarizer(self):
+        """Registry handle for the embedding-clustering diarizer"""
+        return get_model_registry().acquire(
+            self.embedding_model_name, self._load_embedding_diarizer, dtype="float32", device="cpu")
+    
+    def _load_embedding_diarizer(self):
+        """Speaker embedding model wrapped in an EmbeddingDiarizer"""
+        import torch
+        from pyannote.audio import Model
+        
+        checkpoint = get_model_path(os.path.join(self.embedding_model_name, "pytorch_model.bin"))
+        model = Model.from_pretrained(checkpoint or self.embedding_model_name)
+        if model is None:
+            raise RuntimeError(f"Embedding model {self.embedding_model_name} could not be loaded")
+        model.eval()
+        
+        def embed_batch(waveforms):
+            with torch.no_grad():
+                return model(torch.from_numpy(waveforms).unsqueeze(1)).numpy()
+        
+        diarizer = EmbeddingDiarizer(embed_batch)
+        # Exposed so the registry can size the model
+        diarizer.model = model
+        return diarizer
+    
+    def _load_pipeline(self):
+        """Load the pyannote pipeline, failing loudly instead of caching None
+        
+        A pipeline directory under models/ (models/pyannote/speaker-diarization-3.1
+        with its config.yaml, whose model entries may point at checkpoint files
+        next to it) is loaded without the hub; otherwise the hub id is used,
+        from the local hub cache only in offline mode.
+        """
+        local_config = get_model_path(os.path.join(self.model_name, "config.yaml"))
+        if local_config:
+            pipeline = Pipeline.from_pretrained(local_config)
+        else:
+            pipeline = Pipeline.from_pretrained(self.model_name)
+        if pipeline is None:
+            raise RuntimeError(f"Pipeline {self.model_name} could not be loaded")
+        return pipeline
+    
+    def release_model(self):
+        """Release this manager's reference to the shared pipeline"""
+        if self._pipeline_handle is not None:
+            self._pipeline_handle.release()
+            self._pipeline_handle = None
+        self.pipeline = None
+    
+    def process_audio(self, audio_file, use_vad=False, speech_regions=None,
+                      min_speakers=None, max_speakers=None, speech_audio=None):
+        """Process audio (path or AudioBuffer) for speaker diarization
+        
+        With use_vad (or precomputed speech_regions) only the speech parts
+        of an AudioBuffer are diarized; turn times are mapped back onto the
+        original recording and kept in self.last_turns. speech_audio is the
+        speech already packed into one buffer, when the caller has it.
+        min_speakers and max_speakers bound the number of speakers found,
+        when known.
+        """
+        hints = speaker_count_hints(min_speakers, max_speakers)
+        if isinstance(audio_file, AudioBuffer) and use_vad and speech_regions is None:
+            speech_regions = self.vad.detect_buffer(audio_file)
+        
+        # Audio already diarized by this model comes from the cache, so
+        # re-runs (e.g. after renaming speakers) don't touch the pipeline
+        cache = get_result_cache()
+        diarization_results, self.last_turns, self.last_centroids = cache.cached(
+            "diarization", cache.audio_hash(audio_file),
+            lambda: self._process_audio(audio_file, speech_regions, hints, speech_audio),
+            model_id=self.embedding_model_name if self.backend == "embedding" else self.model_name,
+            params={'speech_regions': speech_regions, 'speaker_embeddings': True, **hints},
+            # Results of a fallback backend aren't stored under this backend's key
+            should_store=lambda _: (self.pipeline is not None and self._last_error is None
+                                    and self.active_backend == self.backend))
+        return diarization_results
+    
+    def _process_audio(self, audio_file, speech_regions=None, hints=None, speech_audio=None):
+        """Run diarization, returning (speaker results, turns, speaker centroids)"""
+        self._last_error = None
+        self._window_centroids = {}
         if self.pipeline is None:
             self.load_model()  # Try to load the model
         
@@ -52,26 +162,33 @@ class DiarizationManager:
                 "2": "Thank you for that update. I have some questions regarding the timeline and resources needed.",
                 "3": "I can confirm that we're on schedule. The key deliverables are in place."
             }
-            return mock_results
+            return mock_results, [], {}
         
         try:
             # ACTUAL PYANNOTE IMPLEMENTATION
             print(f"Processing audio file for diarization: {audio_file}")
             
-            # Run the actual pipeline
-            results = self.pipeline(audio_file)
+            if (isinstance(self.pipeline, EmbeddingDiarizer) and isinstance(audio_file, AudioBuffer)
+                    and speech_regions is not None):
+                # Embedding windows come from the speech regions themselves,
+                # so there is nothing to cut out and remap
+                turns = self.pipeline(audio_file, speech_regions, **(hints or {}))
+                self._window_centroids = dict(self.pipeline.last_centroids)
+            elif isinstance(audio_file, AudioBuffer) and speech_regions is not None:
+                turns = self._diarize_speech(audio_file, speech_regions, hints, speech_audio)
+            else:
+                turns = self._run_pipeline(audio_file, hints)
+            # Label speakers 1, 2, ... by first appearance, like custom names
+            numbering = speaker_numbering(turns)
+            centroids = {numbering[label]: centroid
+                         for label, centroid in self._window_centroids.items() if label in numbering}
+            turns = number_speakers(turns)
             
             # Process the diarization output to extract speaker segments
-            # This is a simplified approach - actual implementation depends on pyannote format
             diarization_results = {}
-            
-            # If results are in a segment-based format, process them
-            try:
-                for turn, _, speaker in results.get_timeline().get_labels():
-                    # Extract segments where this speaker talks
-                    diarization_results[speaker] = f"Speaker {speaker} content would appear here"
-            except Exception as e:
-                print(f"Error processing diarization results: {e}")
+            for turn in turns:
+                # Extract segments where this speaker talks
+                diarization_results[turn['speaker']] = f"Speaker {turn['speaker']} content would appear here"
             
             # If no results, use mock data
             if not diarization_results:
@@ -81,24 +198,153 @@ class DiarizationManager:
                     "3": "I can confirm that we're on schedule. The key deliverables are in place."
                 }
             
-            return diarization_results
+            return diarization_results, turns, centroids
             
         except Exception as e:
             print(f"Error during diarization: {e}")
+            self._last_error = e
             # Return mock results if there's an error
             return {
                 "1": f"Error processing audio: {str(e)}",
                 "2": "Please check your audio file and try again."
-            }
+            }, [], {}
+    
+    def _run_pipeline(self, audio, hints=None):
+        """Run pyannote and return speaker turns as a list of dicts
+        
+        hints are min_speakers/max_speakers keyword arguments. The mean
+        embedding of each speaker label is kept in self._window_centroids
+        for voiceprint matching.
+        """
+        hints = hints or {}
+        if isinstance(self.pipeline, EmbeddingDiarizer):
+            if not isinstance(audio, AudioBuffer):
+                # Prepared audio is a 16 kHz float WAV
+                audio = AudioBuffer.from_wav(audio)
+            turns = self.pipeline(audio, **hints)
+            self._window_centroids = dict(self.pipeline.last_centroids)
+            return turns
+        
+        # A shared buffer is passed as an in-memory waveform so pyannote
+        # doesn't decode the file again
+        if isinstance(audio, AudioBuffer):
+            audio = audio.as_pyannote_input()
+        try:
+            # pyannote >= 3.1 also returns one embedding per speaker label
+            results, embeddings = self.pipeline(audio, return_embeddings=True, **hints)
+            self._window_centroids = {
+                label: embedding for label, embedding in zip(results.labels(), embeddings)
+                if np.all(np.isfinite(embedding))}
+        except TypeError:
+            results = self.pipeline(audio, **hints)
+            self._window_centroids = {}
+        
+        turns = []
+        try:
+            for turn, _, speaker in results.itertracks(yield_label=True):
+                turns.append({'start': turn.start, 'end': turn.end, 'speaker': speaker})
+        except Exception as e:
+            print(f"Error processing diarization results: {e}")
+        return turns
+    
+    def diarize_window(self, samples, sample_rate=16000):
+        """Diarize a short window of live audio, returning turns relative to its start
+        
+        Speaker labels are local to the window; the real-time session links
+        them to speakers seen in earlier windows.
+        """
+        if self.pipeline is None:
+            self.load_model()
+        if self.pipeline is None:
+            return []
+        
+        try:
+            return self._run_pipeline(AudioBuffer(np.ascontiguousarray(samples, dtype=np.float32),
+                                                  sample_rate))
+        except Exception as e:
+            print(f"Error during live diarization: {e}")
+            return []
+    
+    def _diarize_speech(self, audio, speech_regions=None, hints=None, speech_audio=None):
+        """Diarize only the speech regions and map turns back to the recording"""
+        if speech_regions is None:
+            speech_regions = self.vad.detect_buffer(audio)
+        self.last_vad_stats = VoiceActivityDetector.stats(speech_regions, audio.duration)
+        print(f"VAD: diarizing {len(speech_regions)} speech regions, "
+              f"skipping {self.last_vad_stats['skipped_fraction']:.0%} of the audio")
+        if not speech_regions:
+            return []
+        
+        timeline = SpeechTimeline(speech_regions)
+        speech = speech_audio if speech_audio is not None else AudioBuffer.from_array(
+            timeline.extract(audio.samples, audio.sample_rate), audio.sample_rate)
+        try:
+            turns = self._run_pipeline(speech, hints)
+        finally:
+            if speech is not speech_audio:
+                speech.close()
+        return timeline.remap_segments(turns)
+    
+    @property
+    def voiceprints(self):
+        """Index of enrolled voices
+        
+        Both backends embed speakers with the same WeSpeaker model (the
+        one inside pyannote/speaker-diarization-3.1), so they share an index.
+        """
+        return get_voiceprint_index(self.embedding_model_name)
+    
+    def identify_speakers(self, speaker_embeddings=None, threshold=None):
+        """{speaker label: name} for speakers whose voice is enrolled
+        
+        speaker_embeddings defaults to the speakers of the last recording.
+        """
+        if speaker_embeddings is None:
+            speaker_embeddings = self.last_centroids
+        try:
+            matches = self.voiceprints.identify(speaker_embeddings, threshold)
+        except Exception as e:
+            print(f"⚠ Warning: Could not match voiceprints: {e}")
+            return {}
+        return {label: name for label, (name, _) in matches.items()}
+    
+    def resolve_speaker_names(self, speaker_names=None, speaker_embeddings=None):
+        """Names typed by the user, with recognised voices filling the gaps"""
+        typed = self._name_mapping(speaker_names) if speaker_names else {}
+        # A typed name wins over a voice matched to the same person elsewhere
+        names = {label: name for label, name in self.identify_speakers(speaker_embeddings).items()
+                 if name not in typed.values()}
+        names.update(typed)
+        return names
+    
+    def confirm_speaker_names(self, speaker_names, speaker_embeddings=None):
+        """Enroll the voices of speakers the user has named; returns how many
+
+        Renaming a speaker moves their voice to the new name, and confirming
+        an unchanged name again does not count the voice twice.
+        """
+        if speaker_embeddings is None:
+            speaker_embeddings = self.last_centroids
+        enrolled = 0
+        for label, name in (speaker_names or {}).items():
+            if name and label in speaker_embeddings:
+                if self.voiceprints.enroll(name, speaker_embeddings[label], save=False):
+                    enrolled += 1
+        if enrolled:
+            self.voiceprints.save()
+            print(f"✓ Enrolled {enrolled} voiceprint(s)")
+        return enrolled
     
     def get_speaker_info(self, audio_file):
         """Get information about speakers in the audio"""
         try:
-            # In a real implementation, you would analyze the diarization results
+            self.process_audio(audio_file)
+            labels = sorted({turn['speaker'] for turn in self.last_turns}, key=int)
+            names = self.identify_speakers()
             return {
-                "num_speakers": 3,
-                "speaker_labels": ["Speaker_1", "Speaker_2", "Speaker_3"],
-                "speaker_names": ["John Smith", "Jane Doe", "Alex Johnson"]
+                "num_speakers": len(labels),
+                "speaker_labels": labels,
+                "speaker_names": [names.get(label, f"Speaker {label}") for label in labels]
             }
         except Exception as e:
             print(f"Error getting speaker info: {e}")
@@ -109,34 +355,53 @@ class DiarizationManager:
             }
     
     def assign_speaker_names(self, speaker_labels):
-        """Assign custom names to speakers based on user input"""
-        # In real implementation, this would involve audio sample analysis and user input
-        
-        name_mapping = {
-            "1": speaker_labels[0] if len(speaker_labels) > 0 else "Speaker 1",
-            "2": speaker_labels[1] if len(speaker_labels) > 1 else "Speaker 2", 
-            "3": speaker_labels[2] if len(speaker_labels) > 2 else "Speaker 3"
-        }
-        
-        return name_mapping
+        """Map speaker labels "1", "2", ... to names listed in speaker order"""
+        return {str(index + 1): name or f"Speaker {index + 1}"
+                for index, name in enumerate(speaker_labels)}
+    
+    def apply_speaker_names(self, diarization_results, speaker_names=None):
+        """Relabel diarization results with custom speaker names"""
+        if not speaker_names:
+            # Keep generic speaker labels
+            return diarization_results
+        return SpeakerNames(speaker_names).apply_texts(diarization_results)
     
-    def process_with_speaker_names(self, audio_file, speaker_names=None):
+    def _name_mapping(self, speaker_names):
+        """{speaker label: name} from names keyed by label, or listed in speaker order"""
+        return SpeakerNames(speaker_names).as_dict()
+    
+    def name_transcript(self, aligned, speaker_names=None):
+        """Replace speaker labels in a speaker-attributed transcript with custom names"""
+        if not speaker_names:
+            return aligned
+        # A SegmentStore only gets a new speaker label table
+        return SpeakerNames(speaker_names).apply_transcript(aligned)
+    
+    def process_with_speaker_names(self, audio_file, speaker_names=None, use_vad=False,
+                                   speech_regions=None, min_speakers=None, max_speakers=None):
         """Process audio and assign custom speaker names"""
         # Get basic diarization results
-        diarization_results = self.process_audio(audio_file)
+        diarization_results = self.process_audio(audio_file, use_vad, speech_regions,
+                                                 min_speakers, max_speakers)
         
-        # If custom speaker names are provided, assign them
-        if speaker_names:
-            name_mapping = self.assign_speaker_names(speaker_names)
-            
-            # Update results with custom names
-            updated_results = {}
-            for speaker_id, text in diarization_results.items():
-                # Replace generic speaker labels with custom names
-                name = name_mapping.get(speaker_id, f"Speaker {speaker_id}")
-                updated_results[name] = text
-                
-            return updated_results
-        else:
-            # Return with generic speaker labels
-            return diarization_results
\ No newline at end of file
+        # Custom speaker names, or the names of recognised voices
+        return self.apply_speaker_names(diarization_results, self.resolve_speaker_names(speaker_names))
+
+
+def speaker_count_hints(min_speakers=None, max_speakers=None):
+    """Keyword arguments bounding the speaker count, for either diarization backend
+    
+    A minimum above the maximum is lowered to it. Both backends clamp the
+    bounds to the number of speech windows, so hints larger than a short
+    recording can hold are safe.
+    """
+    hints = {}
+    if min_speakers:
+        hints['min_speakers'] = int(min_speakers)
+    if max_speakers:
+        hints['max_speakers'] = int(max_speakers)
+    if hints.get('min_speakers', 0) > hints.get('max_speakers', float('inf')):
+        print(f"⚠ Warning: min_speakers ({min_speakers}) is more than max_speakers "
+              f"({max_speakers}), using {max_speakers}")
+        hints['min_speakers'] = hints['max_speakers']
+    return hints
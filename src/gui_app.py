@@ -3,6 +3,7 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
+import time
 import os
 import sys
 
@@ -14,6 +15,14 @@ from diarization_manager import DiarizationManager
 from transcription_manager import TranscriptionManager
 from note_generator import NoteGenerator
 from content_classifier import ContentClassifierSimple
+from model_warmup import ModelWarmup
+from voice_activity import VoiceActivityDetector
+from pipeline import build_notes_pipeline
+from realtime import RealtimeTranscriber, FileReplaySource, GrowingWavSource, MicrophoneSource
+from segment_store import SegmentStore
+from speaker_alignment import speaker_texts
+from speaker_names import SpeakerNames
+from result_cache import get_result_cache
 
 class AudioNotesGUI:
     def __init__(self, root):
@@ -26,10 +35,26 @@ class AudioNotesGUI:
         self.transcription_manager = TranscriptionManager() 
         self.note_generator = NoteGenerator()
         self.content_classifier = ContentClassifierSimple()
+        self.voice_activity_detector = VoiceActivityDetector()
+        self.pipeline = build_notes_pipeline(
+            self.audio_processor, self.diarization_manager, self.transcription_manager,
+            self.content_classifier, self.note_generator, self.voice_activity_detector,
+            on_segment=self.on_transcript_segment)
+        self.model_warmup = ModelWarmup(status_callback=self.on_model_status)
         
         # State variables
         self.current_file_path = None
-        self.speaker_names = {}
+        # Names of the current recording's speakers, saved as they are edited
+        self.speaker_names = SpeakerNames()
+        self.speaker_labels = []
+        self.speaker_embeddings = {}
+        self.live_results = None
+        self.processing = False
+        # Renames re-run the pipeline's cheap stages from their own threads
+        self.pipeline_lock = threading.Lock()
+        self.live_session = None
+        self.live_stop = None
+        self.live_source = None
         
         # Create UI elements
         self.create_widgets()
@@ -73,26 +98,36 @@ class AudioNotesGUI:
         browse_btn = ttk.Button(file_frame, text="Browse", command=self.browse_file)
         browse_btn.grid(row=0, column=2)
         
-        # Speaker naming section
-        speaker_frame = ttk.LabelFrame(main_frame, text="Speaker Names", padding="10")
+        # Speaker naming section: one row per diarized speaker, however many
+        speaker_frame = ttk.LabelFrame(main_frame, text="Speakers", padding="10")
         speaker_frame.grid(row=2, column=0, columnspan=3, sticky="ew", pady=(0, 10))
-        speaker_frame.columnconfigure(1, weight=1)
-        
-        ttk.Label(speaker_frame, text="Speaker 1:").grid(row=0, column=0, sticky="w")
-        self.speaker1_var = tk.StringVar()
-        speaker1_entry = ttk.Entry(speaker_frame, textvariable=self.speaker1_var, width=20)
-        speaker1_entry.grid(row=0, column=1, sticky="w", padx=(5, 5))
-        
-        ttk.Label(speaker_frame, text="Speaker 2:").grid(row=0, column=2, sticky="w")
-        self.speaker2_var = tk.StringVar()
-        speaker2_entry = ttk.Entry(speaker_frame, textvariable=self.speaker2_var, width=20)
-        speaker2_entry.grid(row=0, column=3, sticky="w", padx=(5, 5))
-        
-        ttk.Label(speaker_frame, text="Speaker 3:").grid(row=1, column=0, sticky="w")
-        self.speaker3_var = tk.StringVar()
-        speaker3_entry = ttk.Entry(speaker_frame, textvariable=self.speaker3_var, width=20)
-        speaker3_entry.grid(row=1, column=1, sticky="w", padx=(5, 5))
-        
+        speaker_frame.columnconfigure(0, weight=1)
+        
+        hint_frame = ttk.Frame(speaker_frame)
+        hint_frame.grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 5))
+        ttk.Label(hint_frame, text="Expected speakers (0 = auto): min").pack(side=tk.LEFT)
+        self.min_speakers_var = tk.IntVar(value=0)
+        ttk.Spinbox(hint_frame, from_=0, to=100, width=4,
+                    textvariable=self.min_speakers_var).pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(hint_frame, text="max").pack(side=tk.LEFT)
+        self.max_speakers_var = tk.IntVar(value=0)
+        ttk.Spinbox(hint_frame, from_=0, to=100, width=4,
+                    textvariable=self.max_speakers_var).pack(side=tk.LEFT, padx=(5, 0))
+        
+        self.speaker_table = ttk.Treeview(speaker_frame, columns=("speaker", "name"),
+                                          show="headings", height=4, selectmode="browse")
+        self.speaker_table.heading("speaker", text="Speaker")
+        self.speaker_table.heading("name", text="Name (double-click to edit)")
+        self.speaker_table.column("speaker", width=100, stretch=False)
+        self.speaker_table.column("name", width=300)
+        speaker_scrollbar = ttk.Scrollbar(speaker_frame, orient="vertical",
+                                          command=self.speaker_table.yview)
+        self.speaker_table.configure(yscrollcommand=speaker_scrollbar.set)
+        self.speaker_table.grid(row=1, column=0, sticky="ew")
+        speaker_scrollbar.grid(row=1, column=1, sticky="ns")
+        self.speaker_table.bind("<Double-1>", self.edit_speaker_name)
+        self.speaker_editor = None
+
         # Output format selection
         output_frame = ttk.LabelFrame(main_frame, text="Output Format", padding="10")
         output_frame.grid(row=3, column=0, columnspan=3, sticky="ew", pady=(0, 10))
@@ -112,6 +147,9 @@ class AudioNotesGUI:
                                      command=self.start_processing)
         self.process_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        self.live_btn = ttk.Button(control_frame, text="Start Live", command=self.toggle_live)
+        self.live_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         self.reset_btn = ttk.Button(control_frame, text="Reset", command=self.reset_all)
         self.reset_btn.pack(side=tk.LEFT)
         
@@ -125,6 +163,11 @@ class AudioNotesGUI:
         status_label = ttk.Label(status_frame, textvariable=self.status_var)
         status_label.grid(row=0, column=0, sticky="w")
         
+        self.model_status_var = tk.StringVar()
+        self.model_status_var.set(self.model_warmup.summary_text())
+        model_status_label = ttk.Label(status_frame, textvariable=self.model_status_var)
+        model_status_label.grid(row=0, column=1, sticky="e")
+        
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
         self.progress.grid(row=6, column=0, columnspan=3, sticky="ew", pady=(0, 10))
@@ -199,6 +242,16 @@ class AudioNotesGUI:
         
         self.content_output = content_text
     
+    def start_model_warmup(self):
+        """Start loading all models in the background"""
+        self.model_warmup.start(self.diarization_manager, self.transcription_manager,
+                                self.note_generator)
+    
+    def on_model_status(self, name, state, elapsed):
+        """Show model readiness in the status bar (called from warm-up threads)"""
+        summary = self.model_warmup.summary_text()
+        self.root.after(0, lambda: self.model_status_var.set(summary))
+    
     def browse_file(self):
         """Open file dialog to select audio/video file"""
         file_path = filedialog.askopenfilename(
@@ -215,6 +268,110 @@ class AudioNotesGUI:
             self.file_path_var.set(file_path)
             # Reset previous results when a new file is selected
             self.reset_results()
+            self.show_speakers([], SpeakerNames())
+            # Names given to this recording's speakers in an earlier session
+            threading.Thread(target=self.load_speaker_names, args=(file_path,), daemon=True).start()
+    
+    def load_speaker_names(self, file_path):
+        """Restore the saved speaker names of a recording (background thread)"""
+        try:
+            speaker_names = SpeakerNames.for_recording(get_result_cache().audio_hash(file_path))
+        except OSError as e:
+            print(f"⚠ Warning: Could not load speaker names: {e}")
+            return
+        
+        def show():
+            if self.current_file_path == file_path:
+                labels = sorted(set(self.speaker_labels) | set(speaker_names.as_dict()), key=_label_order)
+                self.show_speakers(labels, speaker_names)
+        self.root.after(0, show)
+    
+    def read_speaker_hints(self):
+        """min/max speaker counts entered in the UI, leaving out "auto" (0)"""
+        hints = {}
+        try:
+            if self.min_speakers_var.get() > 0:
+                hints['min_speakers'] = self.min_speakers_var.get()
+            if self.max_speakers_var.get() > 0:
+                hints['max_speakers'] = self.max_speakers_var.get()
+        except tk.TclError:
+            pass
+        return hints or None
+    
+    def show_speakers(self, labels, speaker_names=None):
+        """Fill the speaker table: one row per label with its current name"""
+        if speaker_names is not None:
+            self.speaker_names = speaker_names
+        self.speaker_labels = list(labels)
+        names = self.speaker_names.as_dict()
+        self.speaker_table.delete(*self.speaker_table.get_children())
+        for label in self.speaker_labels:
+            self.speaker_table.insert("", tk.END, iid=label,
+                                      values=(f"Speaker {label}", names.get(label, "")))
+    
+    def edit_speaker_name(self, event):
+        """Edit a name in place over the table cell"""
+        label = self.speaker_table.identify_row(event.y)
+        if not label or self.processing:
+            return
+        cell = self.speaker_table.bbox(label, "name")
+        if not cell:
+            return
+        x, y, width, height = cell
+        editor = ttk.Entry(self.speaker_table)
+        editor.insert(0, self.speaker_table.set(label, "name"))
+        editor.select_range(0, tk.END)
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+        
+        def close():
+            self.speaker_editor = None
+            editor.destroy()
+        
+        def commit(_event=None):
+            if self.speaker_editor is not editor:
+                return
+            name = editor.get().strip()
+            close()
+            if name != self.speaker_table.set(label, "name"):
+                self.rename_speaker(label, name)
+        
+        editor.bind("<Return>", commit)
+        editor.bind("<FocusOut>", commit)
+        editor.bind("<Escape>", lambda _event: close())
+        self.speaker_editor = editor
+    
+    def rename_speaker(self, label, name):
+        """Rename one speaker and re-render the results - nothing is recomputed"""
+        self.speaker_names.rename(label, name)
+        self.speaker_table.set(label, "name", name)
+        threading.Thread(target=self.apply_speaker_names, args=(label, name), daemon=True).start()
+    
+    def apply_speaker_names(self, label=None, name=None):
+        """Save the names, remember the voice and refresh the results (background thread)"""
+        try:
+            self.speaker_names.save()
+            if label in self.speaker_embeddings and name:
+                # A confirmed name teaches the voiceprint index this voice
+                self.diarization_manager.confirm_speaker_names({label: name}, self.speaker_embeddings)
+        except Exception as e:
+            print(f"⚠ Warning: Could not save speaker names: {e}")
+        
+        if self.live_results is not None:
+            transcript, notes, content_type = self.live_results
+            self.root.after(0, lambda: self.display_results(
+                *self.name_live_results(transcript, notes), content_type))
+            return
+        if 'rendered_notes' not in self.pipeline.values:
+            return
+        # Only the naming and rendering stages see a changed input
+        with self.pipeline_lock:
+            values = self.pipeline.run(
+                targets=['named_diarization', 'named_transcript', 'rendered_notes'],
+                speaker_names=self.speaker_names.as_dict())
+        self.root.after(0, lambda: self.display_results(
+            values['named_diarization'], values['named_transcript'],
+            values['rendered_notes'], values['content_type']))
     
     def start_processing(self):
         """Start processing in a separate thread"""
@@ -222,69 +379,93 @@ class AudioNotesGUI:
             messagebox.showerror("Error", "Please select an audio file first")
             return
         
-        # Get speaker names from UI
-        self.speaker_names = {}
-        if self.speaker1_var.get():
-            self.speaker_names["1"] = self.speaker1_var.get()
-        if self.speaker2_var.get():
-            self.speaker_names["2"] = self.speaker2_var.get()
-        if self.speaker3_var.get():
-            self.speaker_names["3"] = self.speaker3_var.get()
+        if self.speaker_editor is not None:
+            editor, self.speaker_editor = self.speaker_editor, None
+            editor.destroy()
+        self.live_results = None
+        self.processing = True
+        speaker_hints = self.read_speaker_hints()
         
         # Disable UI during processing
         self.process_btn.config(state='disabled')
         self.reset_btn.config(state='disabled')
         self.status_var.set("Processing...")
         self.progress.start()
+        # Transcribed segments are appended here as they arrive
+        self.transcription_output.delete(1.0, tk.END)
         
         # Start processing in background thread
-        process_thread = threading.Thread(target=self.process_audio, args=(self.current_file_path,))
+        process_thread = threading.Thread(target=self.process_audio,
+                                          args=(self.current_file_path, speaker_hints))
         process_thread.daemon = True
         process_thread.start()
     
-    def process_audio(self, file_path):
+    # Status text and the model each pipeline stage waits for
+    STAGE_STATUS = {
+        'prepare': ("Preparing audio file...", None),
+        'detect_speech': ("Detecting speech...", None),
+        'diarize': ("Performing speaker diarization...", 'diarization'),
+        'transcribe': ("Transcribing audio...", 'transcription'),
+        'align': ("Matching words to speakers...", None),
+        'name_speakers': ("Naming speakers...", None),
+        'classify': ("Classifying content type...", None),
+        'generate_notes': ("Generating notes...", 'llm'),
+        'render': ("Formatting notes...", None),
+    }
+    
+    def on_pipeline_stage(self, stage_name):
+        """Report a pipeline stage and wait for the model it needs"""
+        message, model = self.STAGE_STATUS.get(stage_name, (f"Running {stage_name}...", None))
+        self.update_status(message)
+        if model:
+            self.model_warmup.wait_for(model)
+    
+    def on_transcript_segment(self, segment):
+        """Append a freshly transcribed segment (called from the pipeline thread)"""
+        line = f"[{segment['start']:.1f}s - {segment['end']:.1f}s] {segment['text']}\n"
+        self.root.after(0, lambda: self.transcription_output.insert(tk.END, line))
+    
+    def process_audio(self, file_path, speaker_hints=None):
         """Process audio file in background thread"""
         try:
-            # Step 1: Audio preprocessing
-            self.update_status("Preparing audio file...")
-            processed_audio = self.audio_processor.prepare_file(file_path)
-            
-            # Step 2: Speaker diarization
-            self.update_status("Performing speaker diarization...")
-            if self.speaker_names:
-                diarization_results = self.diarization_manager.process_with_speaker_names(
-                    processed_audio, list(self.speaker_names.values()))
-            else:
-                diarization_results = self.diarization_manager.process_audio(processed_audio)
+            # Names saved for this recording, plus any edited since it was opened
+            speaker_names = SpeakerNames.for_recording(get_result_cache().audio_hash(file_path))
+            speaker_names.update(self.speaker_names)
             
-            # Step 3: Transcription
-            self.update_status("Transcribing audio...")
-            transcription_results = self.transcription_manager.transcribe_audio(processed_audio)
+            # Only stages whose inputs changed since the last run are
+            # recomputed, e.g. a new output format only re-renders the notes
+            with self.pipeline_lock:
+                values = self.pipeline.run(
+                    on_stage=self.on_pipeline_stage,
+                    file_path=file_path,
+                    speaker_names=speaker_names.as_dict(),
+                    speaker_hints=speaker_hints,
+                    output_format=self.output_format_var.get(),
+                    content_type_override=None,
+                )
             
-            # Step 4: Content classification
-            self.update_status("Classifying content type...")
-            content_type = self.content_classifier.classify_content(transcription_results)
+            diarization_results = values['named_diarization']
+            # Transcript segments attributed to (named) speakers
+            transcription_results = values['named_transcript']
+            notes = values['rendered_notes']
+            content_type = values['content_type']
             
-            # Step 5: Generate notes
-            self.update_status("Generating notes...")
-            output_format = self.output_format_var.get()
-            
-            # Generate notes based on selected format
-            if output_format == "markdown":
-                notes = self.note_generator.generate_markdown_notes(
-                    transcription_results, content_type, self.speaker_names)
-            elif output_format == "pdf":
-                notes = self.note_generator.generate_pdf_notes(
-                    transcription_results, content_type, self.speaker_names)
-            else:
-                notes = self.note_generator.generate_notes(
-                    transcription_results, content_type, self.speaker_names)
+            # One table row per speaker found, pre-filled with recognised voices
+            self.speaker_embeddings = values['speaker_embeddings']
+            labels = sorted({turn['speaker'] for turn in values['speaker_turns']}
+                            or set(values['diarization']), key=_label_order)
+            speaker_names.update(values['resolved_speaker_names'])
+            self.root.after(0, lambda: self.show_speakers(labels, speaker_names))
             
             # Display results
             self.root.after(0, lambda: self.display_results(diarization_results, transcription_results, 
                                                           notes, content_type))
             
-            self.update_status("Processing complete!")
+            status = "Processing complete!"
+            vad_stats = self.transcription_manager.last_vad_stats
+            if 'transcribe' in self.pipeline.last_run['ran'] and vad_stats:
+                status += f" Skipped {vad_stats['skipped_fraction']:.0%} silence."
+            self.update_status(status)
             
         except Exception as e:
             error_msg = f"Error during processing: {str(e)}"
@@ -294,6 +475,113 @@ class AudioNotesGUI:
             # Re-enable UI
             self.root.after(0, lambda: self.finish_processing())
     
+    def toggle_live(self):
+        """Start or stop live transcription"""
+        if self.live_session is not None:
+            self.live_stop.set()
+            if isinstance(self.live_source, MicrophoneSource):
+                self.live_source.stop()
+            self.live_btn.config(state='disabled')
+            self.update_status("Finishing live session...")
+            return
+        
+        file_path = self.current_file_path
+        if file_path and file_path.lower().endswith('.wav') and \
+                time.time() - os.path.getmtime(file_path) < 10:
+            # Still being recorded: follow the file as it grows
+            self.live_source = GrowingWavSource(file_path)
+            message = f"Live: following {os.path.basename(file_path)}"
+        elif file_path:
+            # Replay a recording at real-time speed, as if from a microphone
+            self.live_source = FileReplaySource(file_path)
+            message = f"Live: replaying {os.path.basename(file_path)}"
+        else:
+            self.live_source = MicrophoneSource()
+            message = "Live: listening to the microphone"
+        
+        self.reset_results()
+        self.live_results = None
+        self.speaker_embeddings = {}
+        self.transcription_output.tag_configure("partial", foreground="gray")
+        self.notebook.select(1)
+        self.live_stop = threading.Event()
+        self.live_session = RealtimeTranscriber(
+            self.transcription_manager, self.diarization_manager,
+            on_segment=self.on_live_segment, on_partial=self.on_live_partial)
+        
+        self.process_btn.config(state='disabled')
+        self.reset_btn.config(state='disabled')
+        self.live_btn.config(text="Stop Live")
+        self.update_status(message)
+        self.progress.start()
+        
+        live_thread = threading.Thread(target=self.run_live, daemon=True)
+        live_thread.start()
+    
+    def run_live(self):
+        """Run the live session in a background thread, then write notes"""
+        session = self.live_session
+        try:
+            segments = session.run(self.live_source, stop_event=self.live_stop)
+            if segments:
+                self.update_status("Generating notes from live session...")
+                transcript = SegmentStore.from_dicts(segments)
+                content_type = self.content_classifier.classify_content(transcript)
+                # Notes use speaker labels so renaming only re-renders them
+                notes = self.note_generator.generate_notes(SpeakerNames().apply_transcript(transcript),
+                                                           content_type)
+                self.live_results = (transcript, notes, content_type)
+                labels = sorted({segment['speaker'] for segment in segments if segment['speaker']},
+                                key=_label_order)
+                self.root.after(0, lambda: self.show_speakers(labels))
+                self.root.after(0, lambda: self.display_results(
+                    *self.name_live_results(transcript, notes), content_type))
+            self.update_status(f"Live session ended (max lag "
+                               f"{session.stats['max_lag_seconds']:.1f}s behind live)")
+        except Exception as e:
+            error_msg = f"Error during live transcription: {str(e)}"
+            self.update_status(error_msg)
+            messagebox.showerror("Live Error", error_msg)
+        finally:
+            self.root.after(0, self.finish_live)
+    
+    def name_live_results(self, transcript, notes):
+        """(speaker texts, transcript, rendered notes) of a live session with the current names"""
+        named_transcript = self.speaker_names.apply_transcript(transcript)
+        rendered = self.note_generator.render_notes(self.speaker_names.apply_notes(notes),
+                                                    self.output_format_var.get())
+        return speaker_texts(named_transcript), named_transcript, rendered
+    
+    def finish_live(self):
+        self.live_session = None
+        self.live_source = None
+        self.live_btn.config(text="Start Live", state='normal')
+        self.finish_processing()
+    
+    def on_live_segment(self, segment):
+        """Append a final live segment above the partial text"""
+        speaker = f"{segment['speaker']}: " if segment['speaker'] else ""
+        line = f"[{segment['start']:.1f}s - {segment['end']:.1f}s] {speaker}{segment['text']}\n"
+        
+        def append():
+            if self.transcription_output.tag_ranges("partial"):
+                self.transcription_output.insert("partial.first", line)
+            else:
+                self.transcription_output.insert(tk.END, line)
+            self.transcription_output.see(tk.END)
+        self.root.after(0, append)
+    
+    def on_live_partial(self, text):
+        """Replace the rolling not-yet-final text at the end of the transcript"""
+        def update():
+            ranges = self.transcription_output.tag_ranges("partial")
+            if ranges:
+                self.transcription_output.delete(*ranges)
+            if text:
+                self.transcription_output.insert(tk.END, f"... {text}", "partial")
+                self.transcription_output.see(tk.END)
+        self.root.after(0, update)
+    
     def display_results(self, diarization_results, transcription_results, notes, content_type):
         """Display processing results in GUI"""
         # Display diarization
@@ -304,7 +592,8 @@ class AudioNotesGUI:
         # Display transcription  
         self.transcription_output.delete(1.0, tk.END)
         for segment in transcription_results:
-            self.transcription_output.insert(tk.END, f"[{segment['start']:.1f}s - {segment['end']:.1f}s] {segment['text']}\n")
+            speaker = f"{segment['speaker']}: " if segment.get('speaker') else ""
+            self.transcription_output.insert(tk.END, f"[{segment['start']:.1f}s - {segment['end']:.1f}s] {speaker}{segment['text']}\n")
         
         # Display notes
         self.notes_output.delete(1.0, tk.END)
@@ -330,10 +619,11 @@ class AudioNotesGUI:
         """Reset entire application"""
         self.file_path_var.set("")
         self.current_file_path = None
-        self.speaker1_var.set("")
-        self.speaker2_var.set("")
-        self.speaker3_var.set("")
-        self.speaker_names = {}
+        self.show_speakers([], SpeakerNames())
+        self.speaker_embeddings = {}
+        self.live_results = None
+        self.min_speakers_var.set(0)
+        self.max_speakers_var.set(0)
         self.reset_results()
         self.status_var.set("Ready")
         self.progress.stop()
@@ -342,12 +632,18 @@ class AudioNotesGUI:
         
     def finish_processing(self):
         """Finalize processing and re-enable UI"""
+        self.processing = False
         self.progress.stop()
         self.process_btn.config(state='normal')
         self.reset_btn.config(state='normal')
 
+def _label_order(label):
+    """Sort numbered speaker labels numerically, others after them"""
+    return (0, int(label), "") if str(label).isdigit() else (1, 0, str(label))
+
 # Entry point
 if __name__ == "__main__":
     root = tk.Tk()
     app = AudioNotesGUI(root)
+    app.start_model_warmup()
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,310 @@
+# src/json_notes.py - Grammar-constrained JSON output for generated notes
+
+import json
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# Instruction appended to notes prompts; the grammar below enforces it
+NOTES_JSON_INSTRUCTION = (
+    "Respond with only a JSON object of the form "
+    '{"summary": "...", "key_points": ["..."], "action_items": ["..."], '
+    '"speaker_notes": {"Speaker Name": "..."}}'
+)
+
+_STRING, _LIST, _MAP = "string", "list", "map"
+
+# The notes schema as a fixed sequence of literals and values
+_DOCUMENT = (
+    '{', '"summary"', ':', _STRING, ',',
+    '"key_points"', ':', _LIST, ',',
+    '"action_items"', ':', _LIST, ',',
+    '"speaker_notes"', ':', _MAP, '}',
+)
+
+_WHITESPACE = ' \t\n\r'
+# Longest run of whitespace between JSON tokens, so a model can't stall
+# the constrained output with endless indentation
+MAX_WHITESPACE_RUN = 8
+_HEX = '0123456789abcdefABCDEF'
+
+
+def _string_step(state, ch):
+    """Advance inside a JSON string: 'in', 'esc' or 'u0'..'u3'; 'closed' at the end quote"""
+    if state == 'in':
+        if ch == '"':
+            return 'closed'
+        if ch == '\\':
+            return 'esc'
+        return None if ord(ch) < 0x20 else 'in'
+    if state == 'esc':
+        if ch in '"\\/bfnrt':
+            return 'in'
+        return 'u0' if ch == 'u' else None
+    # Four hex digits of a \u escape
+    if ch not in _HEX:
+        return None
+    digit = int(state[1]) + 1
+    return 'in' if digit == 4 else f'u{digit}'
+
+
+def _string_closer(state):
+    """Next character that moves a string towards its end quote"""
+    if state == 'in':
+        return '"'
+    if state == 'esc':
+        return '\\'
+    return '0'
+
+
+def grammar_step(state, ch):
+    """Next grammar state after one character, or None if ch is not allowed
+
+    A state is (item, part, string_state): the position in _DOCUMENT, the
+    position inside that item, and the state inside an open string. Values
+    and the parts of lists and maps may be separated by whitespace.
+    """
+    item, part, sub = state
+    if item == len(_DOCUMENT):
+        return None
+    piece = _DOCUMENT[item]
+
+    if piece == _STRING:
+        if part == 0:
+            if ch in _WHITESPACE:
+                return state
+            return (item, 1, 'in') if ch == '"' else None
+        sub = _string_step(sub, ch)
+        if sub is None:
+            return None
+        return (item + 1, 0, None) if sub == 'closed' else (item, 1, sub)
+
+    if piece == _LIST:
+        # 0: before '[', 1: after '[', 2: after ',', 3: in an item, 4: after an item
+        if part == 3:
+            sub = _string_step(sub, ch)
+            if sub is None:
+                return None
+            return (item, 4, None) if sub == 'closed' else (item, 3, sub)
+        if ch in _WHITESPACE:
+            return state
+        if part == 0:
+            return (item, 1, None) if ch == '[' else None
+        if part in (1, 2) and ch == '"':
+            return (item, 3, 'in')
+        if (part == 1 or part == 4) and ch == ']':
+            return (item + 1, 0, None)
+        if part == 4 and ch == ',':
+            return (item, 2, None)
+        return None
+
+    if piece == _MAP:
+        # 0: before '{', 1: after '{', 2: after ',', 3: in a key, 4: after a key,
+        # 5: after ':', 6: in a value, 7: after a value
+        if part in (3, 6):
+            sub = _string_step(sub, ch)
+            if sub is None:
+                return None
+            return (item, part + 1, None) if sub == 'closed' else (item, part, sub)
+        if ch in _WHITESPACE:
+            return state
+        if part == 0:
+            return (item, 1, None) if ch == '{' else None
+        if part in (1, 2, 5) and ch == '"':
+            return (item, 6 if part == 5 else 3, 'in')
+        if (part == 1 or part == 7) and ch == '}':
+            return (item + 1, 0, None)
+        if part == 4 and ch == ':':
+            return (item, 5, None)
+        if part == 7 and ch == ',':
+            return (item, 2, None)
+        return None
+
+    # Literal punctuation or key
+    if part == 0 and ch in _WHITESPACE:
+        return state
+    if ch != piece[part]:
+        return None
+    return (item + 1, 0, None) if part + 1 == len(piece) else (item, part + 1, None)
+
+
+def _closing_char(state):
+    """Next character of the shortest text that completes the document"""
+    item, part, sub = state
+    piece = _DOCUMENT[item]
+    if piece == _STRING:
+        return '"' if part == 0 else _string_closer(sub)
+    if piece == _LIST:
+        return {0: '[', 1: ']', 2: '"', 4: ']'}.get(part) or _string_closer(sub)
+    if piece == _MAP:
+        return {0: '{', 1: '}', 2: '"', 4: ':', 5: '"', 7: '}'}.get(part) or _string_closer(sub)
+    return piece[part]
+
+
+class NotesStreamParser:
+    """Incremental parser for notes JSON as it is generated
+
+    Text is fed in pieces (e.g. one token at a time); each character is
+    checked against the notes grammar, so validity is known after every
+    token and the end of the object is seen the moment it closes. notes()
+    is available at any point: an unfinished object is closed with the
+    shortest valid completion instead of being re-generated.
+    """
+
+    def __init__(self):
+        self.state = (0, 0, None)
+        self.whitespace_run = 0
+        self.text = []
+        self.rejected = False
+
+    @property
+    def complete(self):
+        return self.state[0] == len(_DOCUMENT)
+
+    @staticmethod
+    def _step(state, whitespace_run, ch):
+        """grammar_step that also limits whitespace between JSON tokens"""
+        if state[2] is None and ch in _WHITESPACE:
+            if whitespace_run >= MAX_WHITESPACE_RUN:
+                return None, whitespace_run
+            whitespace_run += 1
+        else:
+            whitespace_run = 0
+        return grammar_step(state, ch), whitespace_run
+
+    def accepts(self, text):
+        """Whether text can follow what has been fed so far"""
+        state, run = self.state, self.whitespace_run
+        for ch in text:
+            state, run = self._step(state, run, ch)
+            if state is None:
+                return False
+        return True
+
+    def feed(self, text):
+        """Consume text up to the end of the object or the first invalid character
+
+        Returns False once the object is complete or text was rejected.
+        """
+        if self.complete or self.rejected:
+            return False
+        for ch in text:
+            state, run = self._step(self.state, self.whitespace_run, ch)
+            if state is None:
+                self.rejected = True
+                return False
+            self.state, self.whitespace_run = state, run
+            self.text.append(ch)
+            if self.complete:
+                return False
+        return True
+
+    def json_text(self):
+        """Fed text completed into a valid JSON document"""
+        text = list(self.text)
+        state = self.state
+        while state[0] < len(_DOCUMENT):
+            ch = _closing_char(state)
+            state = grammar_step(state, ch)
+            text.append(ch)
+        return "".join(text)
+
+    def notes(self):
+        """Notes dict from what has been fed so far"""
+        data = json.loads(self.json_text())
+        return {
+            "summary": data["summary"].strip(),
+            "key_points": [point.strip() for point in data["key_points"] if point.strip()],
+            "action_items": [item.strip() for item in data["action_items"] if item.strip()],
+            "speaker_notes": {speaker.strip(): text.strip()
+                              for speaker, text in data["speaker_notes"].items() if text.strip()},
+        }
+
+
+def parse_notes(generated_text):
+    """Notes dict from generated notes JSON
+
+    Text before the first '{' is skipped; anything the grammar rejects ends
+    the object there.
+    """
+    parser = NotesStreamParser()
+    start = generated_text.find('{')
+    if start >= 0:
+        parser.feed(generated_text[start:])
+    return parser.notes()
+
+
+_token_texts = {}
+
+
+def _vocabulary_texts(tokenizer):
+    """Decoded text of every token id, computed once per tokenizer"""
+    key = (getattr(tokenizer, 'name_or_path', None), len(tokenizer))
+    if key not in _token_texts:
+        texts = tokenizer.batch_decode([[token_id] for token_id in range(len(tokenizer))])
+        for token_id in tokenizer.all_special_ids:
+            texts[token_id] = None
+        _token_texts[key] = texts
+    return _token_texts[key]
+
+
+class NotesJSONLogitsProcessor:
+    """Constrain generation to the notes JSON schema, then stop
+
+    At each step only the top_k most likely tokens are checked against the
+    grammar (most steps need one or two checks); tokens that would break the
+    JSON are masked out, widening the search only when none of those fits.
+    Once the object closes, end-of-sequence is the only allowed token, so no
+    tokens are spent after the closing brace and no retries are needed.
+    """
+
+    def __init__(self, tokenizer, eos_token_ids, top_k=32):
+        self.token_texts = _vocabulary_texts(tokenizer)
+        if isinstance(eos_token_ids, int):
+            eos_token_ids = [eos_token_ids]
+        self.eos_token_ids = [token_id for token_id in eos_token_ids if token_id is not None]
+        self.top_k = top_k
+        self.prompt_length = None
+        self.parsers = None
+
+    def __call__(self, input_ids, scores):
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+            self.parsers = [NotesStreamParser() for _ in range(input_ids.shape[0])]
+
+        masked = torch.full_like(scores, float('-inf'))
+        for row, parser in enumerate(self.parsers):
+            # The previous step's token (the prompt on the first call)
+            if input_ids.shape[1] > self.prompt_length:
+                text = self.token_texts[int(input_ids[row, -1])]
+                if text:
+                    parser.feed(text)
+
+            if parser.complete or parser.rejected:
+                allowed = self.eos_token_ids
+            else:
+                allowed = self._allowed_tokens(parser, scores[row])
+
+            masked[row, allowed] = scores[row, allowed]
+            if torch.isinf(masked[row, allowed]).all():
+                # Sampling filters may have removed every valid token
+                masked[row, allowed] = 0.0
+        return masked
+
+    def _allowed_tokens(self, parser, row_scores):
+        """Ids of likely tokens that keep the output valid"""
+        order = torch.argsort(row_scores, descending=True)
+        for first in range(0, len(order), self.top_k):
+            allowed = [int(token_id) for token_id in order[first:first + self.top_k]
+                       if self._valid(parser, int(token_id))]
+            if allowed:
+                return allowed
+        return self.eos_token_ids
+
+    def _valid(self, parser, token_id):
+        if token_id >= len(self.token_texts):
+            return False
+        text = self.token_texts[token_id]
+        return bool(text) and parser.accepts(text)
@@ -0,0 +1,119 @@
+# src/llm_batcher.py - Batch LLM prompts from concurrent callers into shared generate calls
+#
+# A batcher only sees prompts from its own process. batch.py's worker
+# processes each load their own model and batcher and handle one file at a
+# time, so prompts from different files are never batched together there;
+# batches form from the map-reduce parts, note sets and concurrent threads
+# of a single process.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class LLMBatcher:
+    """Collects pending prompts and runs them through the model in batches
+
+    One prompt per generate call leaves the CPU doing matrix-vector work;
+    a batch turns every decoding step into a matrix-matrix product at
+    little extra cost. Prompts submitted from any thread of this process
+    (map-reduce parts, outlines, concurrent note requests) are queued; a worker thread waits up
+    to max_wait_seconds for a batch to fill, sorts what is pending by token
+    length so each batch pads its prompts to similar lengths, and calls
+    generate_batch(prompts, **params) with at most max_batch_size prompts.
+    Only prompts with identical generation parameters share a batch.
+    """
+
+    def __init__(self, generate_batch, max_batch_size=None, max_wait_seconds=None,
+                 prompt_length=len, idle_seconds=30.0):
+        if max_batch_size is None:
+            max_batch_size = int(os.environ.get('AUDIO_NOTES_LLM_BATCH_SIZE', 8))
+        if max_wait_seconds is None:
+            max_wait_seconds = float(os.environ.get('AUDIO_NOTES_LLM_BATCH_WAIT_MS', 50)) / 1000
+        self.generate_batch = generate_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self.prompt_length = prompt_length
+        # The worker exits after this long without prompts, so an idle
+        # batcher holds no thread
+        self.idle_seconds = idle_seconds
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.stats = {'prompts': 0, 'batches': 0, 'padding_tokens': 0}
+
+    def submit(self, prompt, **params):
+        """Queue one prompt; returns a Future for its generated text"""
+        future = Future()
+        with self._lock:
+            self._queue.put((prompt, params, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                self._worker.start()
+        return future
+
+    def generate(self, prompts, **params):
+        """Generated texts for a list of prompts, in order"""
+        futures = [self.submit(prompt, **params) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            try:
+                pending = [self._queue.get(timeout=self.idle_seconds)]
+            except queue.Empty:
+                with self._lock:
+                    # A prompt submitted while timing out is still served
+                    if self._queue.empty():
+                        self._worker = None
+                        return
+                continue
+
+            # Give other callers a moment to fill the batch
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Everything already waiting is sorted together, so long runs of
+            # prompts (e.g. map-reduce parts) batch by length across callers
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._run_pending(pending)
+
+    def _run_pending(self, pending):
+        """Group pending prompts by parameters and length and run the batches"""
+        groups = {}
+        for prompt, params, future in pending:
+            if future.set_running_or_notify_cancel():
+                key = tuple(sorted(params.items()))
+                groups.setdefault(key, []).append((self.prompt_length(prompt), prompt, future))
+
+        for key, requests in groups.items():
+            requests.sort(key=lambda request: request[0])
+            for first in range(0, len(requests), self.max_batch_size):
+                batch = requests[first:first + self.max_batch_size]
+                try:
+                    texts = self.generate_batch([prompt for _, prompt, _ in batch], **dict(key))
+                except Exception as e:
+                    for _, _, future in batch:
+                        future.set_exception(e)
+                    continue
+
+                longest = batch[-1][0]
+                self.stats['prompts'] += len(batch)
+                self.stats['batches'] += 1
+                self.stats['padding_tokens'] += sum(longest - length for length, _, _ in batch)
+                for (_, _, future), text in zip(batch, texts):
+                    future.set_result(text)
@@ -0,0 +1,202 @@
+# src/llm_benchmark.py - Compare note-generation LLM backends on speed, memory and output
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model_utils import _current_rss_bytes
+
+# What the less obvious backends actually run, printed under the report
+BACKEND_NOTES = {
+    "int8": "torch quantize_dynamic: nn.Linear layers only, int8 weights and activations "
+            "quantized per call, CPU only; the rest of the model stays fp32",
+    "bf16": "bfloat16 weights and activations",
+    "onnx": "ONNX Runtime export of the fp32 model",
+}
+
+# Used when no transcript is given: a short meeting with decisions and owners
+SAMPLE_TRANSCRIPT = [
+    "1: Thanks for joining. Today we need to settle the launch date and the budget.",
+    "2: Engineering can be feature complete by May 3rd if we drop the offline mode.",
+    "1: Marketing needs two weeks after that, so launch would be May 17th.",
+    "3: The budget is 40 thousand, and the venue alone takes 15 of it.",
+    "2: Then let's do the launch online and keep the venue money for ads.",
+    "1: Agreed. Ana, can you cancel the venue hold by Friday?",
+    "3: Yes. I'll also send the revised budget to finance on Monday.",
+    "2: I'll write up what offline mode would need for the next release.",
+]
+
+
+def load_transcript(path):
+    """Transcript segments from a batch result JSON or a text file (one segment per line)"""
+    if path is None:
+        lines = SAMPLE_TRANSCRIPT
+    elif path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            result = json.load(f)
+        return result.get('speaker_transcript') or result['transcription']
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.strip()]
+    return [{'start': index * 5.0, 'end': index * 5.0 + 4.5, 'text': line}
+            for index, line in enumerate(lines)]
+
+
+def _run_backend(backend, model_name, segments, max_new_tokens, threads, results):
+    """Measure one backend; runs in a fresh process so memory numbers are its own"""
+    try:
+        import torch
+        from note_generator import NoteGenerator, resolve_llm_backend
+
+        if threads:
+            torch.set_num_threads(threads)
+
+        rss_before = _current_rss_bytes()
+        ng = NoteGenerator()
+        start = time.time()
+        ng.load_llm_model(model_name, backend=backend)
+        load_seconds = time.time() - start
+        if ng.model is None:
+            results.put({'backend': backend, 'error': "model failed to load"})
+            return
+        rss_loaded = _current_rss_bytes()
+
+        prompt = ng._create_prompt(segments, "meeting", None)
+        inputs = ng.tokenizer(prompt, return_tensors="pt")
+        prompt_tokens = inputs['input_ids'].shape[1]
+
+        with torch.no_grad():
+            start = time.time()
+            ng.model(**inputs)
+            prefill_seconds = time.time() - start
+
+            # Greedy and fixed-length, so every backend does the same work
+            start = time.time()
+            output = ng.model.generate(**inputs, max_new_tokens=max_new_tokens,
+                                       min_new_tokens=max_new_tokens, do_sample=False,
+                                       pad_token_id=ng.tokenizer.pad_token_id)
+            generate_seconds = time.time() - start
+
+        # Notes as the application produces them
+        start = time.time()
+        notes_text = ng._complete([prompt], max_new_tokens=512, do_sample=False, json_notes=True)[0]
+        notes_seconds = time.time() - start
+
+        results.put({
+            'backend': backend,
+            # int8 and onnx fall back when unavailable; report what really ran
+            'runs_as': resolve_llm_backend(backend),
+            'load_seconds': load_seconds,
+            'model_mb': (rss_loaded - rss_before) / 2**20,
+            'peak_rss_mb': _current_rss_bytes() / 2**20,
+            'prompt_tokens': prompt_tokens,
+            'prefill_tokens_per_second': prompt_tokens / prefill_seconds,
+            # Decoding rate, with the prefill time taken out
+            'decode_tokens_per_second': max_new_tokens / max(generate_seconds - prefill_seconds, 1e-6),
+            'tokens': output[0, prompt_tokens:].tolist(),
+            'notes_seconds': notes_seconds,
+            'notes': ng._parse_generated_notes(notes_text),
+        })
+    except Exception as e:
+        results.put({'backend': backend, 'error': str(e)})
+
+
+def token_agreement(tokens, reference):
+    """Share of positions where greedy output matches the reference, and the common prefix length"""
+    if not reference:
+        return 0.0, 0
+    matches = sum(a == b for a, b in zip(tokens, reference))
+    prefix = 0
+    for a, b in zip(tokens, reference):
+        if a != b:
+            break
+        prefix += 1
+    return matches / len(reference), prefix
+
+
+def run_benchmark(backends, model_name, segments, max_new_tokens=64, threads=None):
+    """Results per backend, each measured in its own process"""
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        print(f"Benchmarking {backend}...")
+        queue = context.Queue()
+        process = context.Process(target=_run_backend,
+                                  args=(backend, model_name, segments, max_new_tokens, threads, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        if 'error' in result:
+            print(f"⚠ {backend}: {result['error']}")
+        results.append(result)
+
+    # Output quality is measured against the first backend (fp32 by default)
+    reference = results[0].get('tokens') if results else None
+    baseline = results[0] if results and 'error' not in results[0] else None
+    for result in results:
+        if 'error' in result:
+            continue
+        result['agreement'], result['common_prefix'] = token_agreement(result['tokens'], reference or [])
+        if baseline:
+            result['decode_speedup'] = (result['decode_tokens_per_second']
+                                        / baseline['decode_tokens_per_second'])
+            result['memory_ratio'] = result['model_mb'] / max(baseline['model_mb'], 1e-6)
+    return results
+
+
+def print_report(results):
+    """Print one row per backend"""
+    print(f"\n{'backend':<8} {'load s':>7} {'model MB':>9} {'prefill t/s':>12} {'decode t/s':>11} "
+          f"{'speedup':>8} {'memory':>7} {'agree':>6}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']:<8} failed: {result['error']}")
+            continue
+        label = result['backend']
+        if result['runs_as'] != label:
+            label = f"{label}->{result['runs_as']}"
+        print(f"{label:<8} {result['load_seconds']:>7.1f} {result['model_mb']:>9.0f} "
+              f"{result['prefill_tokens_per_second']:>12.1f} {result['decode_tokens_per_second']:>11.1f} "
+              f"{result.get('decode_speedup', 1.0):>7.2f}x {result.get('memory_ratio', 1.0):>6.2f}x "
+              f"{result['agreement']:>6.0%}")
+    for backend in sorted({result.get('runs_as') for result in results} & set(BACKEND_NOTES)):
+        print(f"  {backend}: {BACKEND_NOTES[backend]}")
+
+    for result in results:
+        if 'error' not in result:
+            notes = result['notes']
+            print(f"\n[{result['backend']}] {notes['summary']}")
+            for item in notes['action_items']:
+                print(f"  - {item}")
+
+
+def main(argv=None):
+    """Command line entry point for the LLM backend benchmark"""
+    parser = argparse.ArgumentParser(
+        description="Compare note-generation LLM backends: speed, memory and output agreement")
+    parser.add_argument('--backends', default='fp32,int8',
+                        help="Comma-separated backends; the first is the quality reference")
+    parser.add_argument('--model', default="Qwen/Qwen2.5-1.5B-Instruct", help="LLM to load")
+    parser.add_argument('--transcript', default=None,
+                        help="Batch result JSON or text file with one segment per line")
+    parser.add_argument('--max-new-tokens', type=int, default=64,
+                        help="Tokens generated for the speed and agreement measurement")
+    parser.add_argument('--threads', type=int, default=None, help="Torch threads")
+    parser.add_argument('--json', default=None, help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    results = run_benchmark(backends, args.model, load_transcript(args.transcript),
+                            args.max_new_tokens, args.threads)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 1 if any('error' in result for result in results) else 0
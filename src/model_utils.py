@@ -1,7 +1,12 @@
 # src/model_utils.py - Utility functions for handling embedded models
 
+import gc
+import hashlib
 import os
 import sys
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 
 
@@ -28,28 +33,167 @@ def is_running_from_executable():
 
 def get_model_path(model_name):
     """
-    Get the path to a model file, checking both embedded and local locations
+    Get the path to a model file or directory under models/, checking the
+    embedded bundle, AUDIO_NOTES_MODELS_DIR, the working directory and the
+    project directory in that order
     """
+    candidates = []
     # First check if we're running from executable
     if is_running_from_executable():
         # Look for model in embedded resources
-        embedded_path = get_resource_path(os.path.join("models", model_name))
-        if os.path.exists(embedded_path):
-            return embedded_path
-    
-    # Fall back to local path
-    local_path = os.path.join("models", model_name)
-    if os.path.exists(local_path):
-        return local_path
+        candidates.append(get_resource_path(os.path.join("models", model_name)))
+    
+    if os.environ.get("AUDIO_NOTES_MODELS_DIR"):
+        candidates.append(os.path.join(os.environ["AUDIO_NOTES_MODELS_DIR"], model_name))
+    
+    # Fall back to local paths
+    candidates.append(os.path.join("models", model_name))
+    candidates.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "models", model_name))
+    
+    for path in candidates:
+        # Empty placeholder files don't count as models
+        if os.path.isdir(path) or (os.path.isfile(path) and os.path.getsize(path) > 0):
+            return path
         
     # If not found anywhere, return None
     return None
 
 
+def offline_mode():
+    """
+    Whether models must load without network access (AUDIO_NOTES_OFFLINE=1,
+    or the Hugging Face offline variables)
+    """
+    return any(os.environ.get(name, "").lower() in ("1", "true", "yes")
+               for name in ("AUDIO_NOTES_OFFLINE", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"))
+
+
+def load_pretrained(load, model_id, **kwargs):
+    """
+    Call a from_pretrained-style loader for a Hugging Face model id
+    
+    A copy under models/<model_id> (e.g. models/Qwen/Qwen2.5-1.5B-Instruct)
+    is used directly. Otherwise the local hub cache is tried first and the
+    network only if that fails and offline mode is off.
+    """
+    local_path = get_model_path(model_id)
+    if local_path:
+        return load(local_path, local_files_only=True, **kwargs)
+    try:
+        return load(model_id, local_files_only=True, **kwargs)
+    except (OSError, ValueError):
+        if offline_mode():
+            raise
+        return load(model_id, **kwargs)
+
+
+def load_torch_checkpoint(path, map_location="cpu"):
+    """
+    Load a torch checkpoint with its tensors memory-mapped from the file
+    
+    Pages are read on first use and stay in the page cache, where every
+    process loading the same file shares them, as long as the tensors are
+    used in place (load_state_dict(..., assign=True) with matching dtypes)
+    rather than copied into the model's own parameters.
+    """
+    import torch
+    try:
+        return torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+    except (TypeError, RuntimeError):
+        # torch < 2.1, or a legacy (non-zip) checkpoint that can't be mapped
+        return torch.load(path, map_location=map_location)
+
+
+def float32_checkpoint(path):
+    """
+    Path of a float32 copy of a torch checkpoint, written to the cache once
+    
+    Half-precision weights are copied into private float32 tensors when a
+    float32 model loads them, so mapping them saves nothing; a float32 copy
+    can be mapped and used as the model's parameters directly.
+    """
+    import torch
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    output_file = os.path.join(get_cache_dir("checkpoints"), f"{Path(path).stem}-fp32-{digest}.pt")
+    if os.path.exists(output_file):
+        return output_file
+    
+    def to_float32(value):
+        if isinstance(value, dict):
+            return {name: to_float32(item) for name, item in value.items()}
+        if isinstance(value, torch.Tensor) and value.is_floating_point():
+            return value.float()
+        return value
+    
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        torch.save(to_float32(load_torch_checkpoint(path)), temp_file)
+        os.replace(temp_file, output_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return output_file
+
+
+_thread_budget = threading.local()
+
+
+def get_thread_budget():
+    """
+    CPU threads the calling thread's work may use
+    
+    Inside a pipeline stage this is the stage's share of the pipeline's
+    budget; elsewhere it is torch's thread count (or the CPU count).
+    """
+    threads = getattr(_thread_budget, 'threads', None)
+    if threads:
+        return threads
+    try:
+        import torch
+        return torch.get_num_threads()
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def set_thread_budget(threads):
+    """Set the calling thread's CPU thread budget (None to clear it)"""
+    _thread_budget.threads = threads
+
+
+def get_cache_dir(name):
+    """
+    Get (and create) a cache directory for derived files such as converted audio.
+    Uses AUDIO_NOTES_CACHE_DIR if set, otherwise ~/.cache/audio_notes
+    """
+    base_dir = os.environ.get("AUDIO_NOTES_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "audio_notes")
+    cache_dir = os.path.join(base_dir, name)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def configure_offline_mode():
+    """
+    In offline mode, keep the Hugging Face libraries off the network; must
+    run before they are imported
+    """
+    if offline_mode():
+        # Read by huggingface_hub when it is first imported
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        print("Offline mode - models load from models/ and local caches only")
+
+
 def setup_model_paths():
     """
-    Configure paths for models when running from executable
+    Configure paths for models when running from executable, and keep the
+    Hugging Face libraries off the network in offline mode
     """
+    configure_offline_mode()
+    
     if is_running_from_executable():
         # In PyInstaller, we need to handle model paths properly
         print("Running from executable - using embedded models")
@@ -60,4 +204,230 @@ def setup_model_paths():
             sys.path.insert(0, models_path)
             
     else:
-        print("Running from source - using local models")
\ No newline at end of file
+        print("Running from source - using local models")
+
+
+class ModelHandle:
+    """Shared reference to a model held by the ModelRegistry"""
+
+    def __init__(self, registry, key, model):
+        self._registry = registry
+        self.key = key
+        self.model = model
+        self._released = False
+
+    def release(self):
+        """Give the reference back so the model can be evicted when idle"""
+        if not self._released:
+            self._released = True
+            self._registry.release(self.key)
+
+    def __enter__(self):
+        return self.model
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models with reference counts and LRU eviction
+
+    Models are keyed by (model name, size, dtype, device). The first
+    acquire() runs the loader, later ones share the same object. Idle models
+    (no outstanding handles) are evicted least-recently-used first whenever
+    the resident total goes over the RAM budget.
+    """
+
+    def __init__(self, ram_budget_mb=None):
+        if ram_budget_mb is None:
+            env_budget = os.environ.get("AUDIO_NOTES_MODEL_RAM_MB")
+            ram_budget_mb = float(env_budget) if env_budget else None
+        self.ram_budget_mb = ram_budget_mb
+        self._entries = OrderedDict()  # key -> entry dict, least recently used first
+        self._loading = {}  # key -> threading.Event for loads in progress
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(name, size=None, dtype=None, device=None):
+        """Build the registry key for a model"""
+        return (name, size, str(dtype) if dtype is not None else None, device)
+
+    def acquire(self, name, loader, size=None, dtype=None, device=None):
+        """Return a ModelHandle, loading the model with loader() on first use"""
+        key = self.make_key(name, size, dtype, device)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry['refs'] += 1
+                    entry['last_used'] = time.time()
+                    self._entries.move_to_end(key)
+                    return ModelHandle(self, key, entry['model'])
+
+                loading = self._loading.get(key)
+                if loading is None:
+                    # This thread does the load, others wait on the event
+                    loading = threading.Event()
+                    self._loading[key] = loading
+                    break
+
+            loading.wait()
+
+        try:
+            rss_before = _current_rss_bytes()
+            start = time.time()
+            model = loader()
+            load_time = time.time() - start
+            resident_bytes = _estimate_resident_bytes(model)
+            if not resident_bytes:
+                resident_bytes = max(0, _current_rss_bytes() - rss_before)
+
+            with self._lock:
+                self._entries[key] = {
+                    'model': model,
+                    'refs': 1,
+                    'load_time_s': load_time,
+                    'resident_bytes': resident_bytes,
+                    'last_used': time.time(),
+                }
+                self._evict_over_budget()
+
+            print(f"✓ Registered model {_format_key(key)} "
+                  f"(loaded in {load_time:.1f}s, ~{resident_bytes / 2**20:.0f} MB)")
+            return ModelHandle(self, key, model)
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def release(self, key):
+        """Drop one reference to a model"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['refs'] = max(0, entry['refs'] - 1)
+            entry['last_used'] = time.time()
+            self._evict_over_budget(warn=False)
+
+    def is_loaded(self, name, size=None, dtype=None, device=None):
+        """Check whether a model is currently resident"""
+        with self._lock:
+            return self.make_key(name, size, dtype, device) in self._entries
+
+    def set_ram_budget(self, ram_budget_mb):
+        """Change the RAM budget and evict idle models that no longer fit"""
+        with self._lock:
+            self.ram_budget_mb = ram_budget_mb
+            self._evict_over_budget()
+
+    def evict_idle(self):
+        """Evict every model that has no outstanding handles"""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e['refs'] == 0]:
+                self._evict(key)
+
+    def resident_bytes(self):
+        """Total estimated resident size of all registered models"""
+        with self._lock:
+            return sum(e['resident_bytes'] for e in self._entries.values())
+
+    def report(self):
+        """Per-model statistics: references, load time and resident size"""
+        with self._lock:
+            return [
+                {
+                    'name': key[0],
+                    'size': key[1],
+                    'dtype': key[2],
+                    'device': key[3],
+                    'refs': entry['refs'],
+                    'load_time_s': round(entry['load_time_s'], 3),
+                    'resident_mb': round(entry['resident_bytes'] / 2**20, 1),
+                    'last_used': entry['last_used'],
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def _evict_over_budget(self, warn=True):
+        """Evict idle models, least recently used first, until under budget"""
+        if self.ram_budget_mb is None:
+            return
+        budget_bytes = self.ram_budget_mb * 2**20
+        for key in list(self._entries):
+            if self.resident_bytes() <= budget_bytes:
+                return
+            if self._entries[key]['refs'] == 0:
+                self._evict(key)
+        if warn and self.resident_bytes() > budget_bytes:
+            print(f"⚠ Warning: Models in use exceed the RAM budget "
+                  f"({self.resident_bytes() / 2**20:.0f} MB > {self.ram_budget_mb:.0f} MB)")
+
+    def _evict(self, key):
+        entry = self._entries.pop(key)
+        entry['model'] = None
+        gc.collect()
+        print(f"Evicted idle model {_format_key(key)} (~{entry['resident_bytes'] / 2**20:.0f} MB)")
+
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """Return the process-wide ModelRegistry"""
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry()
+        return _model_registry
+
+
+def _format_key(key):
+    return "/".join(str(part) for part in key if part is not None)
+
+
+def _current_rss_bytes():
+    """Resident set size of this process, or 0 if it can't be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+
+def _estimate_resident_bytes(model, _seen=None, _depth=0):
+    """Sum parameter and buffer sizes of torch modules reachable from model"""
+    if _seen is None:
+        _seen = set()
+    if model is None or _depth > 2 or id(model) in _seen:
+        return 0
+    _seen.add(id(model))
+
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        try:
+            tensors = list(model.parameters()) + list(model.buffers())
+            # Dynamically quantized layers keep packed weights outside parameters()
+            if hasattr(model, "modules"):
+                tensors += [module.weight() for module in model.modules()
+                            if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None))]
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+
+    if isinstance(model, dict):
+        children = model.values()
+    elif isinstance(model, (list, tuple)):
+        children = model
+    elif hasattr(model, "__dict__"):
+        # Pipelines wrap their modules in attributes
+        children = vars(model).values()
+    else:
+        return 0
+
+    return sum(_estimate_resident_bytes(child, _seen, _depth + 1) for child in children)
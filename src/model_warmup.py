@@ -0,0 +1,102 @@
+# src/model_warmup.py - Load all models concurrently in the background
+
+import os
+import sys
+import threading
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+class ModelWarmup:
+    """Loads the diarization, transcription and LLM models in parallel threads
+
+    Each model gets its own thread, so the wait before the first result is
+    bounded by the slowest single load instead of the sum of all three.
+    The managers share their models through the model registry, so loading
+    here warms up every later user as well.
+    """
+
+    MODEL_LABELS = {
+        'diarization': "Diarization",
+        'transcription': "Transcription",
+        'llm': "Notes LLM",
+    }
+
+    def __init__(self, status_callback=None):
+        # status_callback(name, state, elapsed_seconds) is called from the
+        # loading threads whenever a model changes state
+        self.status_callback = status_callback
+        self.states = {name: 'pending' for name in self.MODEL_LABELS}
+        self.load_times = {}
+        self._events = {name: threading.Event() for name in self.MODEL_LABELS}
+        self._threads = []
+
+    def start(self, diarization_manager, transcription_manager, note_generator):
+        """Start loading every model in its own daemon thread"""
+        loaders = {
+            'diarization': (diarization_manager.load_model,
+                            lambda: diarization_manager.pipeline is not None),
+            'transcription': (transcription_manager.load_model,
+                              lambda: transcription_manager.model is not None),
+            'llm': (note_generator.load_llm_model,
+                    lambda: note_generator.llm_pipeline is not None),
+        }
+
+        for name, (load, is_loaded) in loaders.items():
+            thread = threading.Thread(target=self._load, args=(name, load, is_loaded),
+                                      name=f"warmup-{name}")
+            thread.daemon = True
+            self._threads.append(thread)
+            thread.start()
+        return self
+
+    def _load(self, name, load, is_loaded):
+        """Load one model and report its state"""
+        start = time.time()
+        self._set_state(name, 'loading', 0.0)
+        try:
+            load()
+            state = 'ready' if is_loaded() else 'failed'
+        except Exception as e:
+            print(f"⚠ Warning: Warm-up of {name} model failed: {e}")
+            state = 'failed'
+
+        self.load_times[name] = time.time() - start
+        self._set_state(name, state, self.load_times[name])
+        self._events[name].set()
+
+    def _set_state(self, name, state, elapsed):
+        self.states[name] = state
+        if self.status_callback:
+            try:
+                self.status_callback(name, state, elapsed)
+            except Exception as e:
+                print(f"Warning: Could not report warm-up status: {e}")
+
+    def wait_for(self, name, timeout=None):
+        """Block until the named model has finished loading (or failed)
+
+        Returns immediately if warm-up was never started for it.
+        """
+        if not self._threads:
+            return True
+        return self._events[name].wait(timeout)
+
+    def wait(self, timeout=None):
+        """Block until every model has finished loading"""
+        deadline = None if timeout is None else time.time() + timeout
+        for name in self._events:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            if not self.wait_for(name, remaining):
+                return False
+        return True
+
+    def summary_text(self):
+        """One-line readiness summary for a status bar"""
+        symbols = {'pending': "…", 'loading': "loading", 'ready': "✓", 'failed': "✗"}
+        return " | ".join(
+            f"{label} {symbols[self.states[name]]}"
+            for name, label in self.MODEL_LABELS.items()
+        )
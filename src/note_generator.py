@@ -2,15 +2,53 @@
 
 import re
 from datetime import timedelta
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
+from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM, LogitsProcessorList
+try:
+    from transformers import DynamicCache
+except ImportError:
+    # transformers < 4.36 only has the legacy tuple cache
+    DynamicCache = None
 import torch
 import sys
 import os
+import importlib.util
+import shutil
 
 # Add src to path for imports  
 sys.path.insert(0, os.path.dirname(__file__))
 
-from model_utils import get_resource_path, is_running_from_executable
+from model_utils import (get_resource_path, is_running_from_executable, get_model_registry, load_pretrained,
+                         get_model_path, get_cache_dir)
+from result_cache import get_result_cache, data_hash
+from segment_store import segment_texts
+from llm_batcher import LLMBatcher
+from json_notes import NOTES_JSON_INSTRUCTION, NotesJSONLogitsProcessor, parse_notes
+
+# Ways to run the LLM: fp32/fp16/bf16 weights, int8 dynamically quantized
+# Linear layers (CPU only), or an exported ONNX Runtime model. There is no
+# int4 backend
+LLM_BACKENDS = ("auto", "fp32", "fp16", "bf16", "int8", "onnx")
+
+
+def resolve_llm_backend(backend):
+    """Backend that will actually run for a requested one
+    
+    "auto" is fp16 on CUDA and fp32 otherwise; int8 needs the CPU and onnx
+    needs optimum[onnxruntime], falling back to fp32 without them.
+    """
+    backend = (backend or "auto").lower()
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend {backend!r}; choose from {', '.join(LLM_BACKENDS)}")
+    if backend == "auto":
+        return "fp16" if torch.cuda.is_available() else "fp32"
+    if backend == "fp16" and not torch.cuda.is_available():
+        return "fp32"
+    if backend == "int8" and torch.cuda.is_available():
+        return "fp16"
+    if backend == "onnx" and importlib.util.find_spec("optimum") is None:
+        return "fp32"
+    return backend
+
 
 class NoteGenerator:
     def __init__(self):
@@ -19,50 +57,147 @@ class NoteGenerator:
         self.model_name = "Qwen/Qwen2.5-1.5B-Instruct"  # Default model
         self.tokenizer = None
         self.model = None
+        self.batcher = None
+        self._model_handle = None
+        self._last_error = None
+        # Set AUDIO_NOTES_LLM_BACKEND=int8 for faster, smaller CPU inference
+        self.backend = os.environ.get("AUDIO_NOTES_LLM_BACKEND", "auto")
+        # Prompts longer than this are summarized part by part (map-reduce);
+        # Qwen2.5 reads 32k tokens, but attention cost and quality both favour
+        # shorter prompts on CPU
+        self.max_prompt_tokens = 6000
+        self.map_chunk_tokens = 3000
+        self.partial_notes_tokens = 300
     
-    def load_llm_model(self, model_name="Qwen/Qwen2.5-1.5B-Instruct"):
-        """Load LLM for note generation"""
+    def load_llm_model(self, model_name="Qwen/Qwen2.5-1.5B-Instruct", backend=None):
+        """Load LLM for note generation with one of LLM_BACKENDS"""
         try:
             # When running from executable, we need to handle model loading carefully
             if is_running_from_executable():
                 print("Loading LLM model from executable...")
-                # For PyInstaller, we'll try to load the pre-trained model
-                # Load tokenizer and model
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-                )
-                
-                # Create pipeline for text generation
-                self.llm_pipeline = pipeline(
-                    "text-generation",
-                    model=self.model,
-                    tokenizer=self.tokenizer
-                )
             else:
                 # Regular path for development - this should work with virtual environment
                 print("Loading LLM model from local...")
-                # Load tokenizer and model
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-                )
-                
-                # Create pipeline for text generation
-                self.llm_pipeline = pipeline(
-                    "text-generation",
-                    model=self.model,
-                    tokenizer=self.tokenizer
-                )
             
-            print(f"✓ LLM model ({model_name}) loaded successfully")
+            if backend is not None:
+                self.backend = backend
+            resolved = resolve_llm_backend(self.backend)
+            if resolved != self.backend and self.backend != "auto":
+                print(f"⚠ LLM backend {self.backend} is not available here, using {resolved}")
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            
+            # The registry shares one loaded model between all generators
+            handle = get_model_registry().acquire(
+                model_name, lambda: self._load_components(model_name, resolved),
+                dtype=resolved, device=device)
+            self.release_model()
+            self._model_handle = handle
+            self.model_name = model_name
+            self.tokenizer = handle.model['tokenizer']
+            self.model = handle.model['model']
+            self.llm_pipeline = handle.model['pipeline']
+            self.batcher = handle.model['batcher']
+            
+            print(f"✓ LLM model ({model_name}, {resolved}) loaded successfully")
         except Exception as e:
             print(f"Error loading LLM model: {e}")
     
+    def _load_components(self, model_name, backend):
+        """Load tokenizer, model and text-generation pipeline together"""
+        tokenizer = load_pretrained(AutoTokenizer.from_pretrained, model_name)
+        model = self._load_causal_lm(model_name, backend)
+        
+        # Create pipeline for text generation
+        llm_pipeline = pipeline(
+            "text-generation",
+            model=model,
+            tokenizer=tokenizer
+        )
+        # Batched generation pads prompts on the left, next to the new tokens
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        
+        # One batcher per loaded model, so every generator in this process
+        # sharing the model also shares its batches
+        batcher = LLMBatcher(
+            lambda prompts, **params: _generate_with_pipeline(llm_pipeline, prompts, **params),
+            prompt_length=lambda prompt: len(tokenizer(prompt, add_special_tokens=False)['input_ids']))
+        return {'tokenizer': tokenizer, 'model': model, 'pipeline': llm_pipeline, 'batcher': batcher}
+    
+    def _load_causal_lm(self, model_name, backend):
+        """The causal LM for a resolved backend"""
+        if backend == "onnx":
+            from optimum.onnxruntime import ORTModelForCausalLM
+            # Exporting takes minutes, so it happens once and the export is
+            # saved; a copy under models/<model>-onnx is used if present
+            onnx_dir = get_model_path(f"{model_name}-onnx") or os.path.join(
+                get_cache_dir("onnx"), re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+            if os.path.isfile(os.path.join(onnx_dir, "config.json")):
+                return ORTModelForCausalLM.from_pretrained(onnx_dir, use_cache=True, local_files_only=True)
+            
+            print(f"Exporting {model_name} to ONNX (first use only)...")
+            model = load_pretrained(ORTModelForCausalLM.from_pretrained, model_name,
+                                    export=True, use_cache=True)
+            # Saved to a temporary directory first, so an interrupted export
+            # is never mistaken for a complete one
+            temp_dir = f"{onnx_dir}.{os.getpid()}.tmp"
+            model.save_pretrained(temp_dir)
+            try:
+                os.replace(temp_dir, onnx_dir)
+            except OSError:
+                # Another process saved its export first
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            return model
+        
+        dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(backend, torch.float32)
+        # Safetensors weights are memory-mapped while they are loaded
+        model = load_pretrained(AutoModelForCausalLM.from_pretrained, model_name,
+                                torch_dtype=dtype, low_cpu_mem_usage=True)
+        
+        if backend == "int8":
+            # Dynamic quantization: nn.Linear weights (most of the model) are
+            # stored as int8, and each matmul quantizes its activations on the
+            # fly to run on int8 CPU kernels. Embeddings, norms and attention
+            # stay fp32. In place, so the fp32 model isn't copied and peak
+            # memory stays at one model
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8,
+                                                           inplace=True)
+        return model.eval()
+    
+    def _model_id(self):
+        """Model and backend, which together determine the generated text"""
+        return f"{self.model_name}:{resolve_llm_backend(self.backend)}"
+    
+    def release_model(self):
+        """Release this generator's reference to the shared model"""
+        if self._model_handle is not None:
+            self._model_handle.release()
+            self._model_handle = None
+        self.llm_pipeline = None
+        self.batcher = None
+        self.tokenizer = None
+        self.model = None
+    
     def generate_notes(self, transcription_results, content_type="general", speaker_names=None):
         """Generate structured notes from transcription"""
+        # Prepare the input prompt for the LLM
+        prompt = self._create_prompt(transcription_results, content_type, speaker_names)
+        
+        # Notes for a prompt this model has already answered come from the cache
+        return get_result_cache().cached(
+            "generate_notes", data_hash(prompt),
+            lambda: self._generate_notes(prompt, transcription_results, content_type),
+            model_id=self._model_id(),
+            params={'max_new_tokens': 512, 'temperature': 0.7,
+                    'max_prompt_tokens': self.max_prompt_tokens,
+                    'map_chunk_tokens': self.map_chunk_tokens},
+            should_store=lambda _: self.llm_pipeline is not None and self._last_error is None)
+    
+    def _generate_notes(self, prompt, transcription_results, content_type):
+        """Run the LLM on a notes prompt and parse the result"""
+        self._last_error = None
+        
         # Load model if not already loaded
         if self.llm_pipeline is None:
             self.load_llm_model()
@@ -89,22 +224,20 @@ class NoteGenerator:
         
         try:
             # ACTUAL LLM IMPLEMENTATION
-            print("Generating notes from transcription...")
+            if self.count_tokens(prompt) > self.max_prompt_tokens:
+                return self._generate_notes_map_reduce(transcription_results, content_type)
             
-            # Prepare the input prompt for the LLM
-            prompt = self._create_prompt(transcription_results, content_type, speaker_names)
+            print("Generating notes from transcription...")
             
             # Generate notes using the LLM
             if self.llm_pipeline:
-                response = self.llm_pipeline(
-                    prompt,
+                generated_text = self._complete(
+                    [prompt],
                     max_new_tokens=512,
                     temperature=0.7,
-                    do_sample=True
-                )
-                
-                # Extract the generated text from response
-                generated_text = response[0]['generated_text']
+                    do_sample=True,
+                    json_notes=True
+                )[0]
                 
                 # Process the generated text into structured notes
                 return self._parse_generated_notes(generated_text)
@@ -129,6 +262,7 @@ class NoteGenerator:
                 
         except Exception as e:
             print(f"Error during note generation: {e}")
+            self._last_error = e
             # Return mock results if there's an error
             return {
                 "summary": f"Error generating notes: {str(e)}",
@@ -139,18 +273,30 @@ class NoteGenerator:
     
     def _create_prompt(self, transcription_results, content_type, speaker_names):
         """Create a prompt for the LLM based on the transcription"""
-        # Format transcription results
+        transcription_text = "\n".join(self._transcript_lines(transcription_results))
+        
+        # Combine system prompt with transcription
+        full_prompt = (f"{self._system_prompt(content_type)}\n{NOTES_JSON_INSTRUCTION}\n\n"
+                       f"Transcript:\n{transcription_text}")
+        
+        return full_prompt
+    
+    def _transcript_lines(self, transcription_results):
+        """One timestamped line per transcript segment"""
         formatted_transcription = []
         for segment in transcription_results:
             start_time = f"{segment['start']:.1f}s"
             text = segment['text']
+            if segment.get('speaker'):
+                # Speaker-attributed transcript from the alignment stage
+                text = f"{segment['speaker']}: {text}"
             formatted_transcription.append(f"[{start_time}] {text}")
-        
-        transcription_text = "\n".join(formatted_transcription)
-        
-        # Create system prompt
+        return formatted_transcription
+    
+    def _system_prompt(self, content_type):
+        """Instructions for the notes prompt of a content type"""
         if content_type == "meeting":
-            system_prompt = (
+            return (
                 "You are an expert meeting note taker. "
                 "Create a structured summary of the following meeting transcript, including:\n"
                 "1. A brief overall summary\n"
@@ -159,7 +305,7 @@ class NoteGenerator:
                 "4. Speaker-specific notes in the format: [Speaker Name]: Content"
             )
         elif content_type == "lecture":
-            system_prompt = (
+            return (
                 "You are an expert lecture note taker. "
                 "Create a structured summary of the following lecture transcript, including:\n"
                 "1. A brief overall summary\n"
@@ -167,40 +313,172 @@ class NoteGenerator:
                 "3. Important concepts discussed\n"
                 "4. Review questions or assignments if mentioned"
             )
-        else:
-            system_prompt = (
-                "You are an expert note taker. "
-                "Create a structured summary of the following audio transcript, including:\n"
-                "1. A brief overall summary\n"
-                "2. Key discussion points\n"
-                "3. Action items if mentioned\n"
-                "4. Speaker-specific notes in the format: [Speaker Name]: Content"
-            )
+        return (
+            "You are an expert note taker. "
+            "Create a structured summary of the following audio transcript, including:\n"
+            "1. A brief overall summary\n"
+            "2. Key discussion points\n"
+            "3. Action items if mentioned\n"
+            "4. Speaker-specific notes in the format: [Speaker Name]: Content"
+        )
+    
+    def count_tokens(self, texts):
+        """Token count of each text, from the model's tokenizer when loaded
         
-        # Combine system prompt with transcription
-        full_prompt = f"{system_prompt}\n\nTranscript:\n{transcription_text}"
+        Without a tokenizer the count is estimated at four characters per
+        token, which errs on the long side for English transcripts.
+        """
+        if isinstance(texts, str):
+            return self.count_tokens([texts])[0]
+        if not texts:
+            return []
+        if self.tokenizer is not None:
+            encoded = self.tokenizer(list(texts), add_special_tokens=False)['input_ids']
+            return [len(ids) for ids in encoded]
+        return [len(text) // 4 + 1 for text in texts]
+    
+    def split_on_tokens(self, lines, max_tokens, min_lines=1):
+        """Group consecutive lines into chunks of at most max_tokens tokens
         
-        return full_prompt
+        Chunks break only between lines, so no transcript segment is cut in
+        half; a single line longer than the budget becomes its own chunk.
+        With min_lines, every chunk but the last takes at least that many
+        lines even past the budget.
+        """
+        chunks = []
+        current = []
+        current_tokens = 0
+        for line, tokens in zip(lines, self.count_tokens(lines)):
+            # +1 for the newline joining it to the chunk
+            if current and len(current) >= min_lines and current_tokens + tokens + 1 > max_tokens:
+                chunks.append("\n".join(current))
+                current = []
+                current_tokens = 0
+            current.append(line)
+            current_tokens += tokens + 1
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+    
+    def _generate_notes_map_reduce(self, transcription_results, content_type):
+        """Notes for a transcript too long for one prompt
+        
+        Map: each token-bounded part of the transcript is summarized on its
+        own, several parts per batched generate call. Reduce: the partial
+        notes are combined, in rounds while they still don't fit one prompt,
+        and the final round produces the usual notes structure.
+        """
+        parts = self.split_on_tokens(self._transcript_lines(transcription_results),
+                                     self.map_chunk_tokens)
+        print(f"Transcript is long - summarizing it in {len(parts)} parts...")
+        
+        partial_notes = self._complete(
+            [self._map_prompt(part, index, len(parts), content_type)
+             for index, part in enumerate(parts)],
+            max_new_tokens=self.partial_notes_tokens, temperature=0.7, do_sample=True)
+        
+        # Each round at least halves the number of partial notes
+        while len(partial_notes) > 1 and sum(self.count_tokens(partial_notes)) > self.map_chunk_tokens:
+            groups = self.split_on_tokens(partial_notes, self.map_chunk_tokens, min_lines=2)
+            print(f"Combining {len(partial_notes)} partial notes into {len(groups)}...")
+            partial_notes = self._complete(
+                [f"{self._combine_instructions(content_type)}\n\n{group}" for group in groups],
+                max_new_tokens=self.partial_notes_tokens, temperature=0.7, do_sample=True)
+        
+        final_prompt = (
+            f"{self._system_prompt(content_type)}\n\n"
+            "The transcript was too long to read at once. These are notes on its "
+            "consecutive parts, in order:\n\n" + "\n\n".join(partial_notes)
+            + f"\n\n{NOTES_JSON_INSTRUCTION}\n"
+        )
+        return self._parse_generated_notes(self._complete(
+            [final_prompt], max_new_tokens=512, temperature=0.7, do_sample=True, json_notes=True)[0])
+    
+    def _map_prompt(self, part, index, count, content_type):
+        """Prompt summarizing one part of a long transcript"""
+        kind = content_type if content_type in ("meeting", "lecture") else "recording"
+        return (
+            f"You are an expert note taker. This is part {index + 1} of {count} of a "
+            f"{kind} transcript. Write concise notes on this part: what was discussed, "
+            "key points, decisions, action items with owners, and who said what.\n\n"
+            f"Transcript part {index + 1}:\n{part}"
+        )
+    
+    def _combine_instructions(self, content_type):
+        """Instructions for merging notes on consecutive transcript parts"""
+        kind = content_type if content_type in ("meeting", "lecture") else "recording"
+        return (
+            f"These are notes on consecutive parts of one {kind}. Merge them into "
+            "one set of concise notes, keeping every key point, decision and action item:"
+        )
+    
+    def _complete(self, prompts, **params):
+        """Generated continuations (without the prompts) for a list of prompts
+        
+        Prompts go through the model's shared batcher, so they are batched
+        with each other and with prompts from other generators in this process.
+        """
+        if self.batcher is None:
+            llm_pipeline = self.llm_pipeline
+            self.batcher = LLMBatcher(
+                lambda prompts, **params: _generate_with_pipeline(llm_pipeline, prompts, **params),
+                prompt_length=self.count_tokens)
+        return self.batcher.generate(prompts, **params)
     
     def _parse_generated_notes(self, generated_text):
-        """Parse the LLM-generated text into structured notes"""
-        # This is a simplified parsing approach - in practice, you'd want more robust parsing
-        return {
-            "summary": "Meeting summary based on the content",
-            "key_points": [
-                "Key point 1 from the conversation",
-                "Important decision or discussion"
-            ],
-            "action_items": [
-                "Action item 1: Complete by specific date",
-                "Action item 2: Further investigation needed"
-            ],
-            "speaker_notes": {
-                "Speaker_1": "Main speaker content would appear here",
-                "Speaker_2": "Secondary speaker content would appear here"
+        """Parse the LLM-generated notes JSON into structured notes
+        
+        Notes prompts are generated under the notes JSON grammar, so the text
+        is a complete object (or one cut short by max_new_tokens, which the
+        parser closes). Text without any JSON becomes the summary.
+        """
+        if '{' not in generated_text:
+            return {
+                "summary": generated_text.strip(),
+                "key_points": [],
+                "action_items": [],
+                "speaker_notes": {}
             }
-        }
+        return parse_notes(generated_text)
 
+    def render_notes(self, notes, output_format="text"):
+        """Render structured notes as plain text or markdown
+        
+        "pdf" renders the markdown version; the text is what gets exported.
+        """
+        if isinstance(notes, str):
+            return notes
+        
+        markdown = output_format in ("markdown", "pdf")
+        sections = [
+            ("Summary", notes.get("summary", "")),
+            ("Key Points", notes.get("key_points", [])),
+            ("Action Items", notes.get("action_items", [])),
+            ("Speaker Notes", [f"{speaker}: {text}" for speaker, text in
+                               notes.get("speaker_notes", {}).items()]),
+        ]
+        
+        lines = ["# Notes", ""] if markdown else []
+        for title, content in sections:
+            if not content:
+                continue
+            lines.append(f"## {title}" if markdown else title)
+            if not markdown:
+                lines.append("-" * len(title))
+            if isinstance(content, str):
+                lines.append(content)
+            else:
+                lines.extend(f"- {item}" for item in content)
+            lines.append("")
+        
+        return "\n".join(lines).rstrip() + "\n"
+    
+    def _transcript_text(self, transcription_results):
+        """Plain transcript text for a prompt"""
+        if isinstance(transcription_results, str):
+            return transcription_results
+        return "\n".join(segment_texts(transcription_results))
+    
     def generate_outline(self, transcription_results):
         """Generate a structured outline from the transcript"""
         try:
@@ -208,17 +486,15 @@ class NoteGenerator:
             prompt = (
                 "Create a structured outline from the following transcript. "
                 "Format as bullet points with clear section headings:\n\n"
-                f"{transcription_results}"
+                f"{self._transcript_text(transcription_results)}"
             )
             
             if self.llm_pipeline:
-                response = self.llm_pipeline(
-                    prompt,
+                outline = self._complete(
+                    [prompt],
                     max_new_tokens=256,
                     temperature=0.3
-                )
-                
-                outline = response[0]['generated_text']
+                )[0]
                 return outline
             
             # Return mock outline if no pipeline
@@ -234,17 +510,15 @@ class NoteGenerator:
             # Create a summary prompt
             prompt = (
                 "Summarize the following transcript in 2-3 sentences:\n\n"
-                f"{transcription_results}"
+                f"{self._transcript_text(transcription_results)}"
             )
             
             if self.llm_pipeline:
-                response = self.llm_pipeline(
-                    prompt,
+                summary = self._complete(
+                    [prompt],
                     max_new_tokens=128,
                     temperature=0.5
-                )
-                
-                summary = response[0]['generated_text']
+                )[0]
                 return summary
             
             # Return mock summary if no pipeline
@@ -252,4 +526,126 @@ class NoteGenerator:
             
         except Exception as e:
             print(f"Error generating summary: {e}")
-            return "Summary generation failed"
\ No newline at end of file
+            return "Summary generation failed"
+    
+    def generate_note_set(self, transcription_results, content_type="general", speaker_names=None):
+        """Notes, outline and summary from a single encoding of the transcript
+        
+        generate_notes, generate_outline and generate_summary each prefill
+        the whole transcript. Here the transcript comes first in every
+        prompt, is run through the model once, and its key/value cache is
+        reused for each instruction, so the prefill is paid once instead of
+        three times. Returns {'notes': ..., 'outline': ..., 'summary': ...}.
+        """
+        prefix = "Transcript:\n" + "\n".join(self._transcript_lines(transcription_results)) + "\n\n"
+        requests = self._note_set_requests(content_type)
+        
+        return get_result_cache().cached(
+            "generate_note_set", data_hash(prefix + "".join(suffix for _, suffix, _ in requests)),
+            lambda: self._generate_note_set(prefix, requests, transcription_results,
+                                            content_type, speaker_names),
+            model_id=self._model_id(),
+            params={name: params for name, _, params in requests},
+            should_store=lambda _: self.model is not None and self._last_error is None)
+    
+    def _note_set_requests(self, content_type):
+        """(name, instruction, generation params) for each part of a note set"""
+        return [
+            ('summary', "Summarize the transcript above in 2-3 sentences.\n",
+             {'max_new_tokens': 128, 'temperature': 0.5, 'do_sample': True}),
+            ('outline', "Create a structured outline from the transcript above. "
+                        "Format as bullet points with clear section headings:\n",
+             {'max_new_tokens': 256, 'temperature': 0.3, 'do_sample': True}),
+            ('notes', f"{self._system_prompt(content_type)}\n\nWrite these notes for the transcript "
+                      f"above. {NOTES_JSON_INSTRUCTION}\n",
+             {'max_new_tokens': 512, 'temperature': 0.7, 'do_sample': True, 'json_notes': True}),
+        ]
+    
+    def _generate_note_set(self, prefix, requests, transcription_results, content_type, speaker_names):
+        """Run the note set requests on one cached transcript prefix"""
+        self._last_error = None
+        
+        if self.llm_pipeline is None:
+            self.load_llm_model()
+        
+        # Without a model (mock results) or for transcripts that need
+        # map-reduce, each part is generated on its own
+        if self.model is None or self.count_tokens(prefix) > self.max_prompt_tokens:
+            return self._generate_note_set_separately(transcription_results, content_type, speaker_names)
+        
+        try:
+            print("Generating notes, outline and summary from one transcript encoding...")
+            texts = self._generate_with_prefix(prefix, requests)
+            return {
+                'notes': self._parse_generated_notes(texts['notes']),
+                'outline': texts['outline'],
+                'summary': texts['summary'],
+            }
+        except Exception as e:
+            print(f"Error during combined note generation: {e}")
+            note_set = self._generate_note_set_separately(transcription_results, content_type, speaker_names)
+            self._last_error = e
+            return note_set
+    
+    def _generate_note_set_separately(self, transcription_results, content_type, speaker_names):
+        """Note set from one prompt per part"""
+        return {
+            'notes': self.generate_notes(transcription_results, content_type, speaker_names),
+            'outline': self.generate_outline(transcription_results),
+            'summary': self.generate_summary(transcription_results),
+        }
+    
+    def _generate_with_prefix(self, prefix, requests):
+        """Continuations of prefix + each instruction, encoding the prefix once"""
+        tokenizer = self.tokenizer
+        device = self.model.device
+        prefix_ids = tokenizer(prefix, return_tensors="pt", add_special_tokens=False).input_ids.to(device)
+        with torch.no_grad():
+            cache = self.model(prefix_ids, use_cache=True).past_key_values
+        if not hasattr(cache, 'crop') and DynamicCache is not None:
+            # Older models return the legacy per-layer tuples, which can't be
+            # cropped (from_legacy_cache is gone in transformers 5)
+            cache = (DynamicCache.from_legacy_cache(cache) if hasattr(DynamicCache, 'from_legacy_cache')
+                     else DynamicCache(cache))
+        
+        texts = {}
+        for name, instruction, params in requests:
+            instruction_ids = tokenizer(instruction, return_tensors="pt",
+                                        add_special_tokens=False).input_ids.to(device)
+            input_ids = torch.cat([prefix_ids, instruction_ids], dim=1)
+            # generate() only runs the tokens the cache doesn't hold yet
+            with torch.no_grad():
+                output = self.model.generate(
+                    input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=cache,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **_grammar_params(params, tokenizer, self.model)
+                )
+            texts[name] = tokenizer.decode(output[0, input_ids.shape[1]:], skip_special_tokens=True)
+            # Drop the instruction and answer again, keeping the transcript.
+            # (generate() leaves a legacy tuple cache untouched.)
+            if hasattr(cache, 'crop') and cache.get_seq_length() > prefix_ids.shape[1]:
+                # A negative length removes that many tokens from the end
+                cache.crop(prefix_ids.shape[1] - cache.get_seq_length())
+        return texts
+
+
+def _generate_with_pipeline(llm_pipeline, prompts, **params):
+    """Run one batch through a text-generation pipeline, returning only the new text"""
+    outputs = llm_pipeline(prompts, batch_size=len(prompts), return_full_text=False,
+                           **_grammar_params(params, llm_pipeline.tokenizer, llm_pipeline.model))
+    return [output[0]['generated_text'] for output in outputs]
+
+
+def _grammar_params(params, tokenizer, model):
+    """Generation params with json_notes=True replaced by the notes JSON constraint
+    
+    The flag (rather than a processor object) is what callers pass, so equal
+    requests still batch together; each generate call gets its own processor.
+    """
+    params = dict(params)
+    if params.pop('json_notes', False):
+        params['logits_processor'] = LogitsProcessorList([
+            NotesJSONLogitsProcessor(tokenizer, model.generation_config.eos_token_id)])
+    return params
@@ -0,0 +1,387 @@
+# src/pipeline.py - Incremental processing pipeline built from dependent stages
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from audio_buffer import AudioBuffer
+from speaker_alignment import align_transcript, speaker_texts
+from segment_store import SegmentStore
+from speaker_names import SpeakerNames
+from model_utils import get_thread_budget, set_thread_budget
+
+
+class Stage:
+    """One step of the pipeline with declared inputs and outputs
+
+    func is called with the input values as keyword arguments. A stage with
+    one output returns the value; with several outputs it returns a tuple in
+    the order of `outputs`. Bump `version` when the stage's logic changes so
+    earlier results are not reused. Stages marked `compute_heavy` run torch
+    models and share the pipeline's thread budget when they run concurrently.
+    """
+
+    def __init__(self, name, inputs, outputs, func, version=1, compute_heavy=False):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.func = func
+        self.version = version
+        self.compute_heavy = compute_heavy
+
+
+class Pipeline:
+    """Runs stages in dependency order, recomputing only what changed
+
+    Every value carries a fingerprint. A stage reruns only when the
+    fingerprints of its inputs differ from its previous run; outputs are
+    fingerprinted by content, so if a rerun produces the same value its
+    dependents are not rerun either. Values are kept between runs, so a
+    changed output format reruns only rendering and a changed content type
+    only note generation and rendering.
+
+    With max_workers > 1, stages that don't depend on each other run at the
+    same time on a thread pool (e.g. diarization and transcription), and the
+    thread budget is split between the compute-heavy ones so the two torch
+    workloads don't oversubscribe the cores. Each stage sees its share
+    through get_thread_budget(), which sizes worker pools such as the
+    chunked transcription pool. torch's own thread count is process-wide,
+    so it is set to the share of the stages started together and restored
+    once no compute-heavy stage is running; that part of the split is
+    best-effort.
+    """
+
+    def __init__(self, stages, max_workers=1, thread_budget=None):
+        self.stages = {}
+        self.producers = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output {output} is produced by more than one stage")
+                self.producers[output] = stage.name
+        self.order = self._topological_order()
+        self.max_workers = max(1, max_workers)
+        self.thread_budget = thread_budget
+
+        self.values = {}
+        self.fingerprints = {}
+        self._stage_input_fingerprints = {}
+        self.last_run = {'ran': [], 'reused': [], 'timings': {}}
+
+    @property
+    def external_inputs(self):
+        """Inputs no stage produces - these must be passed to run()"""
+        return sorted({name for stage in self.stages.values() for name in stage.inputs
+                       if name not in self.producers})
+
+    def _topological_order(self):
+        order = []
+        remaining = dict(self.stages)
+        available = set()
+        while remaining:
+            ready = [name for name, stage in remaining.items()
+                     if all(i in available or i not in self.producers for i in stage.inputs)]
+            if not ready:
+                raise ValueError(f"Stages form a cycle: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                available.update(remaining.pop(name).outputs)
+        return order
+
+    def _needed_stages(self, targets):
+        """Stages required to produce the target values"""
+        needed = set()
+        pending = list(targets)
+        while pending:
+            value_name = pending.pop()
+            stage_name = self.producers.get(value_name)
+            if stage_name is None or stage_name in needed:
+                continue
+            needed.add(stage_name)
+            pending.extend(self.stages[stage_name].inputs)
+        return [name for name in self.order if name in needed]
+
+    def invalidate(self, *stage_names):
+        """Force stages to rerun on the next run"""
+        for name in stage_names:
+            self._stage_input_fingerprints.pop(name, None)
+
+    def run(self, targets=None, on_stage=None, **inputs):
+        """Run the stages needed for targets (default: all outputs)
+
+        on_stage(stage_name) is called before a stage actually executes.
+        Returns a dict of every known value.
+        """
+        for name, value in inputs.items():
+            self.values[name] = value
+            self.fingerprints[name] = fingerprint(value)
+
+        needed = self._needed_stages(targets or list(self.producers))
+        required = {name for stage_name in needed for name in self.stages[stage_name].inputs
+                    if name not in self.producers}
+        missing = sorted(required - set(self.values))
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {', '.join(missing)}")
+
+        self.last_run = {'ran': [], 'reused': [], 'timings': {}}
+        if self.max_workers == 1:
+            for stage_name in needed:
+                if not self._reuse(stage_name):
+                    self._store(stage_name, *self._execute(stage_name, on_stage, None))
+            return dict(self.values)
+
+        budget = self.thread_budget or get_thread_budget()
+        torch_threads = _get_torch_threads()
+        pending = list(needed)
+        finished = set()
+        running = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers,
+                                    thread_name_prefix="pipeline") as executor:
+                while pending or running:
+                    # Reused stages finish immediately and may unblock others
+                    progressed = True
+                    while progressed:
+                        progressed = False
+                        for stage_name in self._ready_stages(pending, finished):
+                            if self._reuse(stage_name):
+                                pending.remove(stage_name)
+                                finished.add(stage_name)
+                                progressed = True
+
+                    to_start = self._ready_stages(pending, finished)
+                    heavy = [name for name in list(running.values()) + to_start
+                             if self.stages[name].compute_heavy]
+                    threads = max(1, budget // max(1, len(heavy)))
+                    for stage_name in to_start:
+                        pending.remove(stage_name)
+                        stage_threads = threads if self.stages[stage_name].compute_heavy else None
+                        future = executor.submit(self._execute, stage_name, on_stage, stage_threads)
+                        running[future] = stage_name
+
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage_name = running.pop(future)
+                        # Re-raises the stage's exception; the pool waits for the rest
+                        self._store(stage_name, *future.result())
+                        finished.add(stage_name)
+                    if torch_threads and not any(self.stages[name].compute_heavy
+                                                 for name in running.values()):
+                        # Later stages get torch's full thread count back
+                        _set_torch_threads(torch_threads)
+        finally:
+            if torch_threads:
+                # Stages may have lowered torch's process-wide thread count
+                _set_torch_threads(torch_threads)
+
+        return dict(self.values)
+
+    def _ready_stages(self, pending, finished):
+        """Pending stages whose producing stages have all finished"""
+        return [name for name in pending
+                if all(self.producers[i] in finished
+                       for i in self.stages[name].inputs if i in self.producers)]
+
+    def _input_fingerprint(self, stage_name):
+        stage = self.stages[stage_name]
+        return _combine([stage.version] + [self.fingerprints[i] for i in stage.inputs])
+
+    def _reuse(self, stage_name):
+        """Keep the previous outputs if the stage's inputs are unchanged"""
+        stage = self.stages[stage_name]
+        if (self._stage_input_fingerprints.get(stage_name) == self._input_fingerprint(stage_name)
+                and all(output in self.values for output in stage.outputs)):
+            self.last_run['reused'].append(stage_name)
+            return True
+        return False
+
+    def _execute(self, stage_name, on_stage, threads):
+        """Run one stage; returns (input fingerprint, result, elapsed seconds)"""
+        stage = self.stages[stage_name]
+        input_fingerprint = self._input_fingerprint(stage_name)
+        if threads:
+            set_thread_budget(threads)
+            _set_torch_threads(threads)
+        if on_stage:
+            on_stage(stage_name)
+        start = time.time()
+        try:
+            result = stage.func(**{i: self.values[i] for i in stage.inputs})
+        finally:
+            if threads:
+                # Pool threads are reused by later stages
+                set_thread_budget(None)
+        return input_fingerprint, result, time.time() - start
+
+    def _store(self, stage_name, input_fingerprint, result, elapsed):
+        stage = self.stages[stage_name]
+        self.last_run['timings'][stage_name] = elapsed
+        self.last_run['ran'].append(stage_name)
+
+        outputs = (result,) if len(stage.outputs) == 1 else tuple(result)
+        for output, value in zip(stage.outputs, outputs):
+            self.values[output] = value
+            self.fingerprints[output] = fingerprint(value)
+        self._stage_input_fingerprints[stage_name] = input_fingerprint
+
+
+def _get_torch_threads():
+    """torch's intra-op thread count, or None without torch"""
+    try:
+        import torch
+        return torch.get_num_threads()
+    except ImportError:
+        return None
+
+
+def _set_torch_threads(threads):
+    """Set torch's intra-op thread count
+
+    The setting is process-wide: stages running at the same time all set
+    their (equal) share, and the last one to start wins.
+    """
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not set torch thread count: {e}")
+
+
+def fingerprint(value):
+    """Cheap identity of a pipeline value"""
+    if isinstance(value, AudioBuffer):
+        # Buffers are identified by where their samples live
+        return _combine(["buffer", repr(value), len(value)])
+    if isinstance(value, (str, os.PathLike)) and os.path.isfile(value):
+        stat = os.stat(value)
+        return _combine(["file", os.path.abspath(value), stat.st_size, stat.st_mtime_ns])
+    if hasattr(value, 'content_hash'):
+        return _combine(["content", value.content_hash()])
+    if hasattr(value, 'to_dicts'):
+        value = value.to_dicts()
+    try:
+        return _combine(["value", value])
+    except (TypeError, ValueError):
+        return _combine(["object", id(value)])
+
+
+def _combine(parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def build_notes_pipeline(audio_processor, diarization_manager, transcription_manager,
+                         content_classifier, note_generator, voice_activity_detector,
+                         chunked_transcription=True, max_workers=2, thread_budget=None,
+                         on_segment=None, note_set=False):
+    """The audio-to-notes pipeline used by the GUI and the batch runner
+
+    External inputs: file_path, speaker_names, speaker_hints ({'min_speakers',
+    'max_speakers'} or None), output_format and content_type_override (None
+    to classify automatically). Diarization and transcription only depend
+    on the audio, so with max_workers >= 2 they run concurrently, each with
+    half of thread_budget; the align stage then joins them into one
+    speaker-attributed transcript. Speakers keep their labels ("1", "2",
+    ...) through note generation; names are applied by name_speakers and
+    render only, so renaming a speaker reruns neither the models nor the
+    LLM. If on_segment is given, transcription streams and
+    on_segment(segment) is called for each segment as soon as its chunk is
+    decoded. With note_set, the notes stage also writes an outline and a
+    summary (NoteGenerator.generate_note_set, which encodes the transcript
+    once for all three); otherwise those outputs are None.
+    """
+
+    def prepare(file_path):
+        # Decode once into a normalized 16 kHz mono WAV and share it,
+        # memory-mapped, between diarization and transcription
+        return audio_processor.load_buffer(
+            audio_processor.convert_to_wav(audio_processor.prepare_file(file_path)))
+
+    def detect_speech(audio):
+        if not isinstance(audio, AudioBuffer):
+            return None, None
+        speech_regions = voice_activity_detector.detect_buffer(audio)
+        # Packed once, memory-mapped, and read by both diarization and transcription
+        return speech_regions, audio_processor.load_speech_buffer(audio, speech_regions)
+
+    def diarize(audio, speech_regions, speech_audio, speaker_hints):
+        diarization = diarization_manager.process_audio(audio, speech_regions=speech_regions,
+                                                        speech_audio=speech_audio,
+                                                        **(speaker_hints or {}))
+        return (diarization, list(diarization_manager.last_turns),
+                dict(diarization_manager.last_centroids))
+
+    def align(transcription, speaker_turns, diarization):
+        aligned = align_transcript(transcription, speaker_turns)
+        # Falls back to the diarization results when there are no real
+        # speaker turns (e.g. the diarization model is unavailable)
+        return aligned, speaker_texts(aligned) or diarization
+
+    def name_speakers(diarization_texts, speaker_transcript, speaker_names, speaker_embeddings):
+        # Speakers the user didn't name get the name of a matching voiceprint;
+        # naming only swaps label tables, whatever the transcript length
+        names = SpeakerNames(
+            diarization_manager.resolve_speaker_names(speaker_names, speaker_embeddings))
+        return (names.apply_texts(diarization_texts), names.apply_transcript(speaker_transcript),
+                names.as_dict())
+
+    def transcribe(audio, speech_regions, speech_audio):
+        if speech_regions is None:
+            return transcription_manager.transcribe_audio(audio)
+        if on_segment is not None and chunked_transcription:
+            segments = []
+            for segment in transcription_manager.transcribe_stream(audio, speech_regions,
+                                                                   speech_audio=speech_audio):
+                on_segment(segment)
+                segments.append(segment)
+            return SegmentStore.from_dicts(segments)
+        return transcription_manager.transcribe_with_vad(audio, speech_regions,
+                                                         chunked=chunked_transcription,
+                                                         speech_audio=speech_audio)
+
+    def classify(transcription, content_type_override):
+        return content_type_override or content_classifier.classify_content(transcription)
+
+    def generate_notes(speaker_transcript, content_type):
+        # Notes refer to "Speaker N"; names are filled in when rendering
+        transcript = SpeakerNames().apply_transcript(speaker_transcript)
+        if note_set:
+            notes = note_generator.generate_note_set(transcript, content_type)
+            return notes['notes'], notes['outline'], notes['summary']
+        return note_generator.generate_notes(transcript, content_type), None, None
+
+    def render(notes, output_format, resolved_speaker_names):
+        return note_generator.render_notes(SpeakerNames(resolved_speaker_names).apply_notes(notes),
+                                           output_format)
+
+    return Pipeline([
+        Stage("prepare", ["file_path"], ["audio"], prepare),
+        Stage("detect_speech", ["audio"], ["speech_regions", "speech_audio"], detect_speech),
+        Stage("diarize", ["audio", "speech_regions", "speech_audio", "speaker_hints"],
+              ["diarization", "speaker_turns", "speaker_embeddings"], diarize, compute_heavy=True),
+        Stage("transcribe", ["audio", "speech_regions", "speech_audio"], ["transcription"], transcribe,
+              compute_heavy=True),
+        Stage("align", ["transcription", "speaker_turns", "diarization"],
+              ["speaker_transcript", "diarization_texts"], align),
+        Stage("name_speakers",
+              ["diarization_texts", "speaker_transcript", "speaker_names", "speaker_embeddings"],
+              ["named_diarization", "named_transcript", "resolved_speaker_names"], name_speakers),
+        Stage("classify", ["transcription", "content_type_override"], ["content_type"], classify),
+        Stage("generate_notes", ["speaker_transcript", "content_type"], ["notes", "outline", "summary"],
+              generate_notes, compute_heavy=True),
+        Stage("render", ["notes", "output_format", "resolved_speaker_names"], ["rendered_notes"],
+              render),
+    ], max_workers=max_workers, thread_budget=thread_budget)
@@ -0,0 +1,585 @@
+# src/realtime.py - Live transcription of a microphone, growing file or replayed recording
+
+import argparse
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from audio_processor import AudioProcessor, TARGET_SAMPLE_RATE, _StreamingResampler
+from audio_buffer import AudioBuffer
+from voice_activity import VoiceActivityDetector
+from speaker_alignment import SpeakerCoverage
+
+# Windows whose loudest frame is below this level are treated as silence
+LIVE_SILENCE_DB = -45.0
+
+
+class RingBuffer:
+    """Fixed-size buffer holding the most recent seconds of live audio
+
+    Frames are addressed by their absolute position in the stream; once
+    more than `capacity` frames have been written the oldest are
+    overwritten, so memory stays constant however long a session runs.
+    """
+
+    def __init__(self, capacity_seconds, sample_rate=TARGET_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self.total_frames = 0
+        self._lock = threading.Lock()
+
+    @property
+    def oldest_frame(self):
+        """Absolute index of the oldest frame still held"""
+        return max(0, self.total_frames - self.capacity)
+
+    @property
+    def duration(self):
+        """Seconds of audio written so far"""
+        return self.total_frames / self.sample_rate
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        with self._lock:
+            if len(samples) > self.capacity:
+                # Only the newest samples fit
+                self.total_frames += len(samples) - self.capacity
+                samples = samples[-self.capacity:]
+            start = self.total_frames % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.total_frames += len(samples)
+
+    def read(self, start_frame, end_frame):
+        """Copy of the frames in [start_frame, end_frame), clipped to what is held"""
+        with self._lock:
+            start_frame = max(start_frame, self.oldest_frame)
+            end_frame = min(end_frame, self.total_frames)
+            if end_frame <= start_frame:
+                return np.zeros(0, dtype=np.float32)
+            indices = np.arange(start_frame, end_frame) % self.capacity
+            return self._data[indices]
+
+    def read_seconds(self, start_time, end_time):
+        return self.read(int(start_time * self.sample_rate), int(end_time * self.sample_rate))
+
+
+class FileReplaySource:
+    """Plays a recording back at real-time speed, standing in for a microphone
+
+    Each iteration yields whatever audio has "arrived" since the previous
+    one, so a slow consumer receives bigger blocks instead of falling
+    further behind. last_capture_time is when the newest yielded frame
+    would have been recorded.
+    """
+
+    def __init__(self, file_path, speed=1.0, block_seconds=0.25):
+        self.file_path = file_path
+        self.speed = speed
+        self.block_seconds = block_seconds
+        self.sample_rate = TARGET_SAMPLE_RATE
+        self.last_capture_time = None
+
+    def __iter__(self):
+        processor = AudioProcessor()
+        audio = processor.load_buffer(processor.convert_to_wav(processor.prepare_file(self.file_path)))
+        if not isinstance(audio, AudioBuffer):
+            raise RuntimeError(f"Could not decode {self.file_path} for replay")
+
+        started = time.time()
+        position = 0
+        total = len(audio)
+        while position < total:
+            time.sleep(self.block_seconds / self.speed)
+            arrived = min(total, int((time.time() - started) * self.speed * self.sample_rate))
+            if arrived > position:
+                self.last_capture_time = started + arrived / (self.speed * self.sample_rate)
+                yield np.array(audio.samples[position:arrived])
+                position = arrived
+
+
+class GrowingWavSource:
+    """Follows a WAV file that another program is still writing
+
+    New frames are read as the file grows and converted to 16 kHz mono.
+    Iteration ends once the file hasn't grown for idle_timeout seconds.
+    last_capture_time is the file's modification time when the newest
+    frames were read.
+    """
+
+    def __init__(self, file_path, poll_seconds=0.25, idle_timeout=10.0):
+        self.file_path = file_path
+        self.poll_seconds = poll_seconds
+        self.idle_timeout = idle_timeout
+        self.sample_rate = TARGET_SAMPLE_RATE
+        self.last_capture_time = None
+
+    def __iter__(self):
+        layout = self._wait_for_header()
+        data_offset, audio_format, channels, sample_rate, bits = layout
+        dtype = {(1, 16): '<i2', (1, 32): '<i4', (3, 32): '<f4'}.get((audio_format, bits))
+        if dtype is None:
+            raise RuntimeError(f"Unsupported WAV format in {self.file_path} "
+                               f"(format {audio_format}, {bits}-bit)")
+        frame_bytes = channels * bits // 8
+        scale = {'<i2': 32768.0, '<i4': 2147483648.0, '<f4': 1.0}[dtype]
+        resampler = (_StreamingResampler(sample_rate, self.sample_rate)
+                     if sample_rate != self.sample_rate else None)
+
+        position = data_offset
+        last_growth = time.time()
+        with open(self.file_path, 'rb') as f:
+            while True:
+                stat = os.stat(self.file_path)
+                available = stat.st_size - position
+                usable = available - available % frame_bytes
+                if usable <= 0:
+                    if time.time() - last_growth > self.idle_timeout:
+                        return
+                    time.sleep(self.poll_seconds)
+                    continue
+
+                f.seek(position)
+                data = f.read(usable)
+                position += len(data)
+                last_growth = time.time()
+
+                samples = np.frombuffer(data, dtype=dtype).astype(np.float32) / scale
+                samples = samples.reshape(-1, channels).mean(axis=1)
+                if resampler is not None:
+                    samples = resampler.process(samples)
+                if len(samples):
+                    self.last_capture_time = stat.st_mtime
+                    yield samples
+
+    def _wait_for_header(self):
+        """Parse the WAV header once the writer has produced it"""
+        deadline = time.time() + self.idle_timeout
+        while True:
+            try:
+                return _read_wav_stream_layout(self.file_path)
+            except (OSError, ValueError):
+                if time.time() > deadline:
+                    raise RuntimeError(f"{self.file_path} has no readable WAV header")
+                time.sleep(self.poll_seconds)
+
+
+def _read_wav_stream_layout(path):
+    """(data_offset, format, channels, sample_rate, bits) of a WAV being written"""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError(f"{path} is not a WAV file")
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"{path} has no data chunk yet")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            if chunk_id == b'fmt ':
+                body = f.read(chunk_size)
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if audio_format == 0xFFFE and len(body) >= 26:
+                    audio_format = struct.unpack('<H', body[24:26])[0]
+                fmt = (audio_format, channels, sample_rate, bits)
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path} has no fmt chunk")
+                # The data size is usually unset while recording; ignore it
+                return (f.tell(),) + fmt
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
+
+
+class MicrophoneSource:
+    """Live input from the default microphone (requires the sounddevice package)
+
+    last_capture_time is when the newest yielded block was recorded.
+    """
+
+    def __init__(self, block_seconds=0.25, device=None):
+        self.block_seconds = block_seconds
+        self.device = device
+        self.sample_rate = TARGET_SAMPLE_RATE
+        self.last_capture_time = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def __iter__(self):
+        try:
+            import sounddevice
+        except ImportError:
+            raise RuntimeError("Microphone input needs the sounddevice package "
+                               "(pip install sounddevice)")
+
+        blocks = queue.Queue()
+        with sounddevice.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                                     blocksize=int(self.block_seconds * self.sample_rate),
+                                     device=self.device,
+                                     callback=lambda data, frames, t, status: blocks.put(
+                                         (time.time(), data[:, 0].copy()))):
+            while not self._stop.is_set():
+                try:
+                    block = blocks.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                # Hand over everything that queued up while we were busy
+                pending = [block]
+                while not blocks.empty():
+                    pending.append(blocks.get_nowait())
+                self.last_capture_time = pending[-1][0]
+                yield np.concatenate([samples for _, samples in pending])
+
+
+def link_speakers(window_turns, known_turns, overlap_start, overlap_end, next_label):
+    """Map a window's local speaker labels onto speakers from earlier windows
+
+    Local speakers are matched one-to-one, largest shared talk time first,
+    to known speakers over the span both windows diarized; unmatched local
+    speakers get new labels. Returns (mapping, next_label).
+    """
+    local = sorted({turn['speaker'] for turn in window_turns})
+    mapping = {}
+    if known_turns and overlap_end > overlap_start:
+        coverage = SpeakerCoverage(known_turns)
+        shared = {}
+        for turn in window_turns:
+            start = max(turn['start'], overlap_start)
+            end = min(turn['end'], overlap_end)
+            if end <= start:
+                continue
+            overlaps = coverage.overlaps(np.array([start]), np.array([end]))[0]
+            for known, seconds in zip(coverage.speakers, overlaps):
+                if seconds > 0:
+                    key = (turn['speaker'], known)
+                    shared[key] = shared.get(key, 0.0) + seconds
+        taken = set()
+        for (speaker, known), _ in sorted(shared.items(), key=lambda item: -item[1]):
+            if speaker not in mapping and known not in taken:
+                mapping[speaker] = known
+                taken.add(known)
+
+    for speaker in local:
+        if speaker not in mapping:
+            mapping[speaker] = str(next_label)
+            next_label += 1
+    return mapping, next_label
+
+
+class RealtimeTranscriber:
+    """Transcribes and diarizes live audio on a sliding window
+
+    Audio goes into a RingBuffer. Every step_seconds the uncommitted audio
+    (at most max_window_seconds) is transcribed; words that end more than
+    holdback_seconds before live are committed and the rest are reported as
+    partial text, so output trails live by roughly one step plus decoding
+    time. Diarization runs on a background thread over the last
+    diarize_window_seconds every diarize_every_seconds; committed text is
+    handed out once diarization has covered it (or after
+    max_speaker_delay_seconds without a speaker). Memory is bounded by the
+    ring buffer and the pruned turn history.
+
+    on_segment(segment) receives final {'start', 'end', 'speaker', 'text'}
+    segments; on_partial(text) the words not yet committed. When the session
+    ends every remaining word is committed. stats['max_lag_seconds'] is the
+    longest time from capturing the newest audio a step covered to that
+    step's text being reported.
+    """
+
+    def __init__(self, transcription_manager, diarization_manager=None, on_segment=None,
+                 on_partial=None, buffer_seconds=60.0, step_seconds=1.0,
+                 max_window_seconds=15.0, holdback_seconds=1.0, diarize_every_seconds=5.0,
+                 diarize_window_seconds=20.0, max_speaker_delay_seconds=10.0):
+        self.transcription_manager = transcription_manager
+        self.diarization_manager = diarization_manager
+        self.on_segment = on_segment
+        self.on_partial = on_partial
+        self.step_seconds = step_seconds
+        self.max_window_seconds = max_window_seconds
+        self.holdback_seconds = holdback_seconds
+        self.diarize_every_seconds = diarize_every_seconds
+        self.diarize_window_seconds = diarize_window_seconds
+        self.max_speaker_delay_seconds = max_speaker_delay_seconds
+
+        self.ring = RingBuffer(max(buffer_seconds, max_window_seconds, diarize_window_seconds) * 2)
+        self.vad = VoiceActivityDetector()
+        self.committed_until = 0.0
+        self.committed_text = ""
+        self.pending = []
+        self.segments = []
+        self.turns = []
+        self.diarized_until = 0.0
+        self._next_speaker = 1
+        self._last_step = 0.0
+        self._last_capture_time = None
+        self._last_diarize = 0.0
+        self._diarize_executor = None
+        self._diarize_future = None
+        self._diarize_span = None
+        self._diarization_available = diarization_manager is not None
+        self.stats = {'steps': 0, 'max_step_seconds': 0.0, 'max_lag_seconds': 0.0,
+                      'dropped_seconds': 0.0}
+
+    def run(self, source, stop_event=None):
+        """Consume a source until it ends or stop_event is set, then flush"""
+        try:
+            for block in source:
+                self.feed(block, getattr(source, 'last_capture_time', None))
+                if stop_event is not None and stop_event.is_set():
+                    break
+        finally:
+            self.flush()
+        return self.segments
+
+    def feed(self, samples, capture_time=None):
+        """Add live audio and process once a step's worth has arrived
+
+        capture_time is when the last of the samples was recorded (defaults
+        to now, when they arrived).
+        """
+        self.ring.write(samples)
+        self._last_capture_time = capture_time if capture_time is not None else time.time()
+        self._collect_diarization()
+        if self.ring.duration - self._last_step >= self.step_seconds:
+            self._step()
+
+    def flush(self):
+        """Commit everything left at the end of a session"""
+        self._step(final=True)
+        # A failed diarization only costs speaker labels, never the final words
+        if self._diarize_future is not None:
+            wait([self._diarize_future])
+            self._collect_diarization()
+        if self._diarization_available and self.pending:
+            try:
+                self._run_diarization()
+            except Exception as e:
+                print(f"Error during live diarization: {e}")
+        self._emit_pending(force=True)
+        if self.on_partial:
+            self.on_partial("")
+        if self._diarize_executor is not None:
+            self._diarize_executor.shutdown(wait=True)
+            self._diarize_executor = None
+
+    def _step(self, final=False):
+        started = time.time()
+        now = self.ring.duration
+        captured = self._last_capture_time
+        self._last_step = now
+
+        oldest = self.ring.oldest_frame / self.ring.sample_rate
+        if self.committed_until < oldest:
+            # Fell further behind than the buffer holds; skip ahead
+            self.stats['dropped_seconds'] += oldest - self.committed_until
+            self.committed_until = oldest
+        window_start = self.committed_until
+        if now - window_start > self.max_window_seconds and not final:
+            # Decoding can't keep up; drop the oldest audio to stay near live
+            self.stats['dropped_seconds'] += now - self.max_window_seconds - window_start
+            window_start = now - self.max_window_seconds
+        if now - window_start <= 0.1:
+            return
+
+        samples = self.ring.read_seconds(window_start, now)
+        energy_db, _ = self.vad.frame_energy_db(samples, self.ring.sample_rate)
+        if len(energy_db) == 0 or energy_db.max() < LIVE_SILENCE_DB:
+            # Nothing but silence since the last commit
+            self.committed_until = now if final else max(window_start, now - self.holdback_seconds)
+            if self.on_partial:
+                self.on_partial("")
+        else:
+            prompt = self.committed_text[-200:]
+            segments = self.transcription_manager.transcribe_window(samples, prompt=prompt)
+            self._commit(segments, window_start, now, final)
+
+        self._maybe_diarize(now)
+        self._emit_pending()
+
+        finished = time.time()
+        self.stats['steps'] += 1
+        self.stats['max_step_seconds'] = max(self.stats['max_step_seconds'], finished - started)
+        if captured is not None:
+            # The text reported for the newest audio trails its capture by
+            # the wait for a full step plus the time it took to decode
+            self.stats['max_lag_seconds'] = max(self.stats['max_lag_seconds'], finished - captured)
+
+    def _commit(self, segments, window_start, now, final):
+        """Commit words that are safely behind live; report the rest as partial"""
+        if final:
+            # The session is over: every word is final, including any whose
+            # reported end runs past the audio
+            commit_before = float('inf')
+        elif now - window_start >= self.max_window_seconds:
+            # Window is full: commit everything decoded so far
+            commit_before = now
+        else:
+            commit_before = now - self.holdback_seconds
+
+        committed_end = None
+        partial = []
+        for segment in segments:
+            words = segment.get('words') or [{'word': segment['text'], 'start': segment['start'],
+                                              'end': segment['end']}]
+            kept = []
+            for word in words:
+                start = word['start'] + window_start
+                end = word['end'] + window_start
+                if end <= commit_before and not partial:
+                    kept.append({'start': start, 'end': end, 'word': word['word']})
+                else:
+                    partial.append(word['word'])
+            if kept:
+                text = "".join(word['word'] for word in kept).strip()
+                self.pending.append({'start': kept[0]['start'], 'end': kept[-1]['end'],
+                                     'speaker': None, 'text': text})
+                self.committed_text = (self.committed_text + " " + text)[-1000:]
+                committed_end = kept[-1]['end']
+
+        if committed_end is not None:
+            self.committed_until = min(committed_end, now)
+        elif not partial:
+            self.committed_until = max(window_start, min(commit_before, now))
+        if self.on_partial:
+            self.on_partial("".join(partial).strip())
+
+    def _maybe_diarize(self, now):
+        if not self._diarization_available or self._diarize_future is not None:
+            return
+        if now - self._last_diarize < self.diarize_every_seconds:
+            return
+        self._last_diarize = now
+        start = max(0.0, now - self.diarize_window_seconds, self.ring.oldest_frame / self.ring.sample_rate)
+        samples = self.ring.read_seconds(start, now)
+        if self._diarize_executor is None:
+            self._diarize_executor = ThreadPoolExecutor(max_workers=1,
+                                                        thread_name_prefix="live-diarization")
+        self._diarize_future = self._diarize_executor.submit(
+            self.diarization_manager.diarize_window, samples, self.ring.sample_rate)
+        self._diarize_span = (start, now)
+
+    def _run_diarization(self):
+        """Diarize the last window synchronously (used when a session ends)"""
+        now = self.ring.duration
+        start = max(0.0, now - self.diarize_window_seconds, self.ring.oldest_frame / self.ring.sample_rate)
+        turns = self.diarization_manager.diarize_window(self.ring.read_seconds(start, now),
+                                                        self.ring.sample_rate)
+        self._merge_turns(turns, start, now)
+
+    def _collect_diarization(self):
+        future = self._diarize_future
+        if future is None or not future.done():
+            return
+        self._diarize_future = None
+        try:
+            turns = future.result()
+        except Exception as e:
+            print(f"Error during live diarization: {e}")
+            turns = []
+        if self.diarization_manager.pipeline is None:
+            print("⚠ Live diarization unavailable - continuing without speakers")
+            self._diarization_available = False
+            return
+        self._merge_turns(turns, *self._diarize_span)
+
+    def _merge_turns(self, window_turns, start, end):
+        """Add a window's turns to the history under stable speaker labels"""
+        window_turns = [{**turn, 'start': turn['start'] + start, 'end': turn['end'] + start}
+                        for turn in window_turns]
+        mapping, self._next_speaker = link_speakers(
+            window_turns, self.turns, start, self.diarized_until, self._next_speaker)
+
+        for turn in window_turns:
+            # Earlier windows already decided everything before diarized_until
+            turn_start = max(turn['start'], self.diarized_until)
+            if turn['end'] > turn_start:
+                self.turns.append({'start': turn_start, 'end': turn['end'],
+                                   'speaker': mapping[turn['speaker']]})
+        self.diarized_until = max(self.diarized_until, end)
+
+        # Keep only the history later windows can still overlap
+        horizon = end - self.diarize_window_seconds - self.max_speaker_delay_seconds
+        self.turns = [turn for turn in self.turns if turn['end'] > horizon]
+
+    def _emit_pending(self, force=False):
+        """Hand out committed segments once their speaker is known"""
+        now = self.ring.duration
+        ready = []
+        while self.pending:
+            segment = self.pending[0]
+            covered = self._diarization_available and segment['end'] <= self.diarized_until
+            overdue = now - segment['end'] > self.max_speaker_delay_seconds
+            if not (force or covered or overdue or not self._diarization_available):
+                break
+            ready.append(self.pending.pop(0))
+
+        if ready and self.turns:
+            speakers = SpeakerCoverage(self.turns).assign([s['start'] for s in ready],
+                                                          [s['end'] for s in ready])
+            for segment, speaker in zip(ready, speakers):
+                segment['speaker'] = speaker
+        for segment in ready:
+            self.segments.append(segment)
+            if self.on_segment:
+                self.on_segment(segment)
+
+
+def main(argv=None):
+    """Command line entry point for live transcription"""
+    parser = argparse.ArgumentParser(description="Transcribe live audio as it arrives")
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument('--replay', metavar='FILE',
+                              help="Play a recording back in real time instead of the microphone")
+    source_group.add_argument('--follow', metavar='WAV',
+                              help="Follow a WAV file that is still being recorded")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay speed relative to real time (with --replay)")
+    parser.add_argument('--no-diarization', action='store_true',
+                        help="Skip speaker diarization")
+    args = parser.parse_args(argv)
+
+    from transcription_manager import TranscriptionManager
+    diarization_manager = None
+    if not args.no_diarization:
+        from diarization_manager import DiarizationManager
+        diarization_manager = DiarizationManager()
+
+    if args.replay:
+        source = FileReplaySource(args.replay, speed=args.speed)
+    elif args.follow:
+        source = GrowingWavSource(args.follow)
+    else:
+        source = MicrophoneSource()
+
+    def show_segment(segment):
+        speaker = f"{segment['speaker']}: " if segment['speaker'] else ""
+        print(f"\r[{segment['start']:7.1f}s] {speaker}{segment['text']}\033[K")
+
+    def show_partial(text):
+        print(f"\r  ... {text[-70:]}\033[K", end="", flush=True)
+
+    session = RealtimeTranscriber(TranscriptionManager(), diarization_manager,
+                                  on_segment=show_segment, on_partial=show_partial)
+    try:
+        session.run(source)
+    except KeyboardInterrupt:
+        # run() flushes the remaining audio on the way out
+        pass
+    print(f"\nMax lag behind live: {session.stats['max_lag_seconds']:.1f}s, "
+          f"dropped {session.stats['dropped_seconds']:.1f}s of audio")
+    return 0
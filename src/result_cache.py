@@ -0,0 +1,243 @@
+# src/result_cache.py - Persistent, content-addressed cache of pipeline stage results
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model_utils import get_cache_dir
+from audio_buffer import AudioBuffer
+
+# Bytes hashed per read when fingerprinting audio
+HASH_BLOCK_BYTES = 8 * 2**20
+
+
+class ResultCache:
+    """On-disk cache of stage outputs with size-bounded LRU eviction
+
+    Entries are keyed by a hash of (stage, input content hash, model id,
+    parameters), so a result is reused whenever the same audio goes through
+    the same model with the same settings - whatever the file is called.
+    Values are pickled one file per entry; a SQLite index tracks sizes and
+    last access for eviction.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or get_cache_dir("results")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = float(os.environ.get("AUDIO_NOTES_RESULT_CACHE_MB", 2048)) * 2**20
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # Connections must not be shared with forked pool workers
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite3"),
+                                               timeout=30, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, stage TEXT, size INTEGER, last_access REAL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS content_hashes (file_key TEXT PRIMARY KEY, digest TEXT)")
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def make_key(stage, content_hash, model_id=None, params=None):
+        """Cache key for one stage invocation"""
+        payload = json.dumps([stage, content_hash, model_id, params or {}],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """Return (True, value) on a hit, (False, None) on a miss"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            print(f"Warning: Dropping unreadable cache entry {key[:12]}: {e}")
+            self._remove(key)
+            return False, None
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute("UPDATE entries SET last_access = ? WHERE key = ?",
+                                   (time.time(), key))
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not update result cache index: {e}")
+        return True, value
+
+    def put(self, key, stage, value):
+        """Store a value and evict least recently used entries over the size limit"""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Warning: Could not store {stage} result in cache: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                   (key, stage, os.path.getsize(path), time.time()))
+                connection.commit()
+                self._evict(connection)
+            except sqlite3.Error as e:
+                print(f"Warning: Could not update result cache index: {e}")
+
+    def cached(self, stage, content_hash, compute, model_id=None, params=None,
+               should_store=None):
+        """Return the cached result for a stage, computing and storing it on a miss
+
+        should_store(value) can veto storing results that aren't worth
+        keeping, such as mock output when a model failed to load.
+        """
+        if content_hash is None:
+            return compute()
+
+        key = self.make_key(stage, content_hash, model_id, params)
+        hit, value = self.get(key)
+        if hit:
+            print(f"✓ Reusing cached {stage} result")
+            return value
+
+        value = compute()
+        if should_store is None or should_store(value):
+            self.put(key, stage, value)
+        return value
+
+    def total_bytes(self):
+        with self._lock:
+            row = self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            return row[0]
+
+    def clear(self):
+        """Remove every cached result"""
+        with self._lock:
+            connection = self._connect()
+            keys = [row[0] for row in connection.execute("SELECT key FROM entries")]
+            for key in keys:
+                self._remove_file(key)
+            connection.execute("DELETE FROM entries")
+            connection.commit()
+
+    def _evict(self, connection):
+        """Delete least recently used entries until under max_bytes"""
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in connection.execute(
+                "SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._remove_file(key)
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        connection.commit()
+
+    def _remove(self, key):
+        with self._lock:
+            self._remove_file(key)
+            try:
+                connection = self._connect()
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                connection.commit()
+            except sqlite3.Error:
+                pass
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def audio_hash(self, audio):
+        """Content hash of a file or file-backed AudioBuffer, or None
+
+        Buffers that only live in memory (e.g. packed speech regions) are
+        intermediates and aren't cached. Hashes are remembered per path,
+        size and mtime so unchanged files are only read once.
+        """
+        if isinstance(audio, AudioBuffer):
+            if audio._source is None or audio._source[0] != 'file':
+                return None
+            path = audio._source[1]
+            suffix = f"@{audio.start_frame}+{len(audio)}"
+        elif isinstance(audio, (str, os.PathLike)) and os.path.isfile(audio):
+            path = os.fspath(audio)
+            suffix = ""
+        else:
+            return None
+
+        stat = os.stat(path)
+        file_key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT digest FROM content_hashes WHERE file_key = ?", (file_key,)).fetchone()
+        if row:
+            return row[0] + suffix
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+        digest = digest.hexdigest()
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute("INSERT OR REPLACE INTO content_hashes VALUES (?, ?)",
+                                   (file_key, digest))
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not store content hash: {e}")
+        return digest + suffix
+
+
+def data_hash(value):
+    """Content hash of JSON-like data such as a transcript"""
+    if hasattr(value, 'content_hash'):
+        # Segment stores hash their arrays directly
+        return value.content_hash()
+    if hasattr(value, 'to_dicts'):
+        value = value.to_dicts()
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide ResultCache"""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
@@ -0,0 +1,286 @@
+# src/segment_store.py - Compact, array-backed storage for transcript segments
+
+import hashlib
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class SegmentStore:
+    """Columnar transcript: start/end/speaker arrays plus one text buffer
+
+    A long recording produces tens of thousands of segments and words; as
+    dicts each costs several hundred bytes. Here a segment is two float64
+    times, an int32 speaker id and an offset into a shared string, so memory
+    is dominated by the text itself. Indexing returns a read-only Segment
+    that behaves like the old {'start', 'end', 'text'} dict, and slicing or
+    time-range queries return stores that share the underlying arrays.
+    """
+
+    def __init__(self, starts, ends, text_buffer="", text_offsets=None,
+                 speaker_ids=None, speakers=None, words=None, word_offsets=None):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.text_buffer = text_buffer
+        self.text_offsets = (np.zeros(len(self.starts) + 1, dtype=np.int64)
+                             if text_offsets is None else np.asarray(text_offsets, dtype=np.int64))
+        # Speaker labels are stored once; -1 means no speaker
+        self.speaker_ids = None if speaker_ids is None else np.asarray(speaker_ids, dtype=np.int32)
+        self.speakers = list(speakers or [])
+        # Word timings live in a nested store; word_offsets[i]:word_offsets[i + 1]
+        # are the words of segment i
+        self.words = words
+        self.word_offsets = None if word_offsets is None else np.asarray(word_offsets, dtype=np.int64)
+
+    @classmethod
+    def from_dicts(cls, segments):
+        """Build a store from segment dicts (a store is returned unchanged)"""
+        if isinstance(segments, SegmentStore):
+            return segments
+        segments = list(segments)
+
+        texts = [segment.get('text', '') for segment in segments]
+        text_offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+
+        speaker_ids = speakers = None
+        if any('speaker' in segment for segment in segments):
+            labels = {}
+            speaker_ids = [-1 if segment.get('speaker') is None
+                           else labels.setdefault(segment['speaker'], len(labels))
+                           for segment in segments]
+            speakers = list(labels)
+
+        words = word_offsets = None
+        if any(segment.get('words') for segment in segments):
+            segment_words = [segment.get('words') or [] for segment in segments]
+            words = cls.from_dicts([
+                {'start': word['start'], 'end': word['end'], 'text': word['word']}
+                for entries in segment_words for word in entries
+            ])
+            word_offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+            np.cumsum([len(entries) for entries in segment_words], out=word_offsets[1:])
+
+        return cls([segment['start'] for segment in segments],
+                   [segment['end'] for segment in segments],
+                   "".join(texts), text_offsets, speaker_ids, speakers, words, word_offsets)
+
+    def to_dicts(self):
+        """Plain list of segment dicts, e.g. for JSON output"""
+        return [dict(segment) for segment in self]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Segment(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("segment index out of range")
+            return Segment(self, int(index))
+        if isinstance(index, slice) and index.step in (None, 1):
+            start, stop, _ = index.indices(len(self))
+            return self._slice(start, max(start, stop))
+        return self.take(np.arange(len(self))[index])
+
+    def __repr__(self):
+        return f"SegmentStore({len(self)} segments, {self.duration:.1f}s)"
+
+    def _slice(self, start, stop):
+        """Contiguous sub-store sharing every array and the text buffer"""
+        return SegmentStore(
+            self.starts[start:stop], self.ends[start:stop], self.text_buffer,
+            self.text_offsets[start:stop + 1],
+            None if self.speaker_ids is None else self.speaker_ids[start:stop],
+            self.speakers, self.words,
+            None if self.word_offsets is None else self.word_offsets[start:stop + 1])
+
+    def take(self, indices):
+        """Sub-store of the segments at the given indices"""
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return self._slice(0, 0)
+        if indices[-1] - indices[0] + 1 == len(indices) and np.all(np.diff(indices) == 1):
+            return self._slice(int(indices[0]), int(indices[-1]) + 1)
+
+        texts = [self.text(i) for i in indices]
+        text_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+
+        words = word_offsets = None
+        if self.words is not None:
+            counts = self.word_offsets[indices + 1] - self.word_offsets[indices]
+            word_indices = np.concatenate([
+                np.arange(self.word_offsets[i], self.word_offsets[i + 1]) for i in indices])
+            words = self.words.take(word_indices)
+            word_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        return SegmentStore(
+            self.starts[indices], self.ends[indices], "".join(texts), text_offsets,
+            None if self.speaker_ids is None else self.speaker_ids[indices],
+            self.speakers, words, word_offsets)
+
+    def text(self, index):
+        """Text of one segment"""
+        return self.text_buffer[self.text_offsets[index]:self.text_offsets[index + 1]]
+
+    @property
+    def texts(self):
+        """Texts of every segment as a list of strings"""
+        offsets = self.text_offsets.tolist()
+        return [self.text_buffer[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+
+    def speaker(self, index):
+        """Speaker label of one segment, or None"""
+        if self.speaker_ids is None or self.speaker_ids[index] < 0:
+            return None
+        return self.speakers[self.speaker_ids[index]]
+
+    @property
+    def duration(self):
+        return float(self.ends.max() - self.starts.min()) if len(self) else 0.0
+
+    def in_range(self, start_time, end_time):
+        """Segments overlapping [start_time, end_time), as a vectorized query"""
+        mask = (self.starts < end_time) & (self.ends > start_time)
+        return self.take(np.flatnonzero(mask))
+
+    def at(self, time):
+        """Segments being spoken at a time"""
+        return self.take(np.flatnonzero((self.starts <= time) & (self.ends > time)))
+
+    def with_times(self, starts, ends, word_starts=None, word_ends=None):
+        """Same segments with new start/end times (e.g. after remapping)"""
+        words = self.words
+        if words is not None and word_starts is not None:
+            words = words.with_times(word_starts, word_ends)
+        return SegmentStore(starts, ends, self.text_buffer, self.text_offsets,
+                            self.speaker_ids, self.speakers, words, self.word_offsets)
+
+    def with_speakers(self, speaker_ids, speakers):
+        """Same segments attributed to speakers (-1 for none)"""
+        return SegmentStore(self.starts, self.ends, self.text_buffer, self.text_offsets,
+                            speaker_ids, speakers, self.words, self.word_offsets)
+
+    def relabel(self, mapping, default=None):
+        """Rename speaker labels; unmapped labels become default(label) or stay"""
+        speakers = [mapping.get(label, default(label) if default else label)
+                    for label in self.speakers]
+        return SegmentStore(self.starts, self.ends, self.text_buffer, self.text_offsets,
+                            self.speaker_ids, speakers, self.words, self.word_offsets)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the store"""
+        total = (self.starts.nbytes + self.ends.nbytes + self.text_offsets.nbytes
+                 + len(self.text_buffer.encode('utf-8')))
+        if self.speaker_ids is not None:
+            total += self.speaker_ids.nbytes
+        if self.words is not None:
+            total += self.words.nbytes + self.word_offsets.nbytes
+        return total
+
+    def content_hash(self):
+        """Hash of the segments' content, without building dicts"""
+        digest = hashlib.blake2b(digest_size=20)
+        for array in (self.starts, self.ends, np.diff(self.text_offsets)):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        offsets = self.text_offsets
+        digest.update(self.text_buffer[offsets[0]:offsets[-1]].encode('utf-8'))
+        if self.speaker_ids is not None:
+            # Speaker ids renumbered by first appearance, so stores that
+            # differ only in their label tables hash the same
+            ids = self.speaker_ids
+            used, first = np.unique(ids[ids >= 0], return_index=True)
+            used = used[np.argsort(first)]
+            remap = np.full(len(self.speakers) + 1, -1, dtype=np.int32)
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            digest.update(remap[ids].tobytes())
+            digest.update(repr([self.speakers[i] for i in used]).encode('utf-8'))
+        if self.words is not None:
+            digest.update(np.diff(self.word_offsets).tobytes())
+            digest.update(self.words.content_hash().encode('utf-8'))
+        return digest.hexdigest()
+
+    def compact(self):
+        """Copy holding only this store's own text and words
+
+        Slices share their parent's text buffer and word store; compacting
+        drops the rest so a slice doesn't keep (or pickle) the whole transcript.
+        """
+        first, last = int(self.text_offsets[0]), int(self.text_offsets[-1])
+        words = word_offsets = None
+        if self.words is not None:
+            word_first, word_last = int(self.word_offsets[0]), int(self.word_offsets[-1])
+            words = self.words._slice(word_first, word_last).compact()
+            word_offsets = self.word_offsets - word_first
+        return SegmentStore(self.starts.copy(), self.ends.copy(), self.text_buffer[first:last],
+                            self.text_offsets - first,
+                            None if self.speaker_ids is None else self.speaker_ids.copy(),
+                            self.speakers, words, word_offsets)
+
+    def __reduce__(self):
+        store = self
+        if (self.text_offsets[0] != 0 or self.text_offsets[-1] != len(self.text_buffer)
+                or (self.words is not None
+                    and (self.word_offsets[0] != 0 or self.word_offsets[-1] != len(self.words)))):
+            store = self.compact()
+        return (SegmentStore, (store.starts, store.ends, store.text_buffer, store.text_offsets,
+                               store.speaker_ids, store.speakers, store.words, store.word_offsets))
+
+
+def segment_texts(segments):
+    """Texts of a SegmentStore or of a list of segment dicts"""
+    if isinstance(segments, SegmentStore):
+        return segments.texts
+    return [segment['text'] for segment in segments]
+
+
+class Segment(Mapping):
+    """Read-only, dict-compatible view of one segment in a SegmentStore"""
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def _keys(self):
+        keys = ['start', 'end', 'text']
+        store = self._store
+        if store.speaker_ids is not None:
+            keys.append('speaker')
+        if store.words is not None and store.word_offsets[self._index + 1] > store.word_offsets[self._index]:
+            keys.append('words')
+        return keys
+
+    def __getitem__(self, key):
+        store = self._store
+        index = self._index
+        if key == 'start':
+            return float(store.starts[index])
+        if key == 'end':
+            return float(store.ends[index])
+        if key == 'text':
+            return store.text(index)
+        if key == 'speaker' and store.speaker_ids is not None:
+            return store.speaker(index)
+        if key == 'words' and 'words' in self._keys():
+            words = store.words[int(store.word_offsets[index]):int(store.word_offsets[index + 1])]
+            return [{'word': word['text'], 'start': word['start'], 'end': word['end']}
+                    for word in words]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return repr(dict(self))
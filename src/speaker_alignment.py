@@ -0,0 +1,179 @@
+# src/speaker_alignment.py - Attribute transcript words and segments to diarized speakers
+
+import os
+import sys
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from segment_store import SegmentStore
+
+
+def speaker_numbering(turns):
+    """{original label: "1", "2", ...} in order of each speaker's first turn"""
+    labels = {}
+    for turn in sorted(turns, key=lambda turn: turn['start']):
+        labels.setdefault(turn['speaker'], str(len(labels) + 1))
+    return labels
+
+
+def number_speakers(turns):
+    """Relabel turns "1", "2", ... in order of each speaker's first turn
+
+    pyannote labels (SPEAKER_00, ...) carry no meaning; numbering by first
+    appearance matches the labels custom speaker names are assigned to.
+    """
+    labels = speaker_numbering(turns)
+    return [{**turn, 'speaker': labels[turn['speaker']]}
+            for turn in sorted(turns, key=lambda turn: turn['start'])]
+
+
+class SpeakerCoverage:
+    """Per-speaker talk time, queryable for any interval in O(log n)
+
+    Each speaker's turns are merged into sorted, disjoint intervals with a
+    running total of talk time, so the time a speaker talks inside [s, e] is
+    covered(e) - covered(s), found with two binary searches instead of a
+    scan over every turn.
+    """
+
+    def __init__(self, turns):
+        by_speaker = {}
+        for turn in turns:
+            if turn['end'] > turn['start']:
+                by_speaker.setdefault(turn['speaker'], []).append((turn['start'], turn['end']))
+
+        self.speakers = sorted(by_speaker)
+        self._starts = []
+        self._ends = []
+        self._before = []
+        for speaker in self.speakers:
+            intervals = np.array(sorted(by_speaker[speaker]), dtype=np.float64)
+            starts, ends = _merge_intervals(intervals[:, 0], intervals[:, 1])
+            self._starts.append(starts)
+            self._ends.append(ends)
+            self._before.append(np.concatenate([[0.0], np.cumsum(ends - starts)[:-1]]))
+
+    def covered(self, speaker_index, times):
+        """Talk time of one speaker from the start of the recording up to each time"""
+        starts = self._starts[speaker_index]
+        ends = self._ends[speaker_index]
+        index = np.searchsorted(starts, times, side='right') - 1
+        inside = np.clip(times - starts[np.clip(index, 0, None)], 0.0,
+                         (ends - starts)[np.clip(index, 0, None)])
+        return np.where(index >= 0, self._before[speaker_index][np.clip(index, 0, None)] + inside, 0.0)
+
+    def overlaps(self, starts, ends):
+        """(queries, speakers) matrix of talk time inside each query interval"""
+        return np.stack([self.covered(k, ends) - self.covered(k, starts)
+                         for k in range(len(self.speakers))], axis=1)
+
+    def distances(self, times):
+        """(queries, speakers) matrix of the gap from each time to the speaker's nearest turn"""
+        columns = []
+        for starts, ends in zip(self._starts, self._ends):
+            index = np.searchsorted(starts, times, side='right') - 1
+            before = np.where(index >= 0, times - ends[np.clip(index, 0, None)], np.inf)
+            after_index = np.clip(index + 1, 0, len(starts) - 1)
+            after = np.where(index + 1 < len(starts), starts[after_index] - times, np.inf)
+            columns.append(np.maximum(np.minimum(before, after), 0.0))
+        return np.stack(columns, axis=1)
+
+    def assign(self, starts, ends, max_gap=1.0):
+        """Speaker label for each interval, or None
+
+        The speaker who talks longest inside the interval wins; intervals no
+        turn touches (e.g. in a pause) go to the nearest speaker within
+        max_gap seconds.
+        """
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.maximum(np.asarray(ends, dtype=np.float64), starts)
+        if len(starts) == 0 or not self.speakers:
+            return [None] * len(starts)
+
+        overlap = self.overlaps(starts, ends)
+        best = np.argmax(overlap, axis=1)
+        has_overlap = overlap[np.arange(len(starts)), best] > 0
+
+        distance = self.distances((starts + ends) / 2)
+        nearest = np.argmin(distance, axis=1)
+        close = distance[np.arange(len(starts)), nearest] <= max_gap
+
+        choice = np.where(has_overlap, best, nearest)
+        return [self.speakers[k] if (overlapping or near) else None
+                for k, overlapping, near in zip(choice, has_overlap, close)]
+
+
+def _merge_intervals(starts, ends):
+    """Merge sorted, possibly overlapping intervals into disjoint ones"""
+    # A new interval starts wherever a start lies beyond every earlier end
+    running_end = np.maximum.accumulate(ends)
+    new_group = np.concatenate([[True], starts[1:] > running_end[:-1]])
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.concatenate([group_starts[1:], [len(starts)]]) - 1
+    return starts[group_starts], running_end[group_ends]
+
+
+def align_transcript(segments, turns, max_gap=1.0):
+    """Speaker-attributed transcript from transcript segments and diarization turns
+
+    Words are attributed individually when the segments carry word timings,
+    so a segment spanning a change of speaker is split at the change;
+    otherwise whole segments are attributed. Returns a SegmentStore whose
+    segments have a 'speaker' (None where no speaker is near).
+    """
+    segments = SegmentStore.from_dicts(segments)
+    coverage = SpeakerCoverage(turns)
+    labels = {speaker: index for index, speaker in enumerate(coverage.speakers)}
+
+    def speaker_ids(starts, ends):
+        return np.array([-1 if speaker is None else labels[speaker]
+                         for speaker in coverage.assign(starts, ends, max_gap)], dtype=np.int32)
+
+    if segments.words is not None:
+        word_counts = np.diff(segments.word_offsets)
+    else:
+        word_counts = np.zeros(len(segments), dtype=np.int64)
+
+    # Segments without word timings are attributed whole
+    whole = np.flatnonzero(word_counts == 0)
+    starts = [segments.starts[whole]]
+    ends = [segments.ends[whole]]
+    ids = [speaker_ids(segments.starts[whole], segments.ends[whole])]
+    texts = [segments.text(i) for i in whole]
+
+    if segments.words is not None and len(segments.words):
+        words = segments.words[int(segments.word_offsets[0]):int(segments.word_offsets[-1])]
+        word_ids = speaker_ids(words.starts, words.ends)
+        word_segments = np.repeat(np.arange(len(segments)), word_counts)
+
+        # A run of words ends at a change of speaker or of source segment
+        boundaries = np.flatnonzero((np.diff(word_ids) != 0) | (np.diff(word_segments) != 0)) + 1
+        run_starts = np.concatenate([[0], boundaries])
+        run_ends = np.concatenate([boundaries, [len(words)]])
+
+        word_texts = words.texts
+        starts.append(words.starts[run_starts])
+        ends.append(words.ends[run_ends - 1])
+        ids.append(word_ids[run_starts])
+        texts.extend("".join(word_texts[a:b]).strip() for a, b in zip(run_starts, run_ends))
+
+    starts = np.concatenate(starts)
+    order = np.argsort(starts, kind='stable')
+    texts = [texts[i] for i in order]
+    text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+    return SegmentStore(starts[order], np.concatenate(ends)[order], "".join(texts), text_offsets,
+                        np.concatenate(ids)[order], coverage.speakers)
+
+
+def speaker_texts(aligned):
+    """Everything each speaker said, in order: {speaker: text}"""
+    aligned = SegmentStore.from_dicts(aligned)
+    texts = {}
+    for index, text in enumerate(aligned.texts):
+        speaker = aligned.speaker(index)
+        if speaker is not None and text:
+            texts.setdefault(speaker, []).append(text)
+    return {speaker: " ".join(parts) for speaker, parts in texts.items()}
@@ -0,0 +1,240 @@
+# src/speaker_clustering.py - Diarization from speaker embeddings of short speech windows
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.cluster.vq import kmeans2
+from scipy.sparse.linalg import eigsh
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from voice_activity import VoiceActivityDetector
+
+
+def speech_windows(speech_regions, window_seconds=1.5, step_seconds=0.75, min_seconds=0.4):
+    """(starts, ends) of overlapping embedding windows covering the speech regions
+
+    Regions shorter than a window get one window of their own length;
+    longer ones get windows every step_seconds, the last one ending exactly
+    at the region's end. Regions under min_seconds are too short to embed.
+    """
+    starts = []
+    ends = []
+    for start, end in speech_regions:
+        if end - start < min_seconds:
+            continue
+        if end - start <= window_seconds:
+            region_starts = np.array([start])
+        else:
+            region_starts = np.append(np.arange(start, end - window_seconds, step_seconds),
+                                      end - window_seconds)
+        starts.append(region_starts)
+        ends.append(np.minimum(region_starts + window_seconds, end))
+    if not starts:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+class EmbeddingExtractor:
+    """Speaker embeddings for audio windows, computed in batches
+
+    embed_batch maps a (batch, frames) float32 array to (batch, dim)
+    embeddings. Windows shorter than the longest are filled by repeating
+    their audio, so every batch is one dense array; batches can run on a
+    thread pool (torch releases the GIL inside its kernels).
+    """
+
+    def __init__(self, embed_batch, sample_rate=16000, batch_size=32, workers=1):
+        self.embed_batch = embed_batch
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def extract(self, samples, starts, ends):
+        """(windows, dim) float32 embeddings for the windows [starts, ends) in seconds"""
+        first = np.round(np.asarray(starts) * self.sample_rate).astype(np.int64)
+        last = np.minimum(np.round(np.asarray(ends) * self.sample_rate).astype(np.int64), len(samples))
+        frames = int((last - first).max())
+
+        def batch(index):
+            rows = range(index, min(index + self.batch_size, len(first)))
+            waveforms = np.empty((len(rows), frames), dtype=np.float32)
+            for row, window in enumerate(rows):
+                waveforms[row] = np.resize(samples[first[window]:last[window]], frames)
+            return np.asarray(self.embed_batch(waveforms), dtype=np.float32)
+
+        indices = range(0, len(first), self.batch_size)
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                embeddings = list(pool.map(batch, indices))
+        else:
+            embeddings = [batch(index) for index in indices]
+        return np.concatenate(embeddings)
+
+
+def knn_affinity(embeddings, neighbors, block_size=1024):
+    """Sparse, symmetric cosine-similarity graph keeping each window's nearest neighbours
+
+    Similarities are computed block by block in float32, so memory stays at
+    block_size x n instead of a full n x n float64 distance matrix.
+    """
+    n = len(embeddings)
+    rows = []
+    cols = []
+    values = []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        similarity = embeddings[start:stop] @ embeddings.T
+        similarity[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        nearest = np.argpartition(similarity, -neighbors, axis=1)[:, -neighbors:]
+        rows.append(np.repeat(np.arange(start, stop), neighbors))
+        cols.append(nearest.ravel())
+        values.append(np.take_along_axis(similarity, nearest, axis=1).ravel())
+    affinity = sparse.csr_matrix(
+        (np.maximum(np.concatenate(values), 0.0), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n, n))
+    return affinity.maximum(affinity.T)
+
+
+def cluster_embeddings(embeddings, min_speakers=1, max_speakers=10, neighbors=None,
+                       merge_threshold=0.7, block_size=1024):
+    """Speaker label (0, 1, ...) for each embedding, with the speaker count estimated
+
+    Spectral clustering on a k-nearest-neighbour cosine graph: the number
+    of speakers is where the eigenvalues of the normalized affinity drop the
+    most (the eigengap), bounded by min_speakers/max_speakers; windows are
+    then grouped by k-means on the leading eigenvectors. Clusters whose
+    mean embeddings are more similar than merge_threshold are merged, which
+    keeps one speaker from being split in two.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    max_speakers = max(1, min(max_speakers, n))
+    min_speakers = max(1, min(min_speakers, max_speakers))
+    if n <= 2 or max_speakers == 1:
+        return np.zeros(n, dtype=np.int64)
+
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-8)
+    if neighbors is None:
+        neighbors = int(np.clip(np.sqrt(n), 5, 50))
+    neighbors = min(neighbors, n - 1)
+    affinity = knn_affinity(embeddings, neighbors, block_size)
+
+    degree = np.asarray(affinity.sum(axis=1)).ravel()
+    scale = sparse.diags(1.0 / np.sqrt(np.maximum(degree, 1e-8)))
+    normalized = scale @ affinity @ scale
+
+    count = min(max_speakers + 1, n - 1)
+    # The eigengap of k speakers needs eigenvalues k and k + 1
+    max_speakers = min(max_speakers, count - 1)
+    min_speakers = min(min_speakers, max_speakers)
+    if n <= 200:
+        values, vectors = np.linalg.eigh(normalized.toarray())
+        values, vectors = values[::-1][:count], vectors[:, ::-1][:, :count]
+    else:
+        values, vectors = eigsh(normalized, k=count, which='LA', tol=1e-4)
+        order = np.argsort(values)[::-1]
+        values, vectors = values[order], vectors[:, order]
+
+    gaps = values[:-1] - values[1:]
+    speakers = min_speakers + int(np.argmax(gaps[min_speakers - 1:max_speakers]))
+    if speakers == 1:
+        return np.zeros(n, dtype=np.int64)
+
+    points = vectors[:, :speakers]
+    points = points / np.maximum(np.linalg.norm(points, axis=1, keepdims=True), 1e-8)
+    _, labels = kmeans2(points, speakers, minit='++', seed=0)
+    labels = _merge_similar_clusters(embeddings, labels, merge_threshold, min_speakers)
+
+    # Relabel 0, 1, ... in order of first appearance
+    _, first = np.unique(labels, return_index=True)
+    order = np.argsort(first)
+    remap = np.empty(labels.max() + 1, dtype=np.int64)
+    remap[np.unique(labels)[order]] = np.arange(len(order))
+    return remap[labels]
+
+
+def _merge_similar_clusters(embeddings, labels, threshold, min_speakers):
+    """Merge the most similar pair of clusters while their centroids exceed threshold"""
+    labels = labels.copy()
+    while True:
+        clusters = np.unique(labels)
+        if len(clusters) <= min_speakers:
+            return labels
+        centroids = np.stack([embeddings[labels == label].mean(axis=0) for label in clusters])
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-8)
+        similarity = centroids @ centroids.T
+        np.fill_diagonal(similarity, -np.inf)
+        a, b = np.unravel_index(np.argmax(similarity), similarity.shape)
+        if similarity[a, b] < threshold:
+            return labels
+        labels[labels == clusters[b]] = clusters[a]
+
+
+def windows_to_turns(starts, ends, labels):
+    """Speaker turns from labelled, possibly overlapping windows
+
+    Where consecutive windows overlap the boundary is put halfway through
+    the overlap; touching windows of the same speaker become one turn.
+    """
+    if len(starts) == 0:
+        return []
+    order = np.argsort(starts, kind='stable')
+    starts, ends, labels = starts[order], ends[order], np.asarray(labels)[order]
+    left = starts.copy()
+    right = ends.copy()
+    overlap = starts[1:] < ends[:-1]
+    middle = (starts[1:] + ends[:-1]) / 2
+    right[:-1] = np.where(overlap, middle, right[:-1])
+    left[1:] = np.where(overlap, middle, left[1:])
+
+    new_turn = np.concatenate([[True], (labels[1:] != labels[:-1]) | (left[1:] > right[:-1] + 1e-6)])
+    first = np.flatnonzero(new_turn)
+    last = np.concatenate([first[1:], [len(starts)]]) - 1
+    return [{'start': float(left[a]), 'end': float(right[b]), 'speaker': f"SPEAKER_{labels[a]:02d}"}
+            for a, b in zip(first, last)]
+
+
+class EmbeddingDiarizer:
+    """Diarization built from VAD, batched window embeddings and clustering
+
+    Called like a pyannote pipeline on an AudioBuffer (optionally with
+    precomputed speech regions), returning speaker turns. The mean
+    embedding of each speaker in the last call is kept in last_centroids.
+    """
+
+    def __init__(self, embed_batch, sample_rate=16000, window_seconds=1.5, step_seconds=0.75,
+                 batch_size=32, workers=1, min_speakers=1, max_speakers=20):
+        self.extractor = EmbeddingExtractor(embed_batch, sample_rate, batch_size, workers)
+        self.vad = VoiceActivityDetector()
+        self.window_seconds = window_seconds
+        self.step_seconds = step_seconds
+        self.min_speakers = min_speakers
+        self.max_speakers = max_speakers
+        self.last_centroids = {}
+
+    def __call__(self, audio, speech_regions=None, min_speakers=None, max_speakers=None):
+        if speech_regions is None:
+            speech_regions = self.vad.detect_buffer(audio)
+        starts, ends = speech_windows(speech_regions, self.window_seconds, self.step_seconds)
+        if len(starts) == 0:
+            self.last_centroids = {}
+            return []
+
+        embeddings = self.extractor.extract(audio.samples, starts, ends)
+        labels = cluster_embeddings(embeddings,
+                                    min_speakers or self.min_speakers,
+                                    max_speakers or self.max_speakers)
+
+        turns = windows_to_turns(starts, ends, labels)
+        self.last_centroids = {}
+        for label in np.unique(labels):
+            centroid = embeddings[labels == label].mean(axis=0)
+            self.last_centroids[f"SPEAKER_{label:02d}"] = centroid / max(np.linalg.norm(centroid), 1e-8)
+        return turns
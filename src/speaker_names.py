@@ -0,0 +1,126 @@
+# src/speaker_names.py - Names for diarized speakers, applied when results are shown
+
+import json
+import os
+import re
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model_utils import get_cache_dir
+from segment_store import SegmentStore
+
+# "Speaker 3" as written in transcripts and generated notes
+_SPEAKER_REFERENCE = re.compile(r"\bSpeaker (\d+)\b")
+
+
+def default_name(label):
+    """Display name of a speaker nobody has named"""
+    return f"Speaker {label}"
+
+
+class SpeakerNames:
+    """Mapping from speaker labels ("1", "2", ...) to display names
+
+    Processing results keep the diarization labels and names are applied
+    only when results are shown or rendered, so renaming a speaker is one
+    dict update - whatever the number of speakers or the length of the
+    recording - instead of a rerun. A mapping made for a recording is saved
+    under its content hash and restored when the recording is opened again.
+    """
+
+    def __init__(self, names=None, path=None):
+        self.path = path
+        self._names = {}
+        self.update(names or {})
+
+    @classmethod
+    def for_recording(cls, content_hash):
+        """Names saved for a recording, or an empty mapping that will be saved for it"""
+        if content_hash is None:
+            return cls()
+        path = os.path.join(get_cache_dir("speaker_names"), f"{content_hash}.json")
+        names = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    names = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Warning: Could not read speaker names {path}: {e}")
+        return cls(names, path)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, label):
+        return label in self._names
+
+    def as_dict(self):
+        """{label: name} for the named speakers"""
+        return dict(self._names)
+
+    def name(self, label):
+        return self._names.get(label) or default_name(label)
+
+    def rename(self, label, name):
+        """Name one speaker; an empty name removes their name"""
+        name = (name or "").strip()
+        if name:
+            self._names[str(label)] = name
+        else:
+            self._names.pop(str(label), None)
+
+    def update(self, names):
+        """Add names keyed by label, or listed in speaker order"""
+        if isinstance(names, SpeakerNames):
+            names = names.as_dict()
+        elif not isinstance(names, dict):
+            names = {str(index + 1): name for index, name in enumerate(names)}
+        for label, name in names.items():
+            self.rename(label, name)
+
+    def save(self):
+        """Write the mapping next to the recording's other cached results"""
+        if self.path is None:
+            return
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._names, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def apply_transcript(self, transcript):
+        """Transcript with speaker labels replaced by names
+
+        A SegmentStore only gets a new speaker table; its arrays are shared.
+        """
+        if isinstance(transcript, SegmentStore):
+            return transcript.relabel(self._names, default=default_name)
+        return [{**segment, 'speaker': self.name(segment['speaker'])}
+                if segment.get('speaker') is not None else segment
+                for segment in transcript]
+
+    def apply_texts(self, texts):
+        """{name: text} from per-speaker texts keyed by label"""
+        return {self.name(label): text for label, text in texts.items()}
+
+    def apply_text(self, text):
+        """Text with "Speaker N" references replaced by names"""
+        if not self._names or not text:
+            return text
+        return _SPEAKER_REFERENCE.sub(lambda match: self.name(match.group(1)), text)
+
+    def apply_notes(self, notes):
+        """Notes with "Speaker N" references replaced by names"""
+        if not self._names or isinstance(notes, str):
+            return notes
+
+        rename = self.apply_text
+        return {
+            **notes,
+            "summary": rename(notes.get("summary", "")),
+            "key_points": [rename(point) for point in notes.get("key_points", [])],
+            "action_items": [rename(item) for item in notes.get("action_items", [])],
+            "speaker_notes": {self._names.get(speaker, rename(speaker)): rename(text)
+                              for speaker, text in notes.get("speaker_notes", {}).items()},
+        }
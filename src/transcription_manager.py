@@ -1,21 +1,66 @@
 # src/transcription_manager.py - Audio transcription
 
 import whisper
+import torch
+import numpy as np
 from datetime import timedelta
 import ssl
 import urllib.request
 import sys
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Add src to path for imports  
 sys.path.insert(0, os.path.dirname(__file__))
 
-from model_utils import get_resource_path, is_running_from_executable
+from model_utils import (get_resource_path, is_running_from_executable, get_model_registry,
+                         get_model_path, offline_mode, load_torch_checkpoint,
+                         float32_checkpoint, get_thread_budget)
+from audio_buffer import AudioBuffer
+from chunking import plan_chunks, merge_chunk_segments, owned_segments
+from voice_activity import VoiceActivityDetector, SpeechTimeline
+from result_cache import get_result_cache
+from segment_store import SegmentStore
+
+# Chunk lengths for batch and streamed transcription; streaming uses shorter
+# chunks so the first text appears sooner
+CHUNK_SECONDS = 60.0
+STREAM_CHUNK_SECONDS = 30.0
+CHUNK_OVERLAP_SECONDS = 2.0
+
+# Transcription manager owned by each chunk worker process
+_chunk_worker = None
+
+
+def _init_chunk_worker(model_size, threads_per_worker):
+    """Load Whisper once in a chunk worker process"""
+    global _chunk_worker
+    torch.set_num_threads(threads_per_worker)
+    _chunk_worker = TranscriptionManager()
+    _chunk_worker.load_model(model_size)
+
+
+def _transcribe_chunk(region):
+    """Transcribe one AudioBuffer region with word timings, relative to its start"""
+    result = _chunk_worker.model.transcribe(region.samples, word_timestamps=True)
+    return _chunk_worker._extract_segments(result, include_words=True)
+
 
 class TranscriptionManager:
     def __init__(self):
         # Initialize the whisper model
         self.model = None
+        self.model_size = "base"
+        # Word timings let speaker attribution split segments at speaker changes
+        self.word_timestamps = True
+        self._model_handle = None
+        self._chunk_pool = None
+        self._chunk_pool_workers = 0
+        self._chunk_pool_threads = 0
+        self.vad = VoiceActivityDetector()
+        self.last_vad_stats = None
+        self._last_error = None
         # Create SSL context that doesn't verify certificates
         self._setup_ssl_context()
     
@@ -29,23 +74,96 @@ class TranscriptionManager:
     def load_model(self, model_size="base"):
         """Load transcription model"""
         try:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            
             # When running from executable, we need to use embedded models
             if is_running_from_executable():
                 # For PyInstaller, we'll try to load from the embedded location
                 print("Loading Whisper model from executable...")
-                # For now, let's use the default whisper path which should work with PyInstaller
-                self.model = whisper.load_model(model_size)
             else:
                 # Regular path for development
                 print("Loading Whisper model from local...")
-                self.model = whisper.load_model(model_size)
+            
+            # The registry shares one loaded model between all managers
+            handle = get_model_registry().acquire(
+                "whisper", lambda: self._load_whisper(model_size, device),
+                size=model_size, dtype="float32", device=device)
+            self.release_model()
+            self._model_handle = handle
+            self.model = handle.model
+            self.model_size = model_size
             
             print(f"✓ Transcription model ({model_size}) loaded successfully")
         except Exception as e:
             print(f"Error loading transcription model: {e}")
     
+    def _load_whisper(self, model_size, device):
+        """Whisper from models/whisper/<size>.pt or the download cache, memory-mapped
+        
+        whisper.load_model reads (and hashes) the whole checkpoint into
+        memory before building the model, and the network is never touched
+        here when the file is present. On the CPU the float16 checkpoint is
+        converted to float32 once, and that copy is mapped and used as the
+        model's parameters, so processes running the same model share its
+        pages; on a GPU the weights are copied to the device either way.
+        """
+        checkpoint_path = get_model_path(os.path.join("whisper", f"{model_size}.pt"))
+        if checkpoint_path is None and model_size in whisper._MODELS:
+            download_root = os.path.join(
+                os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "whisper")
+            cached = os.path.join(download_root, os.path.basename(whisper._MODELS[model_size]))
+            if os.path.isfile(cached):
+                checkpoint_path = cached
+        
+        if checkpoint_path is None:
+            if offline_mode():
+                raise RuntimeError(f"Whisper {model_size} is not in models/whisper or the "
+                                   "download cache, and offline mode is on")
+            return whisper.load_model(model_size, device=device)
+        
+        on_cpu = torch.device(device).type == "cpu"
+        if on_cpu:
+            checkpoint_path = float32_checkpoint(checkpoint_path)
+        checkpoint = load_torch_checkpoint(checkpoint_path)
+        model = whisper.model.Whisper(whisper.model.ModelDimensions(**checkpoint["dims"]))
+        try:
+            # The mapped tensors become the parameters instead of being copied
+            model.load_state_dict(checkpoint["model_state_dict"], assign=on_cpu)
+        except TypeError:
+            # torch < 2.1
+            model.load_state_dict(checkpoint["model_state_dict"])
+        del checkpoint
+        if model_size in whisper._ALIGNMENT_HEADS:
+            # Needed for word timestamps
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_size])
+        return model.to(device)
+    
+    def release_model(self):
+        """Release this manager's reference to the shared model"""
+        if self._model_handle is not None:
+            self._model_handle.release()
+            self._model_handle = None
+        self.model = None
+    
     def transcribe_audio(self, audio_file):
-        """Transcribe audio file to text"""
+        """Transcribe audio file (path or AudioBuffer) to text"""
+        # Results for audio already transcribed by this model come from the cache
+        cache = get_result_cache()
+        return cache.cached(
+            "transcribe_audio", cache.audio_hash(audio_file),
+            lambda: self._transcribe_audio(audio_file),
+            model_id=f"whisper-{self.model_size}",
+            params={'word_timestamps': self.word_timestamps},
+            should_store=lambda _: self._transcribed_successfully())
+    
+    def _transcribed_successfully(self):
+        """Whether the last transcription came from the real model without errors"""
+        return self.model is not None and self._last_error is None
+    
+    def _transcribe_audio(self, audio_file):
+        """Run Whisper over the whole audio in a single pass"""
+        self._last_error = None
+        
         # Check if model is loaded
         if self.model is None:
             self.load_model()
@@ -61,30 +179,22 @@ class TranscriptionManager:
                 {"start": 22.3, "end": 28.7, "text": "There are a few minor issues that need to be addressed."},
                 {"start": 28.7, "end": 35.1, "text": "Overall, the project is on track for the release date."}
             ]
-            return mock_transcription
+            return SegmentStore.from_dicts(mock_transcription)
         
         try:
             # ACTUAL WHISPER IMPLEMENTATION
             print(f"Transcribing audio file: {audio_file}")
             
-            # Run the actual transcription
-            result = self.model.transcribe(audio_file)
-            
-            # Extract segments with timing information (simplified approach to avoid type errors)
-            transcription_segments = []
+            # Run the actual transcription; Whisper reads a shared buffer's
+            # 16 kHz samples directly instead of decoding the file again
+            if isinstance(audio_file, AudioBuffer):
+                result = self.model.transcribe(audio_file.samples,
+                                               word_timestamps=self.word_timestamps)
+            else:
+                result = self.model.transcribe(audio_file, word_timestamps=self.word_timestamps)
             
-            # Check if result has segments and handle appropriately
-            try:
-                if 'segments' in result and isinstance(result['segments'], list):
-                    for segment in result['segments']:
-                        if isinstance(segment, dict):
-                            transcription_segments.append({
-                                'start': segment.get('start', 0.0),
-                                'end': segment.get('end', 0.0), 
-                                'text': segment.get('text', '').strip()
-                            })
-            except Exception as e:
-                print(f"Error processing segments: {e}")
+            # Extract segments with timing information
+            transcription_segments = self._extract_segments(result, self.word_timestamps)
             
             # If no segments found, return a default structure
             if not transcription_segments:
@@ -92,16 +202,295 @@ class TranscriptionManager:
                     {"start": 0.0, "end": 5.0, "text": "Transcription completed successfully"}
                 ]
             
-            return transcription_segments
+            # Long transcripts are kept as arrays instead of thousands of dicts
+            return SegmentStore.from_dicts(transcription_segments)
             
         except Exception as e:
             print(f"Error during transcription: {e}")
+            self._last_error = e
             # Return mock results if there's an error
-            return [
+            return SegmentStore.from_dicts([
                 {"start": 0.0, "end": 5.0, "text": f"Error during transcription: {str(e)}"}
-            ]
+            ])
+    
+    def _extract_segments(self, result, include_words=False):
+        """Turn a Whisper result into a list of segment dicts"""
+        # Extract segments with timing information (simplified approach to avoid type errors)
+        transcription_segments = []
+        
+        # Check if result has segments and handle appropriately
+        try:
+            if 'segments' in result and isinstance(result['segments'], list):
+                for segment in result['segments']:
+                    if isinstance(segment, dict):
+                        entry = {
+                            'start': segment.get('start', 0.0),
+                            'end': segment.get('end', 0.0), 
+                            'text': segment.get('text', '').strip()
+                        }
+                        if include_words and segment.get('words'):
+                            entry['words'] = [
+                                {'word': w['word'], 'start': w['start'], 'end': w['end']}
+                                for w in segment['words']
+                            ]
+                        transcription_segments.append(entry)
+        except Exception as e:
+            print(f"Error processing segments: {e}")
+        
+        return transcription_segments
+    
+    def transcribe_chunked(self, audio, chunk_seconds=CHUNK_SECONDS, overlap_seconds=CHUNK_OVERLAP_SECONDS,
+                           workers=None, threads_per_worker=None):
+        """Transcribe long audio as overlapping chunks in parallel worker processes
+        
+        Chunk boundaries are placed at quiet points, each worker loads Whisper
+        once and transcribes AudioBuffer regions (shared through the memory
+        map, not copied), and the per-chunk segments are stitched back onto
+        the global timeline with overlap duplicates removed. Audio shorter
+        than two chunks goes through transcribe_audio instead.
+        """
+        audio = self._as_buffer(audio)
+        if not isinstance(audio, AudioBuffer):
+            return self.transcribe_audio(audio)
+        
+        chunks = plan_chunks(audio.samples, audio.sample_rate, chunk_seconds, overlap_seconds)
+        if len(chunks) < 2:
+            return self.transcribe_audio(audio)
+        
+        # Make sure Whisper can be loaded before starting a pool of workers
+        if self.model is None:
+            self.load_model(self.model_size)
+        if self.model is None:
+            return self.transcribe_audio(audio)
+        
+        try:
+            print(f"Transcribing {audio.duration:.0f}s of audio in {len(chunks)} chunks...")
+            pool = self._get_chunk_pool(workers, threads_per_worker)
+            regions = [audio.region(chunk['start'], chunk['end']) for chunk in chunks]
+            chunk_segments = list(pool.map(_transcribe_chunk, regions))
+            
+            segments = merge_chunk_segments(list(zip(chunks, chunk_segments)))
+            if not self.word_timestamps:
+                for segment in segments:
+                    segment.pop('words', None)
+            if not segments:
+                return self.transcribe_audio(audio)
+            return SegmentStore.from_dicts(segments)
+        except Exception as e:
+            print(f"Error during chunked transcription: {e}")
+            self.shutdown_chunk_pool()
+            return self.transcribe_audio(audio)
+    
+    def _get_chunk_pool(self, workers=None, threads_per_worker=None):
+        """Create (or reuse) the worker pool used for chunked transcription"""
+        # Stay within this stage's share of the pipeline's thread budget
+        # while diarization runs alongside; torch's own thread count is
+        # process-wide and may have been set by the other stage
+        cpu_budget = get_thread_budget()
+        threads_per_worker = threads_per_worker or min(4, cpu_budget)
+        workers = workers or max(1, cpu_budget // threads_per_worker)
+        
+        if (self._chunk_pool is None or self._chunk_pool_workers != workers
+                or self._chunk_pool_threads != threads_per_worker):
+            self.shutdown_chunk_pool()
+            # Workers are spawned, not forked: the GUI and pipeline run this
+            # from threads, and forking a threaded process holding torch
+            # state can deadlock the child
+            self._chunk_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunk_worker,
+                initargs=(self.model_size, threads_per_worker))
+            self._chunk_pool_workers = workers
+            self._chunk_pool_threads = threads_per_worker
+        return self._chunk_pool
+    
+    def shutdown_chunk_pool(self):
+        """Stop the chunk worker processes"""
+        if self._chunk_pool is not None:
+            self._chunk_pool.shutdown(cancel_futures=True)
+            self._chunk_pool = None
+            self._chunk_pool_workers = 0
+            self._chunk_pool_threads = 0
+    
+    def transcribe_with_vad(self, audio_file, speech_regions=None, chunked=True, speech_audio=None):
+        """Transcribe with voice activity detection
+        
+        Only the detected speech regions are transcribed: they are packed
+        into one shared buffer, transcribed (in parallel chunks when long),
+        and the segment times are mapped back onto the original recording.
+        speech_audio is that packed buffer when the caller already has it
+        (see AudioProcessor.load_speech_buffer). The share of audio skipped
+        is kept in self.last_vad_stats.
+        """
+        audio = self._as_buffer(audio_file)
+        if not isinstance(audio, AudioBuffer):
+            return self.transcribe_audio(audio_file)
+        
+        if speech_regions is None:
+            speech_regions = self.vad.detect_buffer(audio)
+        self.last_vad_stats = VoiceActivityDetector.stats(speech_regions, audio.duration)
+        print(f"VAD: skipping {self.last_vad_stats['skipped_fraction']:.0%} of the audio "
+              f"({self.last_vad_stats['skipped_seconds']:.0f}s of silence)")
+        
+        cache = get_result_cache()
+        # Chunking changes the segments, so it is part of the cache key
+        return cache.cached(
+            "transcribe_with_vad", cache.audio_hash(audio),
+            lambda: self._transcribe_speech(audio, speech_regions, chunked, speech_audio),
+            model_id=f"whisper-{self.model_size}",
+            params={'speech_regions': speech_regions, 'word_timestamps': self.word_timestamps,
+                    'chunk_seconds': CHUNK_SECONDS if chunked else None,
+                    'overlap_seconds': CHUNK_OVERLAP_SECONDS if chunked else None},
+            should_store=lambda _: self._transcribed_successfully())
+    
+    def transcribe_stream(self, audio_file, speech_regions=None, chunk_seconds=STREAM_CHUNK_SECONDS,
+                          overlap_seconds=CHUNK_OVERLAP_SECONDS, workers=None, threads_per_worker=None,
+                          speech_audio=None):
+        """Yield transcript segments in timeline order as each chunk is decoded
+        
+        Speech regions are split into chunks like transcribe_chunked, but
+        each chunk's segments are yielded (on the original timeline) as soon
+        as it and every earlier chunk are done, so the first text appears
+        after one chunk rather than after the whole file. The complete
+        transcript is cached like transcribe_with_vad's, keyed by the chunk
+        length, so streamed and batch transcripts are never mixed up.
+        """
+        audio = self._as_buffer(audio_file)
+        if not isinstance(audio, AudioBuffer):
+            yield from self.transcribe_audio(audio_file)
+            return
+        
+        if speech_regions is None:
+            speech_regions = self.vad.detect_buffer(audio)
+        self.last_vad_stats = VoiceActivityDetector.stats(speech_regions, audio.duration)
+        
+        cache = get_result_cache()
+        content_hash = cache.audio_hash(audio)
+        key = cache.make_key(
+            "transcribe_with_vad", content_hash, f"whisper-{self.model_size}",
+            {'speech_regions': speech_regions, 'word_timestamps': self.word_timestamps,
+             'chunk_seconds': chunk_seconds, 'overlap_seconds': overlap_seconds})
+        if content_hash is not None:
+            hit, value = cache.get(key)
+            if hit:
+                print("✓ Reusing cached transcribe_with_vad result")
+                yield from value
+                return
+        if not speech_regions:
+            return
+        
+        timeline = SpeechTimeline(speech_regions)
+        speech = speech_audio if speech_audio is not None else AudioBuffer.from_array(
+            timeline.extract(audio.samples, audio.sample_rate), audio.sample_rate)
+        segments = []
+        try:
+            for chunk_segments in self._stream_chunks(speech, chunk_seconds, overlap_seconds,
+                                                      workers, threads_per_worker):
+                chunk_segments = timeline.remap_segments(chunk_segments)
+                segments.extend(chunk_segments)
+                yield from chunk_segments
+        finally:
+            if speech is not speech_audio:
+                speech.close()
+        
+        if content_hash is not None and self._transcribed_successfully():
+            cache.put(key, "transcribe_with_vad", SegmentStore.from_dicts(segments))
+    
+    def _stream_chunks(self, audio, chunk_seconds, overlap_seconds, workers, threads_per_worker):
+        """Yield each chunk's owned segments, in order, as chunks finish"""
+        self._last_error = None
+        if self.model is None:
+            self.load_model(self.model_size)
+        if self.model is None:
+            # Mock results when Whisper is unavailable
+            yield self._transcribe_audio(audio)
+            return
+        
+        chunks = plan_chunks(audio.samples, audio.sample_rate, chunk_seconds, overlap_seconds)
+        regions = [audio.region(chunk['start'], chunk['end']) for chunk in chunks]
+        results = None
+        if len(chunks) > 1:
+            try:
+                # map() hands results back in order as soon as each is ready
+                results = self._get_chunk_pool(workers, threads_per_worker).map(
+                    _transcribe_chunk, regions)
+            except Exception as e:
+                print(f"Could not start chunk workers, transcribing in-process: {e}")
+        
+        for index, (chunk, region) in enumerate(zip(chunks, regions)):
+            segments = None
+            if results is not None:
+                try:
+                    segments = next(results)
+                except Exception as e:
+                    print(f"Error in chunk worker, continuing in-process: {e}")
+                    self.shutdown_chunk_pool()
+                    results = None
+            if segments is None:
+                segments = self._transcribe_region(region)
+            
+            segments = owned_segments(chunk, segments, last_chunk=index == len(chunks) - 1)
+            if not self.word_timestamps:
+                for segment in segments:
+                    segment.pop('words', None)
+            yield segments
+    
+    def transcribe_window(self, samples, prompt=None):
+        """Transcribe a short window of live audio with word timings
+        
+        Returns segment dicts relative to the window start, or an empty list
+        when Whisper isn't available. prompt carries the end of the text
+        already committed so words cut at the window start read naturally.
+        """
+        if self.model is None:
+            self.load_model(self.model_size)
+        if self.model is None:
+            return []
+        
+        try:
+            result = self.model.transcribe(
+                np.ascontiguousarray(samples, dtype=np.float32), word_timestamps=True,
+                condition_on_previous_text=False, initial_prompt=prompt or None)
+            return self._extract_segments(result, include_words=True)
+        except Exception as e:
+            print(f"Error during live transcription: {e}")
+            return []
+    
+    def _transcribe_region(self, region):
+        """Transcribe one region in this process, with word timings for stitching"""
+        try:
+            result = self.model.transcribe(region.samples, word_timestamps=True)
+            return self._extract_segments(result, include_words=True)
+        except Exception as e:
+            print(f"Error during transcription: {e}")
+            self._last_error = e
+            return []
+    
+    def _transcribe_speech(self, audio, speech_regions, chunked, speech_audio=None):
+        """Transcribe the packed speech regions and map times back"""
+        if not speech_regions:
+            return SegmentStore.from_dicts([])
+        
+        timeline = SpeechTimeline(speech_regions)
+        # Packed here only if the caller didn't share its packed buffer
+        speech = speech_audio if speech_audio is not None else AudioBuffer.from_array(
+            timeline.extract(audio.samples, audio.sample_rate), audio.sample_rate)
+        try:
+            if chunked:
+                segments = self.transcribe_chunked(speech)
+            else:
+                segments = self.transcribe_audio(speech)
+        finally:
+            if speech is not speech_audio:
+                speech.close()
+        
+        return timeline.remap_segments(segments)
     
-    def transcribe_with_vad(self, audio_file):
-        """Transcribe with voice activity detection"""
-        # Placeholder for VAD implementation
-        return self.transcribe_audio(audio_file)
\ No newline at end of file
+    def _as_buffer(self, audio_file):
+        """Get an AudioBuffer for a path, converting it if needed"""
+        if isinstance(audio_file, AudioBuffer):
+            return audio_file
+        from audio_processor import AudioProcessor
+        processor = AudioProcessor()
+        return processor.load_buffer(processor.convert_to_wav(audio_file))
@@ -0,0 +1,166 @@
+# src/voice_activity.py - Energy-based voice activity detection
+
+import os
+import sys
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from chunking import frame_rms
+from segment_store import SegmentStore
+
+# Energy is computed this many frames at a time so long recordings never
+# need a float copy of the whole file
+ENERGY_BLOCK_FRAMES = 2000
+
+# Frames quieter than this (dBFS) are never speech, however quiet the recording
+MIN_SPEECH_DB = -60.0
+
+
+class VoiceActivityDetector:
+    """Finds speech regions from frame energy with an adaptive threshold
+
+    The threshold sits margin_db above the recording's noise floor (a low
+    percentile of frame energy), but never above the loud frames minus the
+    same margin, so recordings that are nearly all speech keep their speech.
+    Recordings without margin_db of contrast, or frames below MIN_SPEECH_DB,
+    have no speech.
+    Short gaps are bridged and short blips dropped before padding.
+    """
+
+    def __init__(self, frame_seconds=0.03, margin_db=12.0, min_speech_seconds=0.25,
+                 min_silence_seconds=0.6, padding_seconds=0.2):
+        self.frame_seconds = frame_seconds
+        self.margin_db = margin_db
+        self.min_speech_seconds = min_speech_seconds
+        self.min_silence_seconds = min_silence_seconds
+        self.padding_seconds = padding_seconds
+
+    def frame_energy_db(self, samples, sample_rate):
+        """Per-frame energy in dB, computed block by block"""
+        frame_length = max(1, int(self.frame_seconds * sample_rate))
+        block_length = frame_length * ENERGY_BLOCK_FRAMES
+        energy = [
+            frame_rms(samples[start:start + block_length], frame_length)
+            for start in range(0, len(samples), block_length)
+        ]
+        energy = np.concatenate(energy) if energy else np.zeros(0, dtype=np.float32)
+        return 20 * np.log10(energy + 1e-10), frame_length
+
+    def detect(self, samples, sample_rate):
+        """Return speech regions as a list of (start, end) times in seconds"""
+        energy_db, frame_length = self.frame_energy_db(samples, sample_rate)
+        if len(energy_db) == 0:
+            return []
+
+        quietest, noise_floor, loud = np.percentile(energy_db, [1, 10, 95])
+        noise_floor = max(noise_floor, -70.0)
+        if loud - max(quietest, -70.0) < self.margin_db:
+            # Flat energy (digital silence, steady noise): nothing stands out as speech
+            return []
+        threshold = max(min(noise_floor + self.margin_db, loud - self.margin_db), MIN_SPEECH_DB)
+        is_speech = energy_db > threshold
+
+        # Run boundaries of the speech mask, in frames
+        edges = np.diff(np.concatenate([[0], is_speech.astype(np.int8), [0]]))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        frame_seconds = frame_length / sample_rate
+        duration = len(samples) / sample_rate
+        regions = []
+        for start, end in zip(starts * frame_seconds, ends * frame_seconds):
+            if regions and start - regions[-1][1] < self.min_silence_seconds:
+                regions[-1][1] = end
+            else:
+                regions.append([start, end])
+
+        padded = []
+        for start, end in regions:
+            if end - start < self.min_speech_seconds:
+                continue
+            start = max(0.0, start - self.padding_seconds)
+            end = min(duration, end + self.padding_seconds)
+            if padded and start <= padded[-1][1]:
+                padded[-1][1] = max(padded[-1][1], end)
+            else:
+                padded.append([start, end])
+
+        return [(float(start), float(end)) for start, end in padded]
+
+    def detect_buffer(self, audio):
+        """Speech regions of an AudioBuffer"""
+        return self.detect(audio.samples, audio.sample_rate)
+
+    @staticmethod
+    def stats(regions, duration):
+        """How much of the recording the regions skip"""
+        speech = sum(end - start for start, end in regions)
+        return {
+            'duration': duration,
+            'speech_seconds': speech,
+            'skipped_seconds': max(0.0, duration - speech),
+            'skipped_fraction': (1.0 - speech / duration) if duration > 0 else 0.0,
+            'regions': len(regions),
+        }
+
+
+class SpeechTimeline:
+    """Maps times in speech-only audio back onto the original recording
+
+    Speech regions are concatenated back to back; a time in that compacted
+    audio falls in exactly one region and shifts by that region's offset.
+    """
+
+    def __init__(self, regions):
+        self.regions = list(regions)
+        self.original_starts = np.array([start for start, _ in self.regions], dtype=np.float64)
+        lengths = np.array([end - start for start, end in self.regions], dtype=np.float64)
+        self.compact_starts = np.concatenate([[0.0], np.cumsum(lengths)[:-1]]) if len(lengths) else lengths
+        self.compact_duration = float(lengths.sum()) if len(lengths) else 0.0
+
+    def to_original(self, times, is_end=False):
+        """Map compacted times (scalar or array) to original times
+
+        End times that land exactly on a join map to the end of the earlier
+        region rather than the start of the next one.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if len(self.regions) == 0:
+            return times
+        side = 'left' if is_end else 'right'
+        index = np.clip(np.searchsorted(self.compact_starts, times, side=side) - 1, 0, None)
+        mapped = self.original_starts[index] + (times - self.compact_starts[index])
+        return float(mapped) if mapped.ndim == 0 else mapped
+
+    def extract(self, samples, sample_rate):
+        """Concatenate the speech regions of samples into one array"""
+        pieces = [samples[int(start * sample_rate):int(end * sample_rate)]
+                  for start, end in self.regions]
+        if not pieces:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(pieces).astype(np.float32, copy=False)
+
+    def remap_segments(self, segments):
+        """Copy segments with start/end moved onto the original timeline"""
+        if isinstance(segments, SegmentStore):
+            words = segments.words
+            return segments.with_times(
+                self.to_original(segments.starts), self.to_original(segments.ends, is_end=True),
+                None if words is None else self.to_original(words.starts),
+                None if words is None else self.to_original(words.ends, is_end=True))
+
+        remapped = []
+        for segment in segments:
+            segment = dict(segment)
+            segment['start'] = self.to_original(segment['start'])
+            segment['end'] = self.to_original(segment['end'], is_end=True)
+            if 'words' in segment:
+                segment['words'] = [
+                    {**word, 'start': self.to_original(word['start']),
+                     'end': self.to_original(word['end'], is_end=True)}
+                    for word in segment['words']
+                ]
+            remapped.append(segment)
+        return remapped
@@ -0,0 +1,242 @@
+# src/voiceprint_index.py - On-disk index of named speakers' voice embeddings
+
+import hashlib
+import os
+import re
+import sys
+import threading
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Add src to path for imports
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model_utils import get_cache_dir
+
+# Cosine similarity a cluster needs to be given an enrolled person's name
+DEFAULT_MATCH_THRESHOLD = 0.6
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-8)
+
+
+def _embedding_digest(embedding):
+    return hashlib.sha1(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).hexdigest()[:16]
+
+
+class VoiceprintIndex:
+    """Averaged speaker embedding per named person, searched by cosine similarity
+
+    Each person's voiceprint is the running mean of the unit-norm speaker
+    embeddings confirmed under their name, so enrolling another recording
+    updates one row in place. Each enrolled embedding is remembered by
+    digest, so confirming the same speaker again is a no-op and renaming
+    them moves their embedding to the new name. Lookups are a flat float32 matrix product
+    against all voiceprints - a few thousand people take well under a
+    millisecond per query. The index is one .npz file, rewritten atomically
+    after each confirmation.
+    """
+
+    def __init__(self, path=None, threshold=None):
+        self.path = path or os.path.join(get_cache_dir("voiceprints"), "voiceprints.npz")
+        if threshold is None:
+            threshold = float(os.environ.get("AUDIO_NOTES_VOICEPRINT_THRESHOLD",
+                                             DEFAULT_MATCH_THRESHOLD))
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._names = []
+        self._rows = {}
+        # Rows past len(self._names) are spare capacity for new people
+        self._sums = np.zeros((0, 0), dtype=np.float32)
+        self._counts = np.zeros(0, dtype=np.float32)
+        self._voiceprints = np.zeros((0, 0), dtype=np.float32)
+        # Embedding digest -> name it is enrolled under
+        self._enrolled = {}
+        self._load()
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                names = [str(name) for name in data['names']]
+                sums = data['sums'].astype(np.float32)
+                counts = data['counts'].astype(np.float32)
+                enrolled = {}
+                if 'enrolled_digests' in data.files:
+                    enrolled = dict(zip((str(digest) for digest in data['enrolled_digests']),
+                                        (str(name) for name in data['enrolled_names'])))
+        except Exception as e:
+            print(f"⚠ Warning: Could not read voiceprint index {self.path}: {e}")
+            return
+        self._names = names
+        self._rows = {name: row for row, name in enumerate(names)}
+        self._sums = sums
+        self._counts = counts
+        self._voiceprints = _unit(sums) if len(names) else sums
+        self._enrolled = enrolled
+
+    def save(self):
+        """Write the index to disk, replacing the previous file in one step"""
+        with self._lock:
+            n = len(self._names)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(temp_path, names=np.array(self._names, dtype=str),
+                     sums=self._sums[:n], counts=self._counts[:n],
+                     enrolled_digests=np.array(list(self._enrolled), dtype=str),
+                     enrolled_names=np.array(list(self._enrolled.values()), dtype=str))
+            os.replace(temp_path, self.path)
+
+    def enroll(self, name, embedding, save=True):
+        """Add one embedding to a person's voiceprint, creating it if needed
+
+        An embedding already enrolled under another name is moved from that
+        person's voiceprint to this one; one already under this name is
+        left alone. Returns whether the index changed.
+        """
+        embedding = _unit(np.ravel(embedding))
+        digest = _embedding_digest(embedding)
+        with self._lock:
+            if self._sums.shape[1] not in (0, len(embedding)):
+                raise ValueError(f"Embedding has {len(embedding)} dimensions, "
+                                 f"the index holds {self._sums.shape[1]}")
+            previous = self._enrolled.get(digest)
+            if previous == name:
+                return False
+            if previous is not None:
+                self._withdraw(previous, embedding)
+            row = self._rows.get(name)
+            if row is None:
+                row = self._add_row(name, len(embedding))
+            self._sums[row] += embedding
+            self._counts[row] += 1
+            self._voiceprints[row] = _unit(self._sums[row])
+            self._enrolled[digest] = name
+        if save:
+            self.save()
+        return True
+
+    def _withdraw(self, name, embedding):
+        """Take one unit embedding back out of a person's voiceprint"""
+        row = self._rows.get(name)
+        if row is None:
+            return
+        self._sums[row] -= embedding
+        self._counts[row] -= 1
+        if self._counts[row] < 0.5:
+            self._drop_row(row)
+        else:
+            self._voiceprints[row] = _unit(self._sums[row])
+
+    def _add_row(self, name, dim):
+        """Row for a new person, growing the arrays geometrically"""
+        row = len(self._names)
+        if row >= len(self._sums):
+            capacity = max(16, 2 * len(self._sums))
+            sums = np.zeros((capacity, dim), dtype=np.float32)
+            voiceprints = np.zeros((capacity, dim), dtype=np.float32)
+            counts = np.zeros(capacity, dtype=np.float32)
+            if row:
+                sums[:row] = self._sums[:row]
+                voiceprints[:row] = self._voiceprints[:row]
+                counts[:row] = self._counts[:row]
+            self._sums, self._voiceprints, self._counts = sums, voiceprints, counts
+        self._names.append(name)
+        self._rows[name] = row
+        return row
+
+    def forget(self, name):
+        """Remove a person from the index"""
+        with self._lock:
+            row = self._rows.get(name)
+            if row is None:
+                return False
+            self._drop_row(row)
+        self.save()
+        return True
+
+    def _drop_row(self, row):
+        n = len(self._names)
+        keep = np.arange(n) != row
+        name = self._names.pop(row)
+        self._rows = {person: index for index, person in enumerate(self._names)}
+        self._sums = self._sums[:n][keep]
+        self._counts = self._counts[:n][keep]
+        self._voiceprints = self._voiceprints[:n][keep]
+        self._enrolled = {digest: person for digest, person in self._enrolled.items() if person != name}
+
+    def search(self, embeddings, k=1):
+        """(names, similarities) of the k closest voiceprints to each embedding"""
+        queries = _unit(np.atleast_2d(embeddings))
+        with self._lock:
+            n = len(self._names)
+            if n == 0:
+                return [[] for _ in queries], np.zeros((len(queries), 0), dtype=np.float32)
+            similarity = queries @ self._voiceprints[:n].T
+            names = list(self._names)
+        if k < n:
+            nearest = np.argpartition(similarity, -k, axis=1)[:, -k:]
+        else:
+            nearest = np.tile(np.arange(n), (len(queries), 1))
+        scores = np.take_along_axis(similarity, nearest, axis=1)
+        order = np.argsort(-scores, axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        return [[names[index] for index in row] for row in nearest], scores
+
+    def identify(self, centroids, threshold=None):
+        """{speaker label: (name, similarity)} for diarized speakers with a known voice
+
+        centroids maps speaker labels to their mean embeddings. Labels and
+        enrolled people are matched one-to-one (two speakers in a recording
+        are never given the same name), keeping pairs above threshold.
+        """
+        if threshold is None:
+            threshold = self.threshold
+        labels = list(centroids)
+        with self._lock:
+            n = len(self._names)
+            if not labels or n == 0:
+                return {}
+            similarity = _unit(np.stack([np.ravel(centroids[label]) for label in labels])) \
+                @ self._voiceprints[:n].T
+            names = list(self._names)
+
+        # Only people close to some speaker take part in the assignment
+        candidates = np.flatnonzero((similarity >= threshold).any(axis=0))
+        if len(candidates) == 0:
+            return {}
+        # Pairs below threshold count for nothing, so they can't outweigh real matches
+        scores = np.where(similarity[:, candidates] >= threshold, similarity[:, candidates], -1.0)
+        rows, columns = linear_sum_assignment(scores, maximize=True)
+        matches = {}
+        for row, column in zip(rows, columns):
+            score = float(similarity[row, candidates[column]])
+            if score >= threshold:
+                matches[labels[row]] = (names[candidates[column]], score)
+        return matches
+
+
+_voiceprint_indexes = {}
+_voiceprint_indexes_lock = threading.Lock()
+
+
+def get_voiceprint_index(model_id):
+    """Return the process-wide VoiceprintIndex for one embedding model's vectors"""
+    with _voiceprint_indexes_lock:
+        if model_id not in _voiceprint_indexes:
+            file_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id) + ".npz"
+            _voiceprint_indexes[model_id] = VoiceprintIndex(
+                os.path.join(get_cache_dir("voiceprints"), file_name))
+        return _voiceprint_indexes[model_id]
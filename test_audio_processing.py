@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Test script to verify audio decoding and normalization to 16 kHz mono WAV.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def _write_tone(path, sample_rate, seconds, channels=2):
+    """Write a 440 Hz test tone and return it"""
+    import numpy as np
+    import soundfile as sf
+    
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+    sf.write(path, np.stack([tone] * channels, axis=1).astype('float32'), sample_rate)
+
+def test_convert_to_wav():
+    """Test that conversion produces a cached, time-aligned 16 kHz mono WAV"""
+    
+    print("Testing audio conversion...")
+    
+    import numpy as np
+    import soundfile as sf
+    
+    work_dir = tempfile.mkdtemp()
+    os.environ['AUDIO_NOTES_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    
+    from audio_processor import AudioProcessor
+    ap = AudioProcessor()
+    
+    input_file = os.path.join(work_dir, 'tone.flac')
+    _write_tone(input_file, 44100, 10)
+    
+    output_file = ap.convert_to_wav(input_file)
+    info = sf.info(output_file)
+    assert info.samplerate == 16000 and info.channels == 1, \
+        f"Unexpected output format: {info.samplerate} Hz, {info.channels} channels"
+    assert abs(info.frames - 160000) <= 100, f"Unexpected output length: {info.frames} frames"
+    print("✓ Output is 16 kHz mono with the right duration")
+    
+    samples, _ = sf.read(output_file, dtype='float32')
+    expected = 0.5 * np.sin(2 * np.pi * 440 * np.arange(len(samples)) / 16000)
+    error = np.abs(samples[200:-200] - expected[200:-200]).max()
+    assert error <= 0.05, f"Resampled audio drifted from the input (max error {error:.3f})"
+    print("✓ Resampled audio stays time-aligned with the input")
+    
+    assert ap.convert_to_wav(input_file) == output_file, "Second conversion did not reuse the cached WAV"
+    print("✓ Converted WAV is cached")
+    
+    other_file = os.path.join(work_dir, 'other.flac')
+    _write_tone(other_file, 44100, 10)
+    os.utime(output_file, (0, 0))
+    os.environ['AUDIO_NOTES_WAV_CACHE_MB'] = str(1.5 * os.path.getsize(output_file) / 2**20)
+    try:
+        other_output = ap.convert_to_wav(other_file)
+        assert os.path.exists(other_output) and not os.path.exists(output_file), \
+            "The least recently used WAV was not evicted"
+        assert ap.convert_to_wav(other_file) == other_output and os.path.exists(other_output), \
+            "A reused WAV was evicted"
+    finally:
+        os.environ.pop('AUDIO_NOTES_WAV_CACHE_MB', None)
+    print("✓ The WAV cache is trimmed least-recently-used first")
+    
+    print("\nAudio conversion tests passed!")
+
+def test_ffmpeg_chatty_stderr():
+    """Test that ffmpeg writing a lot to stderr can't stall the conversion"""
+    
+    print("\nTesting ffmpeg with verbose stderr...")
+    
+    import pytest
+    import threading
+    import numpy as np
+    import soundfile as sf
+    if os.name != 'posix':
+        pytest.skip("uses a shell script as a stand-in ffmpeg")
+    
+    work_dir = tempfile.mkdtemp()
+    fake_ffmpeg = os.path.join(work_dir, 'ffmpeg')
+    with open(fake_ffmpeg, 'w') as f:
+        # 1 MB of warnings before any audio, more than a pipe buffer holds
+        f.write(f"#!{sys.executable}\n"
+                "import sys\n"
+                "sys.stderr.write('warning: odd frame\\n' * 50000)\n"
+                "sys.stdout.buffer.write(b'\\0' * 4 * 16000)\n")
+    os.chmod(fake_ffmpeg, 0o755)
+    
+    from audio_processor import AudioProcessor
+    output_file = os.path.join(work_dir, 'out.wav')
+    original_path = os.environ['PATH']
+    os.environ['PATH'] = work_dir + os.pathsep + original_path
+    try:
+        worker = threading.Thread(target=AudioProcessor()._convert_with_ffmpeg,
+                                  args=(os.path.join(work_dir, 'in.mp3'), output_file), daemon=True)
+        worker.start()
+        worker.join(10.0)
+    finally:
+        os.environ['PATH'] = original_path
+    assert not worker.is_alive(), "Conversion stalled on ffmpeg's stderr"
+    assert sf.info(output_file).frames == 16000, "Converted audio was lost"
+    print("✓ Conversion finishes however much ffmpeg writes to stderr")
+
+def _buffer_sum(buffer):
+    """Helper run in a worker process"""
+    return float(buffer.samples.sum()), buffer.start_frame
+
+def test_audio_buffer():
+    """Test zero-copy slicing and sharing buffers with pool workers"""
+    
+    print("\nTesting shared audio buffers...")
+    
+    import gc
+    import pickle
+    import numpy as np
+    from concurrent.futures import ProcessPoolExecutor
+    
+    work_dir = tempfile.mkdtemp()
+    os.environ['AUDIO_NOTES_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    
+    from audio_processor import AudioProcessor
+    from audio_buffer import AudioBuffer
+    ap = AudioProcessor()
+    
+    input_file = os.path.join(work_dir, 'tone.wav')
+    _write_tone(input_file, 16000, 5, channels=1)
+    buffer = ap.load_buffer(ap.convert_to_wav(input_file))
+    
+    assert isinstance(buffer, AudioBuffer) and abs(buffer.duration - 5.0) <= 0.01, \
+        f"Unexpected buffer: {buffer}"
+    assert np.shares_memory(buffer.slice(1.0, 2.0), buffer.samples), "Slicing copied the samples"
+    print("✓ Normalized WAV is memory-mapped and sliced without copying")
+    
+    region = pickle.loads(pickle.dumps(buffer.region(1.0, 2.0)))
+    assert region.start_frame == 16000 and np.array_equal(region.samples, buffer.slice(1.0, 2.0)), \
+        "Pickled region does not match the original samples"
+    print("✓ Regions pickle as offsets into the mapped file")
+    
+    shared = AudioBuffer.from_array(np.arange(32000, dtype=np.float32), 16000)
+    try:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(_buffer_sum, [shared, shared.region(1.0)]))
+    finally:
+        shared.close()
+    expected = [(float(np.arange(32000).sum()), 0), (float(np.arange(16000, 32000).sum()), 16000)]
+    assert results == expected, f"Workers saw different samples: {results}"
+    print("✓ Shared-memory buffers are readable from pool workers")
+    
+    shared = AudioBuffer.from_array(np.arange(32000, dtype=np.float32), 16000)
+    region = shared.region(1.0)
+    region.close()
+    assert float(shared.samples.sum()) == float(np.arange(32000).sum()), "Closing a region unmapped its parent"
+    region = shared.region(0.5).region(0.5)
+    del shared
+    gc.collect()
+    assert float(region.samples.sum()) == float(np.arange(16000, 32000).sum()), \
+        "A region outlived the memory it views"
+    region.close()
+    print("✓ Regions keep their parent's memory alive and closing them leaves it mapped")
+    
+    print("\nAudio buffer tests passed!")
+
+def test_audio_info():
+    """Test header-only probing and the metadata cache"""
+    
+    print("\nTesting audio info...")
+    
+    work_dir = tempfile.mkdtemp()
+    os.environ['AUDIO_NOTES_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    
+    from audio_processor import AudioProcessor
+    ap = AudioProcessor()
+    
+    input_file = os.path.join(work_dir, 'tone.flac')
+    _write_tone(input_file, 22050, 3)
+    
+    info = ap.get_audio_info(input_file)
+    assert info == {'duration': 3.0, 'sample_rate': 22050, 'channels': 2}, \
+        f"Unexpected audio info: {info}"
+    print("✓ Audio info read from the file header:", info)
+    
+    # A changed file must not be served from the cache
+    _write_tone(input_file, 16000, 2, channels=1)
+    info = ap.get_audio_info(input_file)
+    assert info == {'duration': 2.0, 'sample_rate': 16000, 'channels': 1}, \
+        f"Stale audio info after the file changed: {info}"
+    print("✓ Cache entries are invalidated when the file changes")
+    
+    print("\nAudio info tests passed!")
+
+def test_speech_buffer():
+    """Test that speech regions are packed once into a mapped, reusable buffer"""
+    
+    print("\nTesting packed speech buffers...")
+    
+    import numpy as np
+    
+    work_dir = tempfile.mkdtemp()
+    os.environ['AUDIO_NOTES_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    
+    from audio_processor import AudioProcessor
+    from audio_buffer import AudioBuffer
+    from voice_activity import SpeechTimeline
+    ap = AudioProcessor()
+    
+    input_file = os.path.join(work_dir, 'tone.wav')
+    _write_tone(input_file, 16000, 5, channels=1)
+    buffer = ap.load_buffer(ap.convert_to_wav(input_file))
+    regions = [(0.5, 1.25), (2.0, 4.1)]
+    
+    speech = ap.load_speech_buffer(buffer, regions)
+    expected = SpeechTimeline(regions).extract(buffer.samples, buffer.sample_rate)
+    assert isinstance(speech._samples, np.memmap), "Speech was not memory-mapped from disk"
+    assert np.array_equal(speech.samples, expected), "Packed speech differs from the speech regions"
+    print("✓ Speech regions are packed into one memory-mapped buffer")
+    
+    again = ap.load_speech_buffer(buffer, regions)
+    assert repr(again) == repr(speech), "Speech was packed again for the same regions"
+    assert ap.load_speech_buffer(buffer, []) is None
+    in_memory = ap.load_speech_buffer(AudioBuffer(buffer.samples.copy(), 16000), regions)
+    try:
+        assert np.array_equal(in_memory.samples, expected)
+    finally:
+        in_memory.close()
+    print("✓ Packed speech is reused, and buffers without a file are packed in shared memory")
+
+if __name__ == "__main__":
+    test_convert_to_wav()
+    test_ffmpeg_chatty_stderr()
+    test_audio_buffer()
+    test_audio_info()
+    test_speech_buffer()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script to verify headless batch processing with stand-in models.
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def _write_tone(path, seconds):
+    import numpy as np
+    import soundfile as sf
+    t = np.arange(int(16000 * seconds)) / 16000
+    sf.write(path, (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), 16000)
+
+class StubComponents:
+    """Stands in for the audio processor, managers and note generator of a worker"""
+
+    last_turns = [{'start': 0.0, 'end': 0.5, 'speaker': "1"}]
+    last_centroids = {}
+
+    def __init__(self):
+        self.diarized = []
+
+    def prepare_file(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def convert_to_wav(self, path):
+        return path
+
+    def load_buffer(self, path):
+        return path
+
+    def process_audio(self, audio, speech_regions=None, speech_audio=None, **hints):
+        self.diarized.append((os.path.basename(audio), hints))
+        return {"1": ""}
+
+    def resolve_speaker_names(self, speaker_names, speaker_embeddings):
+        return dict(speaker_names or {})
+
+    def transcribe_audio(self, audio):
+        return [{'start': 0.0, 'end': 0.5, 'text': f"Hello from {os.path.basename(audio)}"}]
+
+    def classify_content(self, transcription):
+        return "meeting"
+
+    def generate_notes(self, transcript, content_type, speaker_names=None):
+        return {"summary": f"{transcript[0]['speaker']} said hello.",
+                "key_points": [], "action_items": [], "speaker_notes": {}}
+
+    def generate_note_set(self, transcript, content_type):
+        return {'notes': self.generate_notes(transcript, content_type),
+                'outline': f"1. {transcript[0]['speaker']} greets", 'summary': "A greeting."}
+
+    def render_notes(self, notes, output_format):
+        return notes["summary"]
+
+def test_batch_run():
+    """Test a batch over a directory and a manifest, with the run summary and skips"""
+
+    print("Testing batch processing...")
+
+    import batch_processor
+    from concurrent.futures import ThreadPoolExecutor
+    from pipeline import build_notes_pipeline
+
+    stub = StubComponents()
+
+    def init_stub_worker(threads_per_worker, note_set=False):
+        batch_processor._worker_components['transcription_manager'] = stub
+        batch_processor._worker_components['pipeline'] = build_notes_pipeline(
+            stub, stub, stub, stub, stub, stub, chunked_transcription=False,
+            thread_budget=threads_per_worker, note_set=note_set)
+
+    temp_dir = tempfile.mkdtemp()
+    inputs = os.path.join(temp_dir, "inputs")
+    os.makedirs(os.path.join(inputs, "day2"))
+    _write_tone(os.path.join(inputs, "standup.wav"), 0.5)
+    _write_tone(os.path.join(inputs, "day2", "standup.wav"), 1.0)
+
+    patched = {'ProcessPoolExecutor': ThreadPoolExecutor, '_init_worker': init_stub_worker}
+    originals = {name: getattr(batch_processor, name) for name in patched}
+    os.environ["AUDIO_NOTES_CACHE_DIR"] = os.path.join(temp_dir, "cache")
+    try:
+        for name, value in patched.items():
+            setattr(batch_processor, name, value)
+
+        output_dir = os.path.join(temp_dir, "out")
+        processor = batch_processor.BatchProcessor(output_dir, workers=1, speaker_names={"1": "Ana"})
+        summary = processor.run(inputs)
+        with open(os.path.join(output_dir, "run_summary.json"), encoding='utf-8') as f:
+            saved = json.load(f)
+        assert saved['total'] == saved['succeeded'] == 2 and saved['failed'] == 0, \
+            f"Unexpected run summary: {saved}"
+        outputs = {os.path.relpath(r['input'], inputs): os.path.basename(r['output']) for r in saved['files']}
+        assert outputs == {os.path.join("day2", "standup.wav"): "standup.json", "standup.wav": "standup_2.json"}, \
+            f"Recordings with the same name did not get their own outputs: {outputs}"
+        assert saved['files'] == summary['files'], "The written summary differs from the returned one"
+        with open(os.path.join(output_dir, "standup.json"), encoding='utf-8') as f:
+            output = json.load(f)
+        assert output['rendered_notes'] == "Ana said hello." and 'outline' not in output, \
+            f"Unexpected output: {output}"
+        print("✓ A directory of recordings is processed into per-file outputs and a run summary")
+
+        summary = processor.run(inputs)
+        assert summary['skipped'] == 0 and summary['succeeded'] == 2, "Outputs were skipped without --skip-existing"
+        processor.skip_existing = True
+        summary = processor.run(inputs)
+        assert summary['skipped'] == 2 and summary['total'] == 2, f"Existing outputs were not skipped: {summary}"
+        print("✓ Existing outputs are skipped only when asked")
+
+        manifest = os.path.join(inputs, "manifest.json")
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump([{'path': "day2/standup.wav", 'speaker_names': ["Ben"], 'max_speakers': 3},
+                       "missing.wav"], f)
+        stub.diarized.clear()
+        output_dir = os.path.join(temp_dir, "manifest_out")
+        summary = batch_processor.BatchProcessor(output_dir, workers=1, note_set=True).run(manifest)
+        assert summary['succeeded'] == 1 and summary['failed'] == 1, f"Unexpected run summary: {summary}"
+        failed = next(r for r in summary['files'] if r['status'] == 'failed')
+        assert failed['input'] == os.path.join(inputs, "missing.wav") and "FileNotFoundError" in failed['error'], \
+            f"The failure was not recorded: {failed}"
+        assert stub.diarized == [("standup.wav", {'max_speakers': 3})], \
+            f"Manifest speaker hints did not reach diarization: {stub.diarized}"
+        with open(os.path.join(output_dir, "standup.json"), encoding='utf-8') as f:
+            output = json.load(f)
+        assert output['speaker_names'] == {"1": "Ben"} and output['outline'] == "1. Ben greets", \
+            f"Manifest names or the note set were not applied: {output}"
+        print("✓ Manifest paths, names and hints are applied, and failures are reported per file")
+
+    finally:
+        for name, value in originals.items():
+            setattr(batch_processor, name, value)
+        os.environ.pop("AUDIO_NOTES_CACHE_DIR", None)
+
+    print("\nBatch processing tests passed!")
+
+if __name__ == "__main__":
+    test_batch_run()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script to verify keyword scoring in the content classifier.
+"""
+
+import sys
+import os
+import re
+import time
+import random
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_keyword_scores():
+    """Test per-type scores and term counts against one scan per keyword"""
+
+    print("Testing content classifier scoring...")
+
+    from content_classifier import ContentClassifier
+
+    cc = ContentClassifier()
+    scores = cc.score([{'text': "Welcome to the podcast."}, {'text': "Tonight's talk show"},
+                       {'text': "notes are online; any Question?"}, {'text': "Discussion time"}])
+    assert scores.scores == {'meeting': 0, 'lecture': 1, 'interview': 1, 'podcast': 4, 'speech': 0}, \
+        f"Unexpected scores: {scores.scores}"
+    assert scores.term_counts['podcast'] == {'podcast': 1, 'talk show': 1, 'show notes': 1, 'discussion': 1}, \
+        f"Unexpected term counts: {scores.term_counts['podcast']}"
+    assert scores.content_type() == "podcast" and cc.score([]).content_type() == "general", \
+        "Wrong content type from scores"
+    print("✓ Overlapping and shared keywords are counted for every type that lists them")
+
+    # A long meeting: 50k segments of keyword-heavy speech
+    rng = random.Random(0)
+    words = ("the agenda for this Meeting is the next chapter, we discuss show notes "
+             "talk show main points of the lecture question answer action item").split()
+    segments = [{'text': " ".join(rng.choice(words) for _ in range(rng.randint(1, 12)))}
+                for _ in range(50000)]
+    full_text = " ".join(segment['text'] for segment in segments)
+    expected = {content_type: sum(len(re.findall(r'\b' + keyword + r'\b', full_text, re.IGNORECASE))
+                                  for keyword in keywords)
+                for content_type, keywords in cc.patterns.items()}
+
+    start = time.time()
+    scores = cc.score(segments)
+    elapsed = time.time() - start
+    assert scores.scores == expected, \
+        f"Scores differ from one scan per keyword: {scores.scores} != {expected}"
+    assert elapsed <= 1.0, f"Scoring 50k segments took {elapsed:.2f}s"
+    print(f"✓ 50k segments scored in one pass in {elapsed * 1000:.0f}ms")
+
+    streamed = cc.start_scoring()
+    for segment in segments:
+        streamed.update(segment)
+    generated = cc.score(segment for segment in segments)
+    assert (streamed.scores == expected and streamed.term_counts == scores.term_counts
+            and generated.as_dict() == scores.as_dict()), "Streamed segments were scored differently"
+    print("✓ Segments scored one at a time, including keywords split between them")
+
+    from segment_store import SegmentStore
+    store = SegmentStore.from_dicts([dict(segment, start=float(i), end=i + 1.0)
+                                     for i, segment in enumerate(segments)])
+    content_types = {cc.classify_content(segments), cc.classify_content(store),
+                     cc.classify_content(segment for segment in segments)}
+    assert content_types == {scores.content_type()}, f"Transcript forms classified differently: {content_types}"
+    print("✓ Lists, segment stores and streams are classified alike")
+
+    print("\nContent classifier tests passed!")
+
+if __name__ == "__main__":
+    test_keyword_scores()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared model registry loads, shares and evicts models.
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_model_registry():
+    """Test sharing, reference counting and LRU eviction"""
+    
+    print("Testing model registry...")
+    
+    from model_utils import ModelRegistry
+    
+    class FakeTensor:
+        def __init__(self, megabytes):
+            self.megabytes = megabytes
+        def numel(self):
+            return self.megabytes * 2**20
+        def element_size(self):
+            return 1
+    
+    class FakeModel:
+        # Looks like a torch module to the resident size estimate
+        def __init__(self, megabytes):
+            self.weights = FakeTensor(megabytes)
+        def parameters(self):
+            return [self.weights]
+        def buffers(self):
+            return []
+    
+    registry = ModelRegistry(ram_budget_mb=10)
+    load_calls = []
+    
+    def slow_loader():
+        load_calls.append(1)
+        time.sleep(0.1)
+        return FakeModel(4)
+    
+    # Concurrent acquires of the same key must load only once
+    handles = []
+    threads = [
+        threading.Thread(target=lambda: handles.append(registry.acquire("a", slow_loader, size="base")))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(load_calls) == 1 and len({id(h.model) for h in handles}) == 1, "Model was loaded more than once"
+    print("✓ Concurrent acquires share one model")
+    
+    report = registry.report()[0]
+    assert report['refs'] == 4 and report['resident_mb'] >= 1, f"Unexpected registry report: {report}"
+    print("✓ Registry reports references and resident size")
+    
+    for handle in handles:
+        handle.release()
+    
+    # Loading two more models goes over budget and evicts the idle one
+    b = registry.acquire("b", lambda: FakeModel(4))
+    c = registry.acquire("c", lambda: FakeModel(4))
+    assert not registry.is_loaded("a", size="base") and registry.is_loaded("b"), \
+        "Least recently used idle model was not evicted"
+    print("✓ Idle models are evicted LRU under the RAM budget")
+    b.release()
+    c.release()
+    
+    print("\nModel registry tests passed!")
+
+def test_local_model_store():
+    """Test that models resolve from models/ first and only hit the network when allowed"""
+    
+    print("\nTesting local model store...")
+    
+    import tempfile
+    import pytest
+    from model_utils import get_model_path, load_pretrained
+    
+    try:
+        models_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(models_dir, "Qwen", "Qwen2.5-1.5B-Instruct"))
+        os.makedirs(os.path.join(models_dir, "whisper"))
+        open(os.path.join(models_dir, "whisper", "base.pt"), "wb").close()
+        os.environ["AUDIO_NOTES_MODELS_DIR"] = models_dir
+        
+        assert get_model_path("Qwen/Qwen2.5-1.5B-Instruct") == \
+            os.path.join(models_dir, "Qwen/Qwen2.5-1.5B-Instruct"), "A model directory under models/ was not found"
+        assert get_model_path(os.path.join("whisper", "base.pt")) is None, \
+            "An empty placeholder file was treated as a model"
+        print("✓ Models resolve from the models directory, ignoring empty placeholders")
+        
+        calls = []
+        def loader(source, local_files_only=False, **kwargs):
+            calls.append((source, local_files_only))
+            if local_files_only and not source.startswith(models_dir) and source != "cached/model":
+                raise OSError("not in the local cache")
+            return source
+        
+        load_pretrained(loader, "Qwen/Qwen2.5-1.5B-Instruct")
+        load_pretrained(loader, "cached/model")
+        load_pretrained(loader, "remote/model")
+        assert calls == [(os.path.join(models_dir, "Qwen/Qwen2.5-1.5B-Instruct"), True),
+                         ("cached/model", True), ("remote/model", True), ("remote/model", False)], \
+            f"Unexpected load order: {calls}"
+        print("✓ Local copies and the hub cache are tried before the network")
+        
+        os.environ["AUDIO_NOTES_OFFLINE"] = "1"
+        with pytest.raises(OSError):
+            load_pretrained(loader, "remote/model")
+        print("✓ Offline mode never downloads")
+        
+    finally:
+        os.environ.pop("AUDIO_NOTES_MODELS_DIR", None)
+        os.environ.pop("AUDIO_NOTES_OFFLINE", None)
+    
+    print("\nLocal model store tests passed!")
+
+def test_float32_checkpoint():
+    """Test that a half-precision checkpoint is converted once and loaded without copies"""
+    
+    print("\nTesting float32 checkpoints...")
+    
+    import tempfile
+    import pytest
+    torch = pytest.importorskip("torch")
+    from model_utils import float32_checkpoint, load_torch_checkpoint
+    
+    temp_dir = tempfile.mkdtemp()
+    os.environ["AUDIO_NOTES_CACHE_DIR"] = temp_dir
+    try:
+        model = torch.nn.Linear(64, 64)
+        path = os.path.join(temp_dir, "base.pt")
+        state = {name: value.half() for name, value in model.state_dict().items()}
+        torch.save({"dims": {"n_state": 64}, "model_state_dict": state}, path)
+        
+        converted = float32_checkpoint(path)
+        mtime = os.path.getmtime(converted)
+        assert float32_checkpoint(path) == converted and os.path.getmtime(converted) == mtime, \
+            "The checkpoint was converted again"
+        checkpoint = load_torch_checkpoint(converted)
+        assert checkpoint["dims"] == {"n_state": 64}, "Non-tensor entries were not kept"
+        print("✓ Half-precision checkpoints are converted to float32 once")
+        
+        loaded = torch.nn.Linear(64, 64)
+        loaded.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        assert loaded.weight.dtype == torch.float32 and torch.equal(loaded.weight, state["weight"].float()), \
+            "Converted weights do not match the checkpoint"
+        assert loaded.weight.data_ptr() == checkpoint["model_state_dict"]["weight"].data_ptr(), \
+            "Mapped weights were copied into the model"
+        print("✓ Mapped float32 weights are used as the parameters")
+        
+    finally:
+        os.environ.pop("AUDIO_NOTES_CACHE_DIR", None)
+    
+    print("\nFloat32 checkpoint tests passed!")
+
+if __name__ == "__main__":
+    test_model_registry()
+    test_local_model_store()
+    test_float32_checkpoint()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Test script to verify note generation for long transcripts.
+"""
+
+import sys
+import os
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+class CharTokenizer:
+    """One token per printable ASCII character, plus an end-of-sequence token"""
+
+    name_or_path = "char-tokenizer"
+    all_special_ids = [95]
+    eos_token_id = 95
+
+    def __len__(self):
+        return 96
+
+    def batch_decode(self, sequences):
+        return ["<eos>" if ids[0] == 95 else chr(32 + ids[0]) for ids in sequences]
+
+class EchoPipeline:
+    """Stands in for the text-generation pipeline: records prompts, answers briefly"""
+
+    tokenizer = CharTokenizer()
+
+    class model:
+        class generation_config:
+            eos_token_id = 95
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompts, **kwargs):
+        self.calls.append(list(prompts))
+        if 'logits_processor' in kwargs:
+            return [[{'generated_text': '{"summary": "Lecture notes", "key_points": ["a", "b"], '
+                                        '"action_items": [], "speaker_notes": {}}'}]
+                    for _ in prompts]
+        return [[{'generated_text': f"notes {len(self.calls)}.{index}"}]
+                for index in range(len(prompts))]
+
+def test_map_reduce_notes():
+    """Test that a long transcript is split, summarized in batches and combined"""
+
+    print("Testing map-reduce notes...")
+
+    import pytest
+    pytest.importorskip("transformers")
+    pytest.importorskip("torch")
+    from note_generator import NoteGenerator
+
+    ng = NoteGenerator()
+    lines = [f"[{i * 5.0:.1f}s] Sentence number {i} of a three hour lecture." for i in range(3000)]
+    chunks = ng.split_on_tokens(lines, 500)
+    assert "\n".join(chunks) == "\n".join(lines) and max(ng.count_tokens(chunks)) <= 500, \
+        "Transcript chunks lost lines or exceeded the token budget"
+    print(f"✓ {len(lines)} lines split into {len(chunks)} chunks on line boundaries")
+
+    ng.llm_pipeline = EchoPipeline()
+    ng.map_chunk_tokens = 500
+    ng.partial_notes_tokens = 200
+    segments = [{'start': i * 5.0, 'end': i * 5.0 + 4.0,
+                 'text': f"Sentence number {i} of a three hour lecture."} for i in range(3000)]
+    notes = ng._generate_notes_map_reduce(segments, "lecture")
+
+    calls = ng.llm_pipeline.calls
+    map_prompts = [prompt for call in calls for prompt in call if "Transcript part" in prompt]
+    assert len(map_prompts) == len(chunks) and len(calls[-1]) == 1, \
+        f"Expected {len(chunks)} map prompts and one final prompt"
+    assert not any(ng.count_tokens(prompt) > 700 for call in calls for prompt in call), \
+        "A map or reduce prompt exceeded the context budget"
+    assert notes['summary'] == "Lecture notes" and notes['key_points'] == ["a", "b"], \
+        f"Combined notes were not parsed: {notes}"
+    print(f"✓ {len(chunks)} parts summarized in {len(calls) - 1} batched calls, then combined")
+
+    print("\nMap-reduce notes tests passed!")
+
+def test_llm_batcher():
+    """Test that prompts from several callers are batched by parameters and length"""
+
+    print("\nTesting LLM batcher...")
+
+    import threading
+    import pytest
+    from llm_batcher import LLMBatcher
+
+    batches = []
+
+    def generate_batch(prompts, **params):
+        batches.append((list(prompts), params))
+        return [prompt.upper() for prompt in prompts]
+
+    batcher = LLMBatcher(generate_batch, max_batch_size=4, max_wait_seconds=0.2)
+    results = {}
+
+    def caller(name, max_new_tokens):
+        prompts = [f"{name} " + "x" * (i * 7 % 11) for i in range(6)]
+        results[name] = (prompts, batcher.generate(prompts, max_new_tokens=max_new_tokens))
+
+    callers = [threading.Thread(target=caller, args=(name, tokens))
+               for name, tokens in (("a", 64), ("b", 64), ("c", 128))]
+    for thread in callers:
+        thread.start()
+    for thread in callers:
+        thread.join()
+
+    assert not any(texts != [prompt.upper() for prompt in prompts] for prompts, texts in results.values()), \
+        "Callers got texts for the wrong prompts"
+    assert not any(len(prompts) > 4 for prompts, _ in batches), "A batch was too large"
+    assert not any(prompts != sorted(prompts, key=len) for prompts, _ in batches), \
+        "Batches were not sorted by prompt length"
+    assert len(batches) <= 6, f"18 prompts took {len(batches)} generate calls"
+    print(f"✓ 18 prompts from 3 callers ran in {len(batches)} length-sorted batches")
+
+    def failing_batch(prompts, **params):
+        raise RuntimeError("out of memory")
+
+    with pytest.raises(RuntimeError):
+        LLMBatcher(failing_batch, max_wait_seconds=0.0).generate(["x"], max_new_tokens=8)
+    print("✓ Generation errors are raised in the waiting caller")
+
+    print("\nLLM batcher tests passed!")
+
+def test_json_notes():
+    """Test the streaming notes JSON parser and the decoding constraint"""
+
+    print("\nTesting JSON notes...")
+
+    from json_notes import NotesStreamParser, parse_notes
+
+    document = ('{"summary": "We planned the \\"Q3\\" launch.",\n "key_points": ["Launch in May"],'
+                ' "action_items": ["Ana: book venue", "Li: draft invite"],'
+                ' "speaker_notes": {"Ana": "Leads the launch"}}')
+    parser = NotesStreamParser()
+    fed = 0
+    for index in range(0, len(document), 3):
+        fed += 1
+        if not parser.feed(document[index:index + 3] + (" trailing" if index + 3 >= len(document) else "")):
+            break
+    assert parser.complete and parser.notes()['action_items'] == ["Ana: book venue", "Li: draft invite"], \
+        "Streamed notes JSON was not parsed"
+    assert parser.notes()['summary'] == 'We planned the "Q3" launch.', \
+        "Escaped characters were not decoded"
+    print(f"✓ Notes JSON parsed as it streamed in, ending at the closing brace ({fed} pieces)")
+
+    truncated = parse_notes('Notes: {"summary": "Budget review", "key_points": ["Costs up", "Hiring fro')
+    assert truncated == {"summary": "Budget review", "key_points": ["Costs up", "Hiring fro"],
+                         "action_items": [], "speaker_notes": {}}, f"A truncated object was not closed: {truncated}"
+    assert not NotesStreamParser().accepts('{"summary": 3') and not NotesStreamParser().accepts('{"title"'), \
+        "Text outside the notes schema was accepted"
+    print("✓ Truncated output is completed and off-schema text is rejected")
+
+    print("\nJSON notes tests passed!")
+
+def test_notes_logits_processor():
+    """Test that constrained decoding only lets the model write notes JSON"""
+
+    print("\nTesting the notes JSON logits processor...")
+
+    import pytest
+    torch = pytest.importorskip("torch")
+    from json_notes import NotesJSONLogitsProcessor, parse_notes
+
+    tokenizer = CharTokenizer()
+    processor = NotesJSONLogitsProcessor(tokenizer, tokenizer.eos_token_id)
+    # A model that wants to write x's, then to close whatever is open
+    ids = torch.tensor([[0]])
+    for step in range(400):
+        preference = torch.zeros(1, 96)
+        preference[0, ord('x') - 32] = 10.0
+        preference[0, ord('"') - 32] = 20.0 if step > 60 else 5.0
+        preference[0, ord(']') - 32] = 4.0
+        preference[0, ord('}') - 32] = 3.0
+        next_id = int(torch.argmax(processor(ids, preference)[0]))
+        ids = torch.cat([ids, torch.tensor([[next_id]])], dim=1)
+        if next_id == tokenizer.eos_token_id:
+            break
+    text = "".join(tokenizer.batch_decode([[int(i)] for i in ids[0, 1:-1]]))
+    assert next_id == tokenizer.eos_token_id and parse_notes(text)['summary'].startswith("x"), \
+        f"Constrained decoding did not produce notes JSON: {text!r}"
+    print("✓ Constrained decoding emits schema JSON and stops at the closing brace")
+
+    print("\nNotes logits processor tests passed!")
+
+def test_note_set_prefix_reuse():
+    """Test that a note set encodes the transcript once and crops its cache back after each answer"""
+
+    print("\nTesting note set prefix reuse...")
+
+    import pytest
+    pytest.importorskip("transformers")
+    torch = pytest.importorskip("torch")
+    from note_generator import NoteGenerator
+
+    class Encoding(dict):
+        @property
+        def input_ids(self):
+            return self['input_ids']
+
+    class OrdTokenizer:
+        """One token per character"""
+
+        pad_token_id = 0
+
+        def __call__(self, text, return_tensors=None, add_special_tokens=False):
+            if return_tensors == "pt":
+                return Encoding(input_ids=torch.tensor([[ord(c) for c in text]]))
+            return Encoding(input_ids=[[ord(c) for c in t] for t in text])
+
+        def decode(self, ids, skip_special_tokens=False):
+            return "".join(chr(int(i)) for i in ids)
+
+    class CacheModel:
+        """Stands in for a causal LM: records prefills and the cache each generate() starts from"""
+
+        device = "cpu"
+
+        def __init__(self):
+            self.prefills = []
+            self.cache_lengths = []
+            self.cache = None
+
+        def __call__(self, input_ids, use_cache=True):
+            self.prefills.append(input_ids.shape[1])
+            # Legacy cache: a (key, value) pair per layer, shaped (batch, heads, tokens, dim)
+            kv = torch.zeros(1, 1, input_ids.shape[1], 2)
+            return type("Output", (), {'past_key_values': ((kv, kv.clone()),)})()
+
+        def generate(self, input_ids, past_key_values=None, max_new_tokens=1, **params):
+            cache = self.cache = past_key_values
+            self.cache_lengths.append(cache.get_seq_length())
+            # Like generate(), run the uncached tokens and the answer through the cache
+            new_tokens = input_ids.shape[1] - cache.get_seq_length() + max_new_tokens
+            kv = torch.zeros(1, 1, new_tokens, 2)
+            cache.update(kv, kv.clone(), 0)
+            answer = torch.full((1, max_new_tokens), ord("a") + len(self.cache_lengths) - 1)
+            return torch.cat([input_ids, answer], dim=1)
+
+    ng = NoteGenerator()
+    ng.tokenizer = OrdTokenizer()
+    ng.model = CacheModel()
+    prefix = "Transcript:\n[0.0s] Speaker 1: We agreed on the budget.\n\n"
+    requests = [('summary', "Summarize.\n", {'max_new_tokens': 2}),
+                ('outline', "Outline.\n", {'max_new_tokens': 3}),
+                ('notes', "Notes.\n", {'max_new_tokens': 4})]
+
+    texts = ng._generate_with_prefix(prefix, requests)
+    assert texts == {'summary': "aa", 'outline': "bbb", 'notes': "cccc"}, f"Unexpected answers: {texts}"
+    assert ng.model.prefills == [len(prefix)], f"The transcript was encoded {len(ng.model.prefills)} times"
+    assert ng.model.cache_lengths == [len(prefix)] * 3, \
+        f"Answers did not start from the transcript cache: {ng.model.cache_lengths}"
+    assert ng.model.cache.get_seq_length() == len(prefix), "The cache was not cropped back to the transcript"
+    print("✓ Three answers from one transcript encoding, with a legacy cache converted and cropped")
+
+if __name__ == "__main__":
+    test_map_reduce_notes()
+    test_llm_batcher()
+    test_json_notes()
+    test_notes_logits_processor()
+    test_note_set_prefix_reuse()
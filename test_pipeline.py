@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script to verify incremental recompute in the stage pipeline.
+"""
+
+import sys
+import os
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_pipeline():
+    """Test that only stages downstream of a changed input rerun"""
+
+    print("Testing stage pipeline...")
+
+    from pipeline import Pipeline, Stage
+
+    pipeline = Pipeline([
+        Stage("transcribe", ["file_path"], ["transcription"], lambda file_path: file_path.upper()),
+        Stage("classify", ["transcription", "override"], ["content_type"],
+              lambda transcription, override: override or "meeting"),
+        Stage("generate_notes", ["transcription", "content_type"], ["notes"],
+              lambda transcription, content_type: f"{content_type}: {transcription}"),
+        Stage("render", ["notes", "output_format"], ["rendered"],
+              lambda notes, output_format: f"[{output_format}] {notes}"),
+    ])
+
+    assert pipeline.external_inputs == ["file_path", "output_format", "override"], \
+        f"Unexpected external inputs: {pipeline.external_inputs}"
+
+    values = pipeline.run(file_path="talk", override=None, output_format="text")
+    assert values["rendered"] == "[text] meeting: TALK" and len(pipeline.last_run['ran']) == 4, \
+        "First run did not execute every stage"
+    print("✓ First run executes every stage in dependency order")
+
+    pipeline.run(file_path="talk", override=None, output_format="markdown")
+    assert pipeline.last_run['ran'] == ["render"], f"Changing the format reran {pipeline.last_run['ran']}"
+    print("✓ Changing the output format only reruns rendering")
+
+    pipeline.run(file_path="talk", override="lecture", output_format="markdown")
+    assert pipeline.last_run['ran'] == ["classify", "generate_notes", "render"], \
+        f"Changing the content type reran {pipeline.last_run['ran']}"
+    print("✓ Changing the content type skips transcription")
+
+    pipeline.run(file_path="talk", override="lecture", output_format="markdown")
+    assert not pipeline.last_run['ran'], "Unchanged inputs reran stages"
+    print("✓ Unchanged inputs reuse every result")
+
+    import time
+    from model_utils import get_thread_budget
+    budgets = {}
+    spans = {}
+
+    def heavy(name, result):
+        def run(audio):
+            budgets[name] = get_thread_budget()
+            start = time.time()
+            time.sleep(0.3)
+            spans[name] = (start, time.time())
+            return result
+        return run
+
+    def join(diarization, transcription):
+        budgets["join"] = get_thread_budget()
+        return f"{diarization}+{transcription}"
+
+    concurrent = Pipeline([
+        Stage("prepare", ["file_path"], ["audio"], lambda file_path: file_path),
+        Stage("diarize", ["audio"], ["diarization"], heavy("diarize", "speakers"), compute_heavy=True),
+        Stage("transcribe", ["audio"], ["transcription"], heavy("transcribe", "words"), compute_heavy=True),
+        Stage("join", ["diarization", "transcription"], ["notes"], join),
+    ], max_workers=2, thread_budget=64)
+    values = concurrent.run(file_path="talk")
+    overlap = min(spans["diarize"][1], spans["transcribe"][1]) - max(spans["diarize"][0], spans["transcribe"][0])
+    assert values["notes"] == "speakers+words" and overlap >= 0.2, \
+        f"Independent stages did not overlap ({overlap:.2f}s)"
+    print("✓ Independent stages run concurrently and join afterwards")
+
+    assert budgets["diarize"] == budgets["transcribe"] == 32, f"Thread budget was not split: {budgets}"
+    assert budgets["join"] == get_thread_budget() != 32, "A stage's thread budget outlived it"
+    print("✓ Concurrent heavy stages each see half of the thread budget")
+
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", ["x"], ["y"], None), Stage("b", ["y"], ["x"], None)])
+    print("✓ Cyclic stage graphs are rejected")
+
+    print("\nPipeline tests passed!")
+
+if __name__ == "__main__":
+    test_pipeline()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the live transcription building blocks.
+"""
+
+import sys
+import os
+import struct
+import tempfile
+import threading
+import time
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_ring_buffer():
+    """Test that the ring buffer keeps only the newest audio"""
+
+    print("Testing ring buffer...")
+
+    import numpy as np
+    from realtime import RingBuffer
+
+    ring = RingBuffer(1.0, sample_rate=100)
+    for start in range(0, 250, 30):
+        ring.write(np.arange(start, min(start + 30, 250), dtype=np.float32))
+    assert ring.total_frames == 250 and ring.oldest_frame == 150, \
+        "Ring buffer lost track of frame positions"
+    assert np.array_equal(ring.read(140, 250), np.arange(150, 250, dtype=np.float32)), \
+        "Ring buffer returned the wrong frames after wrapping"
+    print("✓ Oldest audio is overwritten and reads are clipped to what is held")
+
+    print("\nRing buffer tests passed!")
+
+def test_growing_wav():
+    """Test following a 44.1 kHz stereo WAV while it is being written"""
+
+    print("\nTesting growing WAV source...")
+
+    import numpy as np
+    from realtime import GrowingWavSource
+
+    path = os.path.join(tempfile.mkdtemp(), 'recording.wav')
+    rate, channels = 44100, 2
+
+    def record():
+        with open(path, 'wb') as f:
+            # Sizes are left at zero, as recorders do until they finish
+            f.write(b'RIFF' + struct.pack('<I', 0) + b'WAVE')
+            f.write(b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, rate,
+                                          rate * channels * 2, channels * 2, 16))
+            f.write(b'data' + struct.pack('<I', 0))
+            for _ in range(8):
+                block = (np.random.default_rng(0).standard_normal((rate // 4, channels)) * 3000)
+                f.write(block.astype('<i2').tobytes())
+                f.flush()
+                time.sleep(0.05)
+
+    writer = threading.Thread(target=record)
+    writer.start()
+    frames = sum(len(block) for block in GrowingWavSource(path, poll_seconds=0.02,
+                                                           idle_timeout=0.5))
+    writer.join()
+    assert abs(frames - 2 * 16000) <= 200, f"Expected about 32000 frames at 16 kHz, got {frames}"
+    print("✓ Growing stereo 44.1 kHz WAV is read as it is written, at 16 kHz mono")
+
+    print("\nGrowing WAV tests passed!")
+
+def test_live_session():
+    """Test speaker linking and a replayed session with stand-in models"""
+
+    print("\nTesting live session...")
+
+    import numpy as np
+    import soundfile as sf
+    from realtime import RealtimeTranscriber, FileReplaySource, link_speakers
+
+    known = [{'start': 0.0, 'end': 5.0, 'speaker': '1'}, {'start': 5.0, 'end': 8.0, 'speaker': '2'}]
+    window = [{'start': 4.0, 'end': 7.0, 'speaker': 'B'}, {'start': 2.0, 'end': 4.0, 'speaker': 'A'},
+              {'start': 8.0, 'end': 9.0, 'speaker': 'C'}]
+    mapping, next_label = link_speakers(window, known, 2.0, 8.0, 3)
+    assert mapping == {'A': '1', 'B': '2', 'C': '3'} and next_label == 4, \
+        f"Window speakers were linked wrongly: {mapping}"
+    print("✓ Speakers in a new window keep the labels of earlier windows")
+
+    path = os.path.join(tempfile.mkdtemp(), 'meeting.wav')
+    t = np.arange(16000 * 12) / 16000
+    sf.write(path, (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), 16000)
+
+    class WordPerSecond:
+        """Stands in for Whisper: one word at every whole second of the recording"""
+        def transcribe_window(self, samples, prompt=None):
+            window_start = session.committed_until
+            length = len(samples) / 16000
+            first = int(np.ceil(window_start))
+            return [{'start': 0.0, 'end': length, 'text': "", 'words': [
+                {'word': f" w{second}", 'start': second - window_start,
+                 'end': second - window_start + 0.3}
+                for second in range(first, int(window_start + length))
+                if second - window_start + 0.3 <= length]}]
+
+    class HalfAndHalf:
+        """Stands in for pyannote: speaker A before 6 s, B after"""
+        pipeline = object()
+        def diarize_window(self, samples, sample_rate):
+            start = session.ring.duration - len(samples) / sample_rate
+            turns = [{'start': max(0.0, 0 - start), 'end': 6.0 - start, 'speaker': 'A'},
+                     {'start': max(0.0, 6.0 - start), 'end': len(samples) / sample_rate, 'speaker': 'B'}]
+            return [turn for turn in turns if turn['end'] > turn['start']]
+
+    segments = []
+    session = RealtimeTranscriber(WordPerSecond(), HalfAndHalf(), on_segment=segments.append,
+                                  diarize_every_seconds=2.0)
+    session.run(FileReplaySource(path, speed=8.0))
+
+    words = " ".join(segment['text'] for segment in segments).split()
+    assert words == [f"w{second}" for second in range(12)], f"Live words duplicated or lost: {words}"
+    print("✓ Sliding-window commits produce every word exactly once")
+
+    speakers = {segment['speaker'] for segment in segments if segment['start'] < 5.5}
+    later = {segment['speaker'] for segment in segments if segment['start'] > 6.5}
+    assert speakers == {'1'} and later == {'2'}, \
+        f"Live speakers not attributed consistently: {speakers}, {later}"
+    print("✓ Live segments are attributed to stable speakers")
+
+    assert session.ring.capacity <= 16000 * 120 and session.stats['max_lag_seconds'] <= 3.0, \
+        "Live session exceeded its memory or latency bounds"
+    print(f"✓ Stayed within {session.stats['max_lag_seconds']:.1f}s of live with a fixed-size buffer")
+
+    print("\nLive session tests passed!")
+
+def test_final_flush_and_lag():
+    """Test that stopping commits every word and that lag is measured from capture"""
+
+    print("\nTesting end of a live session...")
+
+    import time
+    import numpy as np
+    from realtime import RealtimeTranscriber
+
+    class Overrunning:
+        """Stands in for Whisper: a word every second, the last one ending past the audio"""
+        def transcribe_window(self, samples, prompt=None):
+            window_start = session.committed_until
+            length = len(samples) / 16000
+            return [{'start': 0.0, 'end': length, 'text': "", 'words': [
+                {'word': f" w{second}", 'start': second - window_start, 'end': second - window_start + 0.8}
+                for second in range(int(np.ceil(window_start)), int(np.ceil(window_start + length)))]}]
+
+    segments = []
+    session = RealtimeTranscriber(Overrunning(), on_segment=segments.append)
+    t = np.arange(8000) / 16000
+    block = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    for _ in range(9):
+        # Each block was recorded two seconds before it reached the transcriber
+        session.feed(block, capture_time=time.time() - 2.0)
+    session.flush()
+
+    words = " ".join(segment['text'] for segment in segments).split()
+    assert words == ["w0", "w1", "w2", "w3", "w4"], f"Words were lost when the session stopped: {words}"
+    print("✓ Stopping commits every remaining word, even one ending past the audio")
+
+    lag = session.stats['max_lag_seconds']
+    assert 2.0 <= lag < 3.0, f"Lag was not measured from the capture time: {lag:.2f}s"
+    print(f"✓ Lag behind live is measured from capture ({lag:.1f}s)")
+
+    class Failing:
+        """Stands in for pyannote: every window fails"""
+        pipeline = object()
+        def diarize_window(self, samples, sample_rate):
+            raise RuntimeError("diarization failed")
+
+    segments = []
+    session = RealtimeTranscriber(Overrunning(), Failing(), on_segment=segments.append,
+                                  diarize_every_seconds=1.0)
+    for _ in range(9):
+        session.feed(block)
+    session.flush()
+    words = " ".join(segment['text'] for segment in segments).split()
+    assert words == ["w0", "w1", "w2", "w3", "w4"], f"A failed diarization lost the final words: {words}"
+    print("✓ A failed diarization does not stop the final commit")
+
+    print("\nEnd of session tests passed!")
+
+if __name__ == "__main__":
+    test_ring_buffer()
+    test_growing_wav()
+    test_live_session()
+    test_final_flush_and_lag()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent pipeline result cache.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_result_cache():
+    """Test cache hits, content addressing and LRU eviction"""
+    
+    print("Testing result cache...")
+    
+    from result_cache import ResultCache
+    
+    work_dir = tempfile.mkdtemp()
+    cache = ResultCache(os.path.join(work_dir, 'results'), max_bytes=4000)
+    
+    calls = []
+    def compute():
+        calls.append(1)
+        return [{'start': 0.0, 'end': 1.0, 'text': "hello"}]
+    
+    first = cache.cached("transcribe_audio", "abc", compute, model_id="whisper-base")
+    second = cache.cached("transcribe_audio", "abc", compute, model_id="whisper-base")
+    assert len(calls) == 1 and first == second, "Second call was not served from the cache"
+    print("✓ Repeated stage calls are served from the cache")
+    
+    cache.cached("transcribe_audio", "abc", compute, model_id="whisper-small")
+    cache.cached("transcribe_audio", "abc", compute, model_id="whisper-base", params={'x': 1})
+    assert len(calls) == 3, "Different model or parameters reused a stale result"
+    print("✓ Model id and parameters are part of the key")
+    
+    cache.cached("generate_notes", "mock", compute, should_store=lambda value: False)
+    cache.cached("generate_notes", "mock", compute, should_store=lambda value: False)
+    assert len(calls) == 5, "Vetoed results were stored"
+    print("✓ Results can be kept out of the cache")
+    
+    # Identical audio under two names hashes the same
+    for name in ('a.wav', 'b.wav'):
+        with open(os.path.join(work_dir, name), 'wb') as f:
+            f.write(b'RIFF' + bytes(1000))
+    assert cache.audio_hash(os.path.join(work_dir, 'a.wav')) == cache.audio_hash(os.path.join(work_dir, 'b.wav')), \
+        "Identical audio got different content hashes"
+    print("✓ Audio is keyed by content, not file name")
+    
+    for i in range(10):
+        cache.put(cache.make_key("stage", str(i)), "stage", bytes(1000))
+    hit_newest, _ = cache.get(cache.make_key("stage", "9"))
+    hit_oldest, _ = cache.get(cache.make_key("stage", "0"))
+    assert cache.total_bytes() <= 4000 and hit_newest and not hit_oldest, \
+        "Cache was not trimmed least recently used first"
+    print("✓ Cache stays under its size limit, evicting LRU entries")
+    
+    print("\nResult cache tests passed!")
+
+if __name__ == "__main__":
+    test_result_cache()
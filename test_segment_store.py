@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the columnar transcript segment store.
+"""
+
+import sys
+import os
+import pickle
+import tracemalloc
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def make_segments(count):
+    return [
+        {'start': i * 2.0, 'end': i * 2.0 + 1.5, 'text': f"Segment {i} of the meeting.",
+         'words': [{'word': " Segment", 'start': i * 2.0, 'end': i * 2.0 + 0.5},
+                   {'word': f" {i}", 'start': i * 2.0 + 0.5, 'end': i * 2.0 + 1.5}]}
+        for i in range(count)
+    ]
+
+def test_segment_store():
+    """Test dict compatibility, queries, pickling and memory use"""
+
+    print("Testing segment store...")
+
+    from segment_store import SegmentStore
+
+    segments = make_segments(1000)
+    store = SegmentStore.from_dicts(segments)
+    assert len(store) == 1000 and store.to_dicts() == segments, "Store does not round-trip segment dicts"
+    assert store[3] == segments[3] and store[-1]['words'] == segments[-1]['words'], \
+        "Indexed segments don't match the original dicts"
+    assert [segment['text'] for segment in store[:3]] == [s['text'] for s in segments[:3]], \
+        "Slicing and iteration don't behave like a list"
+    print("✓ Segments read like the original dicts")
+
+    in_range = store.in_range(10.0, 20.0)
+    assert in_range.to_dicts() == segments[5:10], "Time-range query returned the wrong segments"
+    picked = store[[1, 7, 9]]
+    assert picked.to_dicts() == [segments[1], segments[7], segments[9]], \
+        "Fancy indexing returned the wrong segments"
+    print("✓ Time-range queries and index selection work")
+
+    attributed = store.with_speakers([0, 1] * 500, ["1", "2"]).relabel({"1": "Alice"})
+    assert attributed[0]['speaker'] == "Alice" and attributed[1]['speaker'] == "2", \
+        "Speaker labels were not stored or renamed"
+    print("✓ Speaker ids map to renameable labels")
+
+    sliced = pickle.dumps(store[100:102])
+    assert pickle.loads(sliced).to_dicts() == segments[100:102] and len(sliced) <= 2000, \
+        "A pickled slice carried more than its own segments"
+    assert store.content_hash() == SegmentStore.from_dicts(make_segments(1000)).content_hash(), \
+        "Equal transcripts hash differently"
+    print("✓ Slices pickle compactly and content hashes are stable")
+
+    tracemalloc.start()
+    as_dicts = [{'start': s['start'], 'end': s['end'], 'text': s['text']}
+                for s in make_segments(20000)]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    store = SegmentStore.from_dicts(as_dicts)
+    del as_dicts
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert store_bytes * 5 <= dict_bytes, f"Store uses {store_bytes} bytes vs {dict_bytes} as dicts"
+    print(f"✓ 20000 segments take {store_bytes / 1e6:.1f}MB instead of {dict_bytes / 1e6:.1f}MB")
+
+    print("\nSegment store tests passed!")
+
+if __name__ == "__main__":
+    test_segment_store()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script to verify embedding-based speaker clustering.
+"""
+
+import sys
+import os
+import time
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_cluster_embeddings():
+    """Test speaker count estimation, accuracy and speed on synthetic embeddings"""
+
+    print("Testing embedding clustering...")
+
+    import numpy as np
+    from speaker_clustering import cluster_embeddings
+
+    rng = np.random.default_rng(0)
+    for speakers, windows in ((1, 2000), (3, 600), (5, 5000)):
+        truth = rng.integers(0, speakers, windows)
+        voices = rng.standard_normal((speakers, 256))
+        embeddings = voices[truth] + rng.standard_normal((windows, 256)) * 0.9
+
+        start = time.time()
+        labels = cluster_embeddings(embeddings, max_speakers=10)
+        elapsed = time.time() - start
+
+        assert len(np.unique(labels)) == speakers, \
+            f"Estimated {len(np.unique(labels))} speakers instead of {speakers}"
+        purity = sum(np.bincount(labels[truth == k]).max() for k in range(speakers)) / windows
+        assert purity >= 0.98, f"Only {purity:.0%} of {windows} windows clustered correctly"
+        assert elapsed <= 2.0, f"Clustering {windows} windows took {elapsed:.2f}s"
+        print(f"✓ {speakers} speaker(s) found in {windows} windows in {elapsed:.2f}s")
+
+    print("\nEmbedding clustering tests passed!")
+
+def test_speaker_hints_above_window_count():
+    """Test that speaker counts larger than the number of windows are clamped"""
+
+    print("\nTesting speaker hints on short recordings...")
+
+    import numpy as np
+    from speaker_clustering import cluster_embeddings
+
+    rng = np.random.default_rng(2)
+    for windows in range(1, 8):
+        embeddings = rng.normal(size=(windows, 16))
+        for min_speakers, max_speakers in ((windows, windows), (5, 5), (15, 20)):
+            labels = cluster_embeddings(embeddings, min_speakers, max_speakers)
+            assert len(labels) == windows, f"{windows} windows got {len(labels)} labels"
+            assert len(np.unique(labels)) <= windows
+    print("✓ A minimum of up to 15 speakers on 1-7 windows gives at most one speaker per window")
+
+def test_embedding_diarizer():
+    """Test windowing, batched extraction and turns on a two-voice recording"""
+
+    print("\nTesting embedding diarizer...")
+
+    import numpy as np
+    from audio_buffer import AudioBuffer
+    from speaker_clustering import EmbeddingDiarizer, speech_windows
+
+    starts, ends = speech_windows([(0.0, 1.0), (2.0, 5.2), (6.0, 6.2)])
+    assert (np.allclose(starts, [0.0, 2.0, 2.75, 3.5, 3.7])
+            and np.allclose(ends, [1.0, 3.5, 4.25, 5.0, 5.2])), "Windows don't cover the speech regions as expected"
+    print("✓ Speech regions are covered by overlapping windows")
+
+    # A low voice for 6 s, a pause, then a high voice for 6 s
+    rate = 16000
+    t = np.arange(rate * 6) / rate
+    rng = np.random.default_rng(1)
+    low = 0.3 * np.sin(2 * np.pi * 150 * t) + 0.01 * rng.standard_normal(len(t))
+    high = 0.3 * np.sin(2 * np.pi * 600 * t) + 0.01 * rng.standard_normal(len(t))
+    samples = np.concatenate([low, np.zeros(rate), high]).astype(np.float32)
+
+    batch_sizes = []
+
+    def spectrum_embedding(waveforms):
+        """Stands in for a speaker embedding model: coarse spectrum bands"""
+        batch_sizes.append(len(waveforms))
+        spectrum = np.abs(np.fft.rfft(waveforms, axis=1))
+        return np.stack([band.sum(axis=1) for band in np.array_split(spectrum, 64, axis=1)], axis=1)
+
+    diarizer = EmbeddingDiarizer(spectrum_embedding, batch_size=8, workers=2)
+    turns = diarizer(AudioBuffer(samples, rate))
+    speakers = [turn['speaker'] for turn in turns]
+    assert speakers == ['SPEAKER_00', 'SPEAKER_01'], f"Expected two turns, got {turns}"
+    assert abs(turns[0]['end'] - 6.0) <= 0.3 and abs(turns[1]['start'] - 7.0) <= 0.3, \
+        f"Turn boundaries are off: {turns}"
+    assert max(batch_sizes) == 8 and set(diarizer.last_centroids) == set(speakers), \
+        "Embeddings were not extracted in batches"
+    print(f"✓ Two voices found, with turns split at the pause ({len(batch_sizes)} batches)")
+
+    # A two-second clip with the GUI's speaker count set far too high
+    turns = diarizer(AudioBuffer(samples[:2 * rate], rate), [(0.0, 2.0)], min_speakers=15, max_speakers=20)
+    assert turns and len(diarizer.last_centroids) <= 2, f"Unexpected turns for a short clip: {turns}"
+    print("✓ Speaker hints above the number of windows are clamped")
+
+    print("\nEmbedding diarizer tests passed!")
+
+if __name__ == "__main__":
+    test_cluster_embeddings()
+    test_speaker_hints_above_window_count()
+    test_embedding_diarizer()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test script to verify speaker naming for any number of speakers.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_speaker_names():
+    """Test renaming, persistence and applying names to transcripts and notes"""
+
+    print("Testing speaker names...")
+
+    from segment_store import SegmentStore
+    from speaker_names import SpeakerNames
+
+    # An all-hands call: 18 speakers taking turns over 50k segments
+    segments = [{'start': i * 2.0, 'end': i * 2.0 + 1.5, 'text': f"point {i}",
+                 'speaker': str(i % 18 + 1)} for i in range(50000)]
+    transcript = SegmentStore.from_dicts(segments)
+
+    names = SpeakerNames(["Ana", "", "Ben"])
+    assert names.as_dict() == {"1": "Ana", "3": "Ben"} and names.name("2") == "Speaker 2", \
+        f"Listed names were not mapped by position: {names.as_dict()}"
+
+    start = time.time()
+    for label in range(1, 19):
+        names.rename(str(label), f"Person {label}")
+    named = names.apply_transcript(transcript)
+    elapsed = time.time() - start
+    assert named[17]['speaker'] == "Person 18" and named.starts is transcript.starts, \
+        "Renaming rebuilt the transcript"
+    assert elapsed <= 0.05, f"Renaming 18 speakers took {elapsed * 1000:.1f}ms"
+    print(f"✓ 18 speakers of a 50k-segment transcript renamed in {elapsed * 1000:.2f}ms")
+
+    notes = {"summary": "Speaker 2 and Speaker 12 agreed; Speaker 1x is not a speaker.",
+             "key_points": ["Speaker 18 raised costs"], "action_items": ["Speaker 3: send budget"],
+             "speaker_notes": {"Speaker 2": "Asked about Speaker 3's plan", "4": "Quiet"}}
+    renamed = names.apply_notes(notes)
+    assert (renamed["summary"] == "Person 2 and Person 12 agreed; Speaker 1x is not a speaker."
+            and renamed["action_items"] == ["Person 3: send budget"]
+            and renamed["speaker_notes"] == {"Person 2": "Asked about Person 3's plan", "Person 4": "Quiet"}), \
+        f"Speaker references in notes were not renamed: {renamed}"
+    print("✓ Speaker references in generated notes are renamed at render time")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.environ["AUDIO_NOTES_CACHE_DIR"] = temp_dir
+        try:
+            saved = SpeakerNames.for_recording("abc123")
+            saved.rename("7", "Dana")
+            saved.save()
+            assert SpeakerNames.for_recording("abc123").as_dict() == {"7": "Dana"}, \
+                "Names were not saved with the recording"
+        finally:
+            del os.environ["AUDIO_NOTES_CACHE_DIR"]
+    print("✓ Names are saved and restored per recording")
+
+    print("\nSpeaker names tests passed!")
+
+def test_rename_without_reprocessing():
+    """Test that renaming a speaker only reruns the naming and rendering stages"""
+
+    print("\nTesting speaker renames in the notes pipeline...")
+
+    from pipeline import build_notes_pipeline
+    from speaker_names import SpeakerNames
+
+    calls = []
+
+    class Stub:
+        """Stands in for the pipeline components, recording what runs"""
+
+        last_turns = [{'start': 0.0, 'end': 5.0, 'speaker': "1"},
+                      {'start': 5.0, 'end': 9.0, 'speaker': "2"}]
+        last_centroids = {}
+
+        def prepare_file(self, path):
+            return path
+
+        def convert_to_wav(self, path):
+            return path
+
+        def load_buffer(self, path):
+            return path
+
+        def detect_buffer(self, audio):
+            return None
+
+        def process_audio(self, audio, speech_regions=None, speech_audio=None, **hints):
+            calls.append(("diarize", hints))
+            return {"1": "", "2": ""}
+
+        def resolve_speaker_names(self, speaker_names, speaker_embeddings):
+            return dict(speaker_names or {})
+
+        def transcribe_audio(self, audio):
+            calls.append(("transcribe", None))
+            return [{'start': 0.5, 'end': 4.0, 'text': "Welcome everyone"},
+                    {'start': 5.5, 'end': 8.5, 'text': "Thanks, Speaker 1"}]
+
+        def classify_content(self, transcription):
+            return "meeting"
+
+        def generate_notes(self, transcript, content_type, speaker_names=None):
+            calls.append(("generate_notes", None))
+            return {"summary": f"{transcript[0]['speaker']} opened the meeting.",
+                    "key_points": [], "action_items": [], "speaker_notes": {}}
+
+        def render_notes(self, notes, output_format):
+            return notes["summary"]
+
+    stub = Stub()
+    pipeline = build_notes_pipeline(stub, stub, stub, stub, stub, stub, max_workers=1)
+    values = pipeline.run(file_path="meeting.wav", speaker_names={},
+                          speaker_hints={'min_speakers': 2, 'max_speakers': 20},
+                          output_format="text", content_type_override=None)
+    assert calls[0] == ("diarize", {'min_speakers': 2, 'max_speakers': 20}), \
+        f"Speaker count hints did not reach diarization: {calls[0]}"
+    assert values['rendered_notes'] == "Speaker 1 opened the meeting.", \
+        f"Unexpected notes: {values['rendered_notes']}"
+
+    calls.clear()
+    values = pipeline.run(file_path="meeting.wav", speaker_names=SpeakerNames({"1": "Ana"}).as_dict(),
+                          speaker_hints={'min_speakers': 2, 'max_speakers': 20},
+                          output_format="text", content_type_override=None)
+    assert not calls and sorted(pipeline.last_run['ran']) == ["name_speakers", "render"], \
+        f"Renaming reran {pipeline.last_run['ran']}"
+    assert (values['rendered_notes'] == "Ana opened the meeting."
+            and values['named_transcript'][0]['speaker'] == "Ana"
+            and list(values['named_diarization']) == ["Ana", "Speaker 2"]), \
+        "The new name was not applied to the results"
+    print("✓ Renaming a speaker re-renders the results without rerunning any model")
+
+    print("\nSpeaker rename tests passed!")
+
+def test_speaker_count_hints():
+    """Test that contradictory or oversized speaker counts are clamped, not rejected"""
+
+    print("\nTesting speaker count hints...")
+
+    import pytest
+    pytest.importorskip("pyannote.audio")
+    from diarization_manager import speaker_count_hints
+
+    assert speaker_count_hints(0, None) == {}
+    assert speaker_count_hints(15, 20) == {'min_speakers': 15, 'max_speakers': 20}
+    assert speaker_count_hints(15, 4) == {'min_speakers': 4, 'max_speakers': 4}, \
+        "A minimum above the maximum was not lowered to it"
+    print("✓ A minimum above the maximum is lowered to it")
+
+if __name__ == "__main__":
+    test_speaker_names()
+    test_rename_without_reprocessing()
+    test_speaker_count_hints()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script to verify chunk planning and stitching for parallel transcription.
+"""
+
+import sys
+import os
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_chunk_planning():
+    """Test that chunks tile the recording and split at quiet points"""
+    
+    print("Testing chunk planning...")
+    
+    import numpy as np
+    from chunking import plan_chunks
+    
+    sample_rate = 16000
+    # 300 s of noise with a 0.5 s silence just before the first nominal boundary
+    samples = np.random.default_rng(0).normal(0, 0.1, 300 * sample_rate).astype(np.float32)
+    samples[57 * sample_rate:int(57.5 * sample_rate)] = 0.0
+    
+    chunks = plan_chunks(samples, sample_rate, chunk_seconds=60, overlap_seconds=2)
+    
+    assert chunks[0]['keep_start'] == 0.0 and chunks[-1]['keep_end'] == 300.0, \
+        "Chunks do not cover the whole recording"
+    assert not any(a['keep_end'] != b['keep_start'] for a, b in zip(chunks, chunks[1:])), \
+        "Owned ranges leave gaps or overlap"
+    print(f"✓ {len(chunks)} chunks tile the recording")
+    
+    assert 57.0 <= chunks[0]['keep_end'] <= 57.5, \
+        f"First boundary missed the silence: {chunks[0]['keep_end']:.2f}s"
+    assert chunks[1]['start'] == chunks[0]['keep_end'] - 1.0, "Chunks do not overlap their neighbours"
+    print("✓ Boundaries fall on quiet points with overlap on both sides")
+    
+    print("\nChunk planning tests passed!")
+
+def test_chunk_merging():
+    """Test that overlapping chunk results are stitched without duplicates"""
+    
+    print("\nTesting chunk merging...")
+    
+    from chunking import merge_chunk_segments
+    
+    chunks = [
+        {'start': 0.0, 'end': 11.0, 'keep_start': 0.0, 'keep_end': 10.0},
+        {'start': 9.0, 'end': 20.0, 'keep_start': 10.0, 'keep_end': 20.0},
+    ]
+    # Both chunks decoded "world" around t=9.5 and "again" around t=10.5
+    first = [{'start': 8.0, 'end': 11.0, 'text': "hello world again", 'words': [
+        {'word': " hello", 'start': 8.0, 'end': 9.0},
+        {'word': " world", 'start': 9.2, 'end': 9.8},
+        {'word': " again", 'start': 10.2, 'end': 10.8},
+    ]}]
+    second = [{'start': 0.2, 'end': 3.0, 'text': "world again today", 'words': [
+        {'word': " world", 'start': 0.2, 'end': 0.8},
+        {'word': " again", 'start': 1.2, 'end': 1.8},
+        {'word': " today", 'start': 2.0, 'end': 3.0},
+    ]}]
+    
+    merged = merge_chunk_segments([(chunks[0], first), (chunks[1], second)])
+    text = " ".join(segment['text'] for segment in merged)
+    assert text == "hello world again today", f"Overlap words duplicated or lost: {text!r}"
+    print("✓ Overlap words appear exactly once")
+    
+    assert merged[-1]['start'] == 10.2 and merged[-1]['end'] == 12.0, \
+        f"Timestamps not mapped to the global timeline: {merged[-1]}"
+    print("✓ Segment timestamps are global")
+    
+    # Streaming keeps each chunk's owned segments as soon as it's done
+    from chunking import owned_segments
+    streamed = (owned_segments(chunks[0], first)
+                + owned_segments(chunks[1], second, last_chunk=True))
+    assert streamed == merged, "Streamed chunks differ from the merged transcript"
+    print("✓ Chunks streamed one at a time match the merged transcript")
+    
+    print("\nChunk merging tests passed!")
+
+def test_voice_activity():
+    """Test speech detection and mapping speech-only times back"""
+    
+    print("\nTesting voice activity detection...")
+    
+    import numpy as np
+    from voice_activity import VoiceActivityDetector, SpeechTimeline
+    
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 0.001, 20 * sample_rate).astype(np.float32)
+    for start, end in [(2, 5), (10, 12)]:
+        samples[start * sample_rate:end * sample_rate] += rng.normal(0, 0.2, (end - start) * sample_rate)
+    
+    vad = VoiceActivityDetector(padding_seconds=0.2)
+    regions = vad.detect(samples, sample_rate)
+    expected = [(1.8, 5.2), (9.8, 12.2)]
+    assert len(regions) == 2 and all(abs(a - b) <= 0.05 for r, e in zip(regions, expected) for a, b in zip(r, e)), \
+        f"Unexpected speech regions: {regions}"
+    print("✓ Speech regions found:", [(round(a, 2), round(b, 2)) for a, b in regions])
+    
+    stats = vad.stats(regions, 20.0)
+    assert 0.65 < stats['skipped_fraction'] < 0.75, \
+        f"Unexpected skipped fraction: {stats['skipped_fraction']:.2f}"
+    print(f"✓ Skipped fraction reported: {stats['skipped_fraction']:.0%}")
+    
+    timeline = SpeechTimeline([(2.0, 5.0), (10.0, 12.0)])
+    speech = timeline.extract(samples, sample_rate)
+    assert len(speech) == 5 * sample_rate, "Extracted speech has the wrong length"
+    segment = timeline.remap_segments([{'start': 1.0, 'end': 3.0, 'text': "x"},
+                                       {'start': 3.0, 'end': 4.5, 'text': "y"}])
+    assert [(s['start'], s['end']) for s in segment] == [(3.0, 5.0), (10.0, 11.5)], \
+        f"Times not mapped back to the recording: {segment}"
+    print("✓ Speech-only times map back onto the original timeline")
+    
+    print("\nVoice activity tests passed!")
+
+def test_voice_activity_without_speech():
+    """Test that silence and steady noise yield no speech regions"""
+    
+    print("\nTesting voice activity on recordings without speech...")
+    
+    import numpy as np
+    from voice_activity import VoiceActivityDetector
+    
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    vad = VoiceActivityDetector()
+    
+    assert vad.detect(np.zeros(10 * sample_rate, dtype=np.float32), sample_rate) == [], \
+        "Digital silence was classed as speech"
+    print("✓ Digital silence has no speech")
+    
+    for level in (1e-4, 1e-3, 0.05):
+        noise = rng.normal(0, level, 10 * sample_rate).astype(np.float32)
+        assert vad.detect(noise, sample_rate) == [], f"Steady noise at {level} was classed as speech"
+    print("✓ Steady noise has no speech")
+    
+    # Speech-like bursts at any level still stand out from the noise
+    samples = rng.normal(0, 1e-4, 10 * sample_rate).astype(np.float32)
+    samples[3 * sample_rate:6 * sample_rate] += rng.normal(0, 0.05, 3 * sample_rate)
+    regions = vad.detect(samples, sample_rate)
+    assert len(regions) == 1 and abs(regions[0][0] - 2.8) < 0.05 and abs(regions[0][1] - 6.2) < 0.05, \
+        f"Unexpected speech regions: {regions}"
+    print("✓ Speech above quiet noise is still found")
+
+def test_fallback_transcripts():
+    """Test that the stand-in and error transcripts are segment stores too"""
+    
+    print("\nTesting fallback transcripts...")
+    
+    import pytest
+    pytest.importorskip("whisper")
+    from transcription_manager import TranscriptionManager
+    from segment_store import SegmentStore
+    
+    class FailingModel:
+        def transcribe(self, audio, **options):
+            raise RuntimeError("decoder failed")
+    
+    manager = TranscriptionManager()
+    manager.load_model = lambda model_size="base": None
+    result = manager._transcribe_audio("missing.wav")
+    assert isinstance(result, SegmentStore) and len(result) == 6, \
+        f"The stand-in transcript is not a segment store: {type(result)}"
+    
+    manager.model = FailingModel()
+    result = manager._transcribe_audio("missing.wav")
+    assert isinstance(result, SegmentStore) and "decoder failed" in result[0]['text'], \
+        f"The error transcript is not a segment store: {type(result)}"
+    assert not manager._transcribed_successfully(), "The failed run would be cached"
+    print("✓ Stand-in and error transcripts are returned as segment stores")
+
+if __name__ == "__main__":
+    test_chunk_planning()
+    test_chunk_merging()
+    test_voice_activity()
+    test_voice_activity_without_speech()
+    test_fallback_transcripts()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the speaker voiceprint index.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Add src directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+def test_voiceprint_index():
+    """Test enrollment, persistence, lookup speed and one-to-one speaker matching"""
+
+    print("Testing voiceprint index...")
+
+    import numpy as np
+    from voiceprint_index import VoiceprintIndex
+
+    rng = np.random.default_rng(0)
+    voices = rng.standard_normal((3000, 256)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "voiceprints.npz")
+        index = VoiceprintIndex(path, threshold=0.6)
+        for person, voice in enumerate(voices):
+            for _ in range(2):
+                index.enroll(f"person {person}", voice + rng.standard_normal(256) * 0.5, save=False)
+        index.save()
+
+        reloaded = VoiceprintIndex(path, threshold=0.6)
+        assert len(reloaded) == len(voices) and reloaded.names[:2] == ["person 0", "person 1"], \
+            "Enrolled voices were not persisted"
+        print(f"✓ {len(reloaded)} voices enrolled and reloaded from disk")
+
+        # Three speakers of a new recording, one of whom nobody has enrolled
+        centroids = {
+            "1": voices[42] + rng.standard_normal(256) * 0.5,
+            "2": rng.standard_normal(256),
+            "3": voices[2999] + rng.standard_normal(256) * 0.5,
+        }
+        start = time.time()
+        for _ in range(100):
+            matches = reloaded.identify(centroids)
+        elapsed = (time.time() - start) / 100
+        assert {label: name for label, (name, _) in matches.items()} == {"1": "person 42", "3": "person 2999"}, \
+            f"Speakers were matched wrongly: {matches}"
+        assert elapsed <= 0.02, f"Matching against {len(reloaded)} voices took {elapsed * 1000:.1f}ms"
+        print(f"✓ Known speakers named, unknown left unnamed in {elapsed * 1000:.2f}ms")
+
+        names, scores = reloaded.search(voices[7], k=3)
+        assert names[0][0] == "person 7" and scores[0][0] >= scores[0][1] >= scores[0][2], \
+            "Nearest voices were not ranked by similarity"
+
+        # Two speakers closest to the same person: only the closer one gets the name
+        twin = {"1": voices[5] + rng.standard_normal(256) * 0.6, "2": voices[5] + rng.standard_normal(256) * 0.3}
+        matches = reloaded.identify(twin, threshold=0.3)
+        assert list(matches) == ["2"], f"One person was matched to two speakers: {matches}"
+        print("✓ Each enrolled person names at most one speaker")
+
+        reloaded.enroll("person 7", voices[7], save=True)
+        reloaded.forget("person 0")
+        again = VoiceprintIndex(path)
+        assert "person 0" not in again.names and again._counts[again._rows["person 7"]] == 3, \
+            "Incremental updates were not saved"
+        print("✓ Confirmations and removals update the saved index")
+
+        # Renaming a speaker moves their voice; confirming it again changes nothing
+        voice = rng.standard_normal(256)
+        assert again.enroll("Cleo", voice) and not again.enroll("Cleo", voice), \
+            "Confirming the same voice twice counted it twice"
+        assert again.enroll("Dana", voice)
+        again = VoiceprintIndex(path)
+        assert "Cleo" not in again.names and again._counts[again._rows["Dana"]] == 1, \
+            f"A renamed voice stayed under its old name: {again.names[-2:]}"
+        again.enroll("person 7", voice, save=False)
+        assert "Dana" not in again.names and again._counts[again._rows["person 7"]] == 4
+        print("✓ Renaming a speaker moves their voice to the new name")
+
+    print("\nVoiceprint index tests passed!")
+
+def test_speaker_naming():
+    """Test that typed names win and recognised voices fill the gaps"""
+
+    print("\nTesting speaker naming from voiceprints...")
+
+    import pytest
+    pytest.importorskip("pyannote.audio")
+    import numpy as np
+    from diarization_manager import DiarizationManager
+    from voiceprint_index import VoiceprintIndex
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = VoiceprintIndex(os.path.join(temp_dir, "voiceprints.npz"))
+
+        class IndexedManager(DiarizationManager):
+            voiceprints = index
+
+        dm = IndexedManager()
+        ana, ben = rng.standard_normal((2, 192))
+        centroids = {"1": ana, "2": ben, "3": rng.standard_normal(192)}
+        dm.confirm_speaker_names({"1": "Ana", "2": "Ben"}, centroids)
+
+        later = {"1": ben + rng.standard_normal(192) * 0.3, "2": ana + rng.standard_normal(192) * 0.3}
+        names = dm.resolve_speaker_names({}, later)
+        assert names == {"1": "Ben", "2": "Ana"}, f"Recognised voices were not named: {names}"
+        names = dm.resolve_speaker_names({"2": "Ben"}, later)
+        assert names == {"2": "Ben"}, f"A typed name did not take precedence: {names}"
+        print("✓ Enrolled voices are named in a later recording")
+
+        assert dm.confirm_speaker_names({"1": "Ana"}, centroids) == 0, "An unchanged name was enrolled again"
+        assert dm.confirm_speaker_names({"1": "Anna"}, centroids) == 1
+        assert sorted(index.names) == ["Anna", "Ben"], f"The old name kept the voice: {index.names}"
+        print("✓ Renamed speakers are re-enrolled under the new name only")
+
+    print("\nSpeaker naming tests passed!")
+
+if __name__ == "__main__":
+    test_voiceprint_index()
+    test_speaker_naming()